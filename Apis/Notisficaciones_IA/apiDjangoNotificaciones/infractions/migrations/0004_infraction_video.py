@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2025-06-10 18:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('infractions', '0003_parqueo'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='infraction',
+            name='video',
+            field=models.FileField(blank=True, null=True, upload_to='infractions/videos/'),
+        ),
+    ]
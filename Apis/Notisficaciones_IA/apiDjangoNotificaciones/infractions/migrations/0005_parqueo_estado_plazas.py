@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2025-06-11 16:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('infractions', '0004_infraction_video'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='parqueo',
+            name='estado_plazas',
+            field=models.JSONField(blank=True, null=True),
+        ),
+    ]
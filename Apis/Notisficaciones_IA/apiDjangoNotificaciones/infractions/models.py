@@ -6,6 +6,7 @@ class Infraction(models.Model):
     mensaje = models.CharField(max_length=255)
     timestamp = models.DateTimeField(auto_now_add=True)
     image = models.ImageField(upload_to='infractions/', blank=True, null=True)
+    video = models.FileField(upload_to='infractions/videos/', blank=True, null=True)
 
     def __str__(self):
         return f"{self.timestamp}: {self.mensaje}"
@@ -17,6 +18,7 @@ class Parqueo(models.Model):
     latitud_dos = models.FloatField()
     longitud_dos = models.FloatField()
     espacio_disponible = models.IntegerField()
+    estado_plazas = models.JSONField(blank=True, null=True)
 
     def __str__(self):
         return f"{self.descripcion}: {self.espacio_disponible} spaces"
\ No newline at end of file
@@ -8,9 +8,9 @@ from .models import Infraction, Parqueo
 class InfractionSerializer(serializers.ModelSerializer):
     class Meta:
         model = Infraction
-        fields = ['id', 'mensaje', 'timestamp', 'image']
+        fields = ['id', 'mensaje', 'timestamp', 'image', 'video']
         
 class ParqueoSerializer(serializers.ModelSerializer):
     class Meta:
         model = Parqueo
-        fields = ['id', 'descripcion', 'latitud_uno', 'longitud_uno', 'latitud_dos', 'longitud_dos', 'espacio_disponible']
\ No newline at end of file
+        fields = ['id', 'descripcion', 'latitud_uno', 'longitud_uno', 'latitud_dos', 'longitud_dos', 'espacio_disponible', 'estado_plazas']
\ No newline at end of file
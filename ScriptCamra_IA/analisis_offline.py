@@ -0,0 +1,145 @@
+import argparse
+import csv
+import multiprocessing as mp
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from multicamara import cargar_camaras, forma_fuente, presupuesto_hilos
+
+# Análisis offline de grabaciones para auditorías: el video se parte en bloques de
+# tiempo que se procesan en paralelo (un proceso por núcleo). Dentro de cada bloque
+# solo se decodifican los frames de muestra; el resto se salta con cap.grab().
+# El resultado es una serie de tiempo del espacio disponible en CSV o Parquet.
+
+COLUMNAS = ["frame", "segundo", "espacio_disponible", "espacios", "autos"]
+
+_detector = None  # Detector del proceso trabajador (se crea una vez por proceso)
+
+
+def _iniciar_trabajador(camara, model_path, backend, hilos, forma):
+    """Inicializador del pool: limita hilos y carga el modelo una sola vez por proceso."""
+    global _detector
+    os.environ["OMP_NUM_THREADS"] = str(hilos)
+    os.environ["MKL_NUM_THREADS"] = str(hilos)
+    import cv2
+    import parqueos
+    from multicamara import crear_detector
+    cv2.setNumThreads(1)
+    if backend == "pytorch":
+        import torch
+        torch.set_num_threads(hilos)
+    # Entre muestras pasa demasiado tiempo para propagar cajas: se detecta en cada muestra.
+    # Sin compuerta (decide por tiempo real, no del video) ni caché: cada proceso recibe bloques
+    # no contiguos y no debe reutilizar cajas de otro momento de la grabación
+    camara = dict(camara, intervalo_deteccion=1)
+    _detector = crear_detector(camara, parqueos, model_path, backend=backend, compuerta=False, cache_detecciones=0)
+    _detector.calentar(forma)
+
+
+def procesar_bloque(ruta_video, inicio, fin, paso, fps):
+    """Analiza los frames de muestra (múltiplos de 'paso') en [inicio, fin) y devuelve sus filas."""
+    import cv2
+    cap = cv2.VideoCapture(ruta_video)
+    if inicio > 0:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, inicio)
+    filas = []
+    for indice in range(inicio, fin):
+        if indice % paso:
+            if not cap.grab():  # Avanza sin decodificar la imagen
+                break
+            continue
+        ret, frame = cap.read()
+        if not ret:
+            break
+        autos, espacio, _ = _detector.analizar(frame)  # La cámara viene calibrada desde la config
+        filas.append((indice, round(indice / fps, 3), round(float(espacio), 2), _detector.last_espacios, len(autos)))
+    cap.release()
+    return filas
+
+
+def dividir_en_bloques(total_frames, fps, duracion_bloque, paso):
+    """Bloques [inicio, fin) de ~duracion_bloque segundos alineados a múltiplos del paso."""
+    tam = max(paso, int(round(duracion_bloque * fps / paso)) * paso)
+    return [(inicio, min(inicio + tam, total_frames)) for inicio in range(0, total_frames, tam)]
+
+
+def guardar_serie(filas, ruta):
+    """Escribe la serie en CSV o, si la ruta termina en .parquet, en Parquet (requiere pandas + pyarrow)."""
+    if ruta.endswith(".parquet"):
+        import pandas as pd
+        pd.DataFrame(filas, columns=COLUMNAS).to_parquet(ruta, index=False)
+        return
+    with open(ruta, "w", newline="", encoding="utf-8") as f:
+        escritor = csv.writer(f)
+        escritor.writerow(COLUMNAS)
+        escritor.writerows(filas)
+
+
+def analizar_video(ruta_video, camara, model_path, backend="pytorch", muestras_por_segundo=1.0,
+                   duracion_bloque=60.0, procesos=None):
+    """Procesa todo el video en paralelo y devuelve las filas ordenadas por frame."""
+    import cv2
+    cap = cv2.VideoCapture(ruta_video)
+    if not cap.isOpened():
+        raise RuntimeError(f"No se pudo abrir el video {ruta_video}")
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    forma = forma_fuente(cap)
+    cap.release()
+    if total <= 0:
+        raise RuntimeError(f"No se pudo leer la cantidad de frames de {ruta_video}")
+
+    paso = max(1, int(round(fps / muestras_por_segundo)))
+    bloques = dividir_en_bloques(total, fps, duracion_bloque, paso)
+    procesos = min(procesos or os.cpu_count() or 1, len(bloques))
+    hilos = presupuesto_hilos(procesos)
+    print(f"{ruta_video}: {total} frames a {fps:.1f} FPS, 1 muestra cada {paso} frames, "
+          f"{len(bloques)} bloques en {procesos} proceso(s) con {hilos} hilo(s)")
+
+    filas = []
+    with ProcessPoolExecutor(max_workers=procesos, mp_context=mp.get_context("spawn"),
+                             initializer=_iniciar_trabajador,
+                             initargs=(camara, model_path, backend, hilos, forma)) as pool:
+        futuros = [pool.submit(procesar_bloque, ruta_video, inicio, fin, paso, fps) for inicio, fin in bloques]
+        for i, futuro in enumerate(futuros, 1):
+            filas.extend(futuro.result())
+            print(f"Bloque {i}/{len(bloques)} listo ({len(filas)} muestras)")
+    filas.sort(key=lambda fila: fila[0])
+    return filas, total / fps
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serie de tiempo de ocupación a partir de videos grabados")
+    parser.add_argument("video", help="Video a analizar")
+    parser.add_argument("config", help="JSON de cámaras con la calibración ('puntos') de la cámara grabada")
+    parser.add_argument("--camara", help="Nombre de la cámara en la config (por defecto la primera)")
+    parser.add_argument("--salida", default="ocupacion.csv", help="Archivo .csv o .parquet de salida")
+    parser.add_argument("--muestras-por-segundo", type=float, default=1.0,
+                        help="Frames analizados por segundo de video")
+    parser.add_argument("--duracion-bloque", type=float, default=60.0,
+                        help="Segundos de video por bloque de trabajo")
+    parser.add_argument("--procesos", type=int, default=None, help="Procesos en paralelo (por defecto núcleos)")
+    parser.add_argument("--modelo", default="models/yolov8n.pt", help="Ruta del modelo YOLO")
+    parser.add_argument("--backend", default="pytorch", choices=["pytorch", "onnx", "onnx-int8"],
+                        help="Motor de inferencia")
+    args = parser.parse_args()
+
+    camaras = [c for c in cargar_camaras(args.config) if c["tipo"] == "parqueo"]
+    if args.camara:
+        camaras = [c for c in camaras if c["nombre"] == args.camara]
+    if not camaras:
+        print(f"Error: No hay cámaras de parqueo en {args.config}")
+        return
+
+    inicio = time.perf_counter()
+    filas, duracion_video = analizar_video(args.video, camaras[0], args.modelo, args.backend,
+                                           args.muestras_por_segundo, args.duracion_bloque, args.procesos)
+    guardar_serie(filas, args.salida)
+    transcurrido = time.perf_counter() - inicio
+    print(f"{len(filas)} muestras guardadas en {args.salida} | {duracion_video:.0f}s de video "
+          f"en {transcurrido:.1f}s ({duracion_video / transcurrido:.1f}x tiempo real)")
+
+
+if __name__ == "__main__":
+    main()
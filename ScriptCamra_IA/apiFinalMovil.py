@@ -1,177 +1,240 @@
-import cv2
+import argparse
+import functools
 import numpy as np
 import logging
 import os
 import time
-import requests
-from ultralytics import YOLO
+from arranque import importar_diferido, reportar_primer_frame
+from detectores import BackendDetector, crear_backend
+from postproceso import centros, desplazar
+from roi import recortar
+from rastreador import RastreadorIoU
+from renderizado import CapaEstatica, Renderizador
+from servidor_mjpeg import ServidorMJPEG
+from cliente_api import SPOOL_DIR, ClienteAPI
+from clips import GrabadorClips
+from controlador import crear_controlador
+from evidencia import codificar_jpeg, SubidorEvidencia
+from metricas import METRICAS
+from multicamara import abrir_fuente, cargar_camaras, forma_fuente
+from zonas import normalizar_zonas, mascara_zonas, pertenencia, rect_zonas, TemporizadorZona
+
+cv2 = importar_diferido("cv2")  # Se carga con el primer frame, no al importar el script
 
 # Configurar logging
 logging.getLogger('ultralytics').setLevel(logging.ERROR)
 
-# Cargar modelo YOLOv8s (small, más preciso que YOLOv8n)
-model = YOLO('models/yolov8n.pt')
-
-# Variables para la zona restringida
-ZONE = {'x1': 100, 'y1': 300, 'x2': 550, 'y2': 350}  # Zona inicial por defecto
-
-# Variables para la selección con mouse
-drawing = False
-temp_zone = None
-ix, iy = -1, -1
-
-# Función del mouse para seleccionar zona
-def mouse_callback(event, x, y, flags, param):
-    global ix, iy, drawing, temp_zone, ZONE
-    
-    if event == cv2.EVENT_LBUTTONDOWN:
-        drawing = True
-        ix, iy = x, y
-        temp_zone = {'x1': x, 'y1': y, 'x2': x, 'y2': y}
-    
-    elif event == cv2.EVENT_MOUSEMOVE:
-        if drawing:
-            temp_zone['x2'] = x
-            temp_zone['y2'] = y
-    
-    elif event == cv2.EVENT_LBUTTONUP:
-        drawing = False
-        # Asegurar que x1,y1 sea la esquina superior izquierda
-        x1 = min(ix, x)
-        y1 = min(iy, y)
-        x2 = max(ix, x)
-        y2 = max(iy, y)
-        
-        # Actualizar la zona solo si tiene un tamaño mínimo
-        if abs(x2 - x1) > 20 and abs(y2 - y1) > 20:
-            ZONE = {'x1': x1, 'y1': y1, 'x2': x2, 'y2': y2}
-            print(f"Nueva zona establecida: {ZONE}")
-        temp_zone = None
-
-# Configurar captura de video desde la cámara de la PC
-cap = cv2.VideoCapture(0)  # 0 para la cámara predeterminada
-if not cap.isOpened():
-    print("Error al abrir la cámara.")
-    exit(1)
-
-# Función para verificar si un punto está en la zona restringida
-def punto_en_rect(x, y, z):
-    return z['x1'] <= x <= z['x2'] and z['y1'] <= y <= z['y2']
+# Modelo YOLOv8 y motor de inferencia
+# BACKEND: 'pytorch', 'onnx' u 'onnx-int8' (exportar antes con exportar_modelo.py)
+MODEL_PATH = 'models/yolov8n.pt'
+BACKEND = 'pytorch'
+
+# Zona inicial por defecto (se puede pasar una lista de polígonos {'nombre', 'puntos'})
+ZONE = {'x1': 100, 'y1': 300, 'x2': 550, 'y2': 350}
 
 # Configuración de la alerta visual
 ALERT_W, ALERT_H = 400, 100
-FONT = cv2.FONT_HERSHEY_SIMPLEX
+FONT = 0  # cv2.FONT_HERSHEY_SIMPLEX (literal para no cargar cv2 al importar)
 FONT_SCALE = 1
 FONT_THICKNESS = 2
+VENTANA = 'Zona IP'
 
 # Variables para foto y POST
 fotos_dir = 'fotos'
-os.makedirs(fotos_dir, exist_ok=True)
+ARCHIVAR_FOTOS = True  # Guardar también una copia local de cada foto enviada
+CALIDAD_JPEG = 85
+MAX_DIM_FOTO = 1280    # Lado mayor máximo de la foto en píxeles
+
+# Clip de video de cada infracción: los últimos segundos quedan en memoria como JPEG
+CLIPS = True
+CLIP_PRE_S = 5.0       # Segundos antes de la confirmación
+CLIP_POST_S = 3.0      # Segundos después (la subida espera a que terminen)
+CLIP_FPS = 8
 
 # Configuración de la API
 API_URL = 'http://192.168.1.3:8001/api/infractions/'
 
-# Variables para el contador y temporizador
-stable_count = None  # Valor estable del contador
-stable_start = None  # Tiempo de inicio de la estabilidad
-photo_taken = False  # Bandera para evitar múltiples POSTs
 
-# Configurar callback del mouse para la ventana principal
-cv2.namedWindow('Zona IP')
-cv2.setMouseCallback('Zona IP', mouse_callback)
+class ZoneViolationDetector:
+    def __init__(self, model_path, zonas=None, backend="pytorch", modo_roi=True, imgsz_roi=320, margen_zona=80,
+                 rastreador=None, intervalo_deteccion=3, tiempo_estable=3.0, al_confirmar=None, nombre="zona"):
+        if backend is None or isinstance(backend, BackendDetector):
+            self.backend = backend  # None: las detecciones llegan de afuera (ver bus_camara.py)
+        else:
+            print(f"Cargando modelo YOLOv8 ({backend}) desde: {model_path}")
+            self.backend = crear_backend(backend, model_path)
+        self.vehicle_classes = (2,)  # Solo autos (clase 2 en COCO)
+        # Modo ROI: inferir solo sobre las zonas (con margen) y a menor resolución
+        self.modo_roi = modo_roi
+        self.imgsz_roi = imgsz_roi
+        self.imgsz = None  # Resolución sobre el frame completo (None: la del modelo); la ajusta controlador.py
+        self.margen_zona = margen_zona  # Píxeles alrededor de las zonas para no cortar autos en el borde
+        # Rastreador: YOLO cada 'intervalo_deteccion' frames y propagación de cajas en los demás
+        self.rastreador = rastreador or RastreadorIoU(conf_alta=0.5)
+        self.intervalo_deteccion = intervalo_deteccion
+        self.frames_vistos = 0
+        self.tiempo_estable = tiempo_estable
+        # al_confirmar(nombre_zona, conteo, frame): conteo estable de una zona (p. ej. subir la foto)
+        self.al_confirmar = al_confirmar
+        self.nombre = nombre
+        self.zonas_iniciales = zonas if zonas is not None else [ZONE]
+        self.last_capturado_en = None
+        self.capa_estatica = CapaEstatica()  # Zonas e instrucciones, dibujadas una vez por cambio de zonas
+        self.version_zonas = 0
+        self.set_zonas(self.zonas_iniciales)
+
+    def set_zonas(self, zonas):
+        """Reemplaza las zonas; la máscara se vuelve a rasterizar con el próximo frame.
+
+        Las zonas que no cambiaron (mismo nombre y puntos) conservan su temporizador y sus infractores,
+        así no vuelven a confirmar (y subir) una infracción ya reportada.
+        """
+        anteriores = {}
+        for zona, temporizador, ids in zip(getattr(self, 'zonas', ()), getattr(self, 'temporizadores', ()),
+                                           getattr(self, 'ids_infractores', ())):
+            anteriores[(zona['nombre'], zona['puntos'].tobytes())] = (temporizador, ids)
+        self.zonas = normalizar_zonas(zonas)
+        self.version_zonas += 1
+        self.mascara = None
+        estados = [anteriores.get((zona['nombre'], zona['puntos'].tobytes()),
+                                  (TemporizadorZona(self.tiempo_estable), set())) for zona in self.zonas]
+        self.temporizadores = [temporizador for temporizador, _ in estados]
+        self.ids_infractores = [ids for _, ids in estados]  # IDs de autos distintos que entraron a cada zona
+        self.ultimo_resultado = None  # (autos, dentro, conteos) del último frame analizado
 
-print("Detección de zona. Pulsa 'q' para salir.")
-print("Haz clic y arrastra para seleccionar una nueva zona restringida.")
-print("Presiona 'r' para resetear a la zona por defecto.")
+    def agregar_zona(self, zona):
+        self.set_zonas(self.zonas + [zona])
 
-while True:
-    ret, frame = cap.read()
-    if not ret:
-        print("Error al leer el frame de la cámara.")
-        break
+    def reiniciar_zonas(self):
+        self.set_zonas(self.zonas_iniciales)
 
-    # Crear una copia del frame para dibujar
-    display_frame = frame.copy()
+    def _mascara(self, forma):
+        if self.mascara is None or self.mascara.shape != tuple(forma[:2]):
+            self.mascara = mascara_zonas(self.zonas, forma)
+        return self.mascara
 
-    # Realizar detección con YOLO en el frame original
-    results = model(frame, verbose=False, conf=0.5)[0]  # Umbral de confianza 0.5
+    def detect_vehicles(self, frame):
+        """Detecta autos en el frame (o solo en el recorte de las zonas) con la confianza baja del rastreador."""
+        rect = rect_zonas(self.zonas, self.margen_zona, frame.shape) if self.modo_roi and self.zonas else None
+        with METRICAS.cronometro("etapa_segundos", etapa="inferencia", camara=self.nombre):
+            if rect is not None:
+                autos = self.backend.detectar([recortar(frame, rect)], self.vehicle_classes,
+                                              self.rastreador.conf_baja, self.imgsz_roi)[0]
+            else:
+                autos = self.backend.detectar([frame], self.vehicle_classes, self.rastreador.conf_baja,
+                                              self.imgsz)[0]
+        return desplazar(autos, rect[0], rect[1]) if rect is not None else autos
 
-    infraccion = False
-    car_count = 0  # Contador de autos en la zona restringida
+    def calentar(self, forma=(480, 640, 3)):
+        """Inferencia de prueba con la forma y resolución reales (recorte de las zonas si aplica) antes del primer frame."""
+        if self.backend is None:
+            return 0.0
+        rect = rect_zonas(self.zonas, self.margen_zona, forma) if self.modo_roi and self.zonas else None
+        if rect is not None:
+            forma, imgsz = (rect[3] - rect[1], rect[2] - rect[0], 3), self.imgsz_roi
+        else:
+            imgsz = self.imgsz
+        segundos = self.backend.calentar(forma, imgsz)
+        print(f"[{self.nombre}] Modelo calentado en {segundos:.2f}s")
+        return segundos
 
-    for box, cls in zip(results.boxes, results.boxes.cls):
-        if int(cls) != 2:  # Solo detectar "car"
-            continue
+    def obtener_detecciones(self, frame):
+        """Detecta o propaga los autos del frame según el intervalo de detección."""
+        self.frames_vistos += 1
+        toca_detectar = self.frames_vistos % self.intervalo_deteccion == 0
+        if self.rastreador.tracks and not toca_detectar and not self.rastreador.incierto():
+            # Entre detecciones, las cajas se propagan con el filtro de Kalman
+            return self.rastreador.predecir()
+        return self.rastreador.actualizar(self.detect_vehicles(frame))
 
-        x1, y1, x2, y2 = map(int, box.xyxy[0])
-        cx, cy = (x1 + x2) // 2, (y1 + y2) // 2
+    def analizar(self, frame, capturado_en=None, ahora=None, detecciones=None):
+        """Cuenta los autos de cada zona y avanza sus temporizadores; devuelve (autos, dentro, conteos).
 
-        if punto_en_rect(cx, cy, ZONE):
-            infraccion = True
-            car_count += 1
-            color = (0, 0, 255)
+        Con 'detecciones' (tracks ya calculados por otro proceso para este frame) no se corre la inferencia.
+        """
+        ahora = time.time() if ahora is None else ahora
+        self.last_capturado_en = capturado_en if capturado_en is not None else ahora
+        if detecciones is None:
+            autos = self.obtener_detecciones(frame)
         else:
-            color = (0, 255, 0)
-
-        cv2.rectangle(display_frame, (x1, y1), (x2, y2), color, 2)
-        cv2.circle(display_frame, (cx, cy), 5, color, -1)
-
-    # Dibujar la zona restringida actual
-    cv2.rectangle(display_frame,
-                  (ZONE['x1'], ZONE['y1']),
-                  (ZONE['x2'], ZONE['y2']),
-                  (255, 0, 0), 2)
-
-    # Dibujar zona temporal mientras se está seleccionando
-    if temp_zone is not None:
-        cv2.rectangle(display_frame,
-                      (temp_zone['x1'], temp_zone['y1']),
-                      (temp_zone['x2'], temp_zone['y2']),
-                      (0, 255, 255), 2)  # Amarillo para zona temporal
-
-    # Mostrar el contador en la ventana principal
-    count_text = f"Autos: {car_count}"
-    cv2.putText(display_frame, count_text, (ZONE['x1'], ZONE['y1'] - 10),
-                FONT, FONT_SCALE, (255, 255, 255), FONT_THICKNESS, cv2.LINE_AA)
-
-    # Agregar instrucciones en pantalla
-    instructions = [
-        "Click y arrastra: Nueva zona",
-        "R: Reset zona",
-        "Q: Salir"
-    ]
-    for i, instruction in enumerate(instructions):
-        cv2.putText(display_frame, instruction, (10, 30 + i * 25),
-                    cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 1, cv2.LINE_AA)
-
-    # Lógica para POST: cambio de contador y 3 segundos de estabilidad
-    if stable_count is None or car_count != stable_count:
-        # Reiniciar temporizador y bandera si el contador cambia
-        stable_start = time.time()
-        stable_count = car_count
-        photo_taken = False
-    elif not photo_taken and stable_start is not None and time.time() - stable_start >= 3:
-        # Guardar foto
-        timestamp = time.strftime("%Y%m%d_%H%M%S")
-        filename = os.path.join(fotos_dir, f"infraccion_{timestamp}.jpg")
-        cv2.imwrite(filename, frame)  # Guardar frame original sin anotaciones
-        print(f"[Foto guardada] {filename}")
-
-        # Enviar POST con mensaje e imagen
-        payload = {'mensaje': f'{car_count} auto{"s" if car_count > 1 else ""} {"infractores" if car_count > 0 else "en la plaza"}'}
-        try:
-            with open(filename, 'rb') as img_file:
-                files = {'image': (os.path.basename(filename), img_file, 'image/jpeg')}
-                resp = requests.post(API_URL, data=payload, files=files, timeout=5)
-                print(f"[API] {resp.status_code}: {resp.text}")
-        except FileNotFoundError:
-            print(f"[ERROR] No se encontró la imagen: {filename}")
-        except Exception as e:
-            print(f"[ERROR] al enviar POST: {e}")
-
-        photo_taken = True
-
-    # Mostrar ventana de alerta
+            autos = detecciones[np.isin(detecciones['cls'], self.vehicle_classes)]
+
+        with METRICAS.cronometro("etapa_segundos", etapa="postproceso", camara=self.nombre):
+            # Todos los centros contra todas las zonas en una sola indexación de la máscara
+            cx, cy = centros(autos)
+            dentro = pertenencia(self._mascara(frame.shape), cx, cy, len(self.zonas))
+            conteos = dentro.sum(axis=0)
+            for i, ids in enumerate(self.ids_infractores):
+                ids.update(autos['id'][dentro[:, i]].tolist())
+
+        for i, (zona, temporizador) in enumerate(zip(self.zonas, self.temporizadores)):
+            if temporizador.observar(int(conteos[i]), ahora) and self.al_confirmar is not None:
+                self.al_confirmar(zona['nombre'], int(conteos[i]), frame)
+
+        self.ultimo_resultado = (autos, dentro, conteos)
+        reportar_primer_frame(self.nombre)
+        return self.ultimo_resultado
+
+    def draw_static_overlay(self, frame):
+        """Contornos de las zonas e instrucciones: solo cambian cuando cambian las zonas."""
+        for zona in self.zonas:
+            cv2.polylines(frame, [zona['puntos']], True, (255, 0, 0), 2)
+        instructions = [
+            "Click y arrastra: Nueva zona",
+            "X: Borrar ultima zona",
+            "R: Reset zonas",
+            "Q: Salir"
+        ]
+        for i, instruction in enumerate(instructions):
+            cv2.putText(frame, instruction, (10, 30 + i * 25),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 1, cv2.LINE_AA)
+
+    def anotar(self, frame, zona_temporal=None, salida=None):
+        """Dibuja el último resultado de analizar() sobre una copia del frame (o sobre 'salida', preasignado)."""
+        if salida is None:
+            display_frame = frame.copy()
+        else:
+            np.copyto(salida, frame)
+            display_frame = salida
+        if self.ultimo_resultado is None:
+            return display_frame
+        inicio_dibujo = time.perf_counter()
+        autos, dentro, conteos = self.ultimo_resultado
+        en_alguna = dentro.any(axis=1)
+        cx, cy = centros(autos)
+        for (x1, y1, x2, y2), x, y, infractor in zip(
+                np.stack([autos['x1'], autos['y1'], autos['x2'], autos['y2']], axis=1).tolist(),
+                cx.tolist(), cy.tolist(), en_alguna.tolist()):
+            color = (0, 0, 255) if infractor else (0, 255, 0)
+            cv2.rectangle(display_frame, (x1, y1), (x2, y2), color, 2)
+            cv2.circle(display_frame, (x, y), 5, color, -1)
+
+        # Zonas restringidas e instrucciones desde la capa cacheada; encima, el contador de cada zona
+        self.capa_estatica.componer(display_frame, self.version_zonas, self.draw_static_overlay)
+        for i, zona in enumerate(self.zonas):
+            x0, y0 = zona['puntos'].min(axis=0)
+            count_text = f"Autos: {int(conteos[i])} | Distintos: {len(self.ids_infractores[i])}"
+            cv2.putText(display_frame, count_text, (int(x0), int(y0) - 10),
+                        FONT, FONT_SCALE, (255, 255, 255), FONT_THICKNESS, cv2.LINE_AA)
+
+        # Dibujar zona temporal mientras se está seleccionando
+        if zona_temporal is not None:
+            cv2.rectangle(display_frame,
+                          (zona_temporal['x1'], zona_temporal['y1']),
+                          (zona_temporal['x2'], zona_temporal['y2']),
+                          (0, 255, 255), 2)  # Amarillo para zona temporal
+        METRICAS.observar("etapa_segundos", time.perf_counter() - inicio_dibujo, etapa="dibujo", camara=self.nombre)
+        return display_frame
+
+    def process_frame(self, frame, capturado_en=None, anotar=True):
+        """Procesa un frame; devuelve (frame anotado o None, autos en zonas, autos detectados)."""
+        autos, _, conteos = self.analizar(frame, capturado_en)
+        return (self.anotar(frame) if anotar else None), int(conteos.sum()), len(autos)
+
+
+@functools.lru_cache(maxsize=16)
+def ventana_alerta(car_count):
+    """Ventana de alerta: roja con autos en zona, verde si está libre (cacheada por conteo: no modificarla)."""
     alert_bg = np.zeros((ALERT_H, ALERT_W, 3), dtype=np.uint8)
     if car_count > 0:
         alert_bg[:] = (0, 0, 255)
@@ -183,20 +246,181 @@ while True:
     tx = (ALERT_W - tw) // 2
     ty = (ALERT_H + th) // 2
     cv2.putText(alert_bg, text, (tx, ty), FONT, FONT_SCALE, (255, 255, 255), FONT_THICKNESS, cv2.LINE_AA)
-    cv2.imshow('Alerta', alert_bg)
-
-    # Mostrar frame de la cámara
-    cv2.imshow('Zona IP', display_frame)
-    
-    # Manejar teclas
-    key = cv2.waitKey(1) & 0xFF
-    if key == ord('q'):
-        break
-    elif key == ord('r'):
-        # Resetear a zona por defecto
-        ZONE = {'x1': 100, 'y1': 300, 'x2': 550, 'y2': 350}
-        print(f"Zona reseteada a valores por defecto: {ZONE}")
-
-# Liberar recursos
-cap.release()
-cv2.destroyAllWindows()
\ No newline at end of file
+    return alert_bg
+
+
+class SeleccionZona:
+    """Callback del mouse: click y arrastre para agregar una zona rectangular al detector."""
+
+    def __init__(self, detector):
+        self.detector = detector
+        self.drawing = False
+        self.temp_zone = None
+        self.ix, self.iy = -1, -1
+
+    def __call__(self, event, x, y, flags, param):
+        if event == cv2.EVENT_LBUTTONDOWN:
+            self.drawing = True
+            self.ix, self.iy = x, y
+            self.temp_zone = {'x1': x, 'y1': y, 'x2': x, 'y2': y}
+
+        elif event == cv2.EVENT_MOUSEMOVE:
+            if self.drawing:
+                self.temp_zone['x2'] = x
+                self.temp_zone['y2'] = y
+
+        elif event == cv2.EVENT_LBUTTONUP:
+            self.drawing = False
+            # Asegurar que x1,y1 sea la esquina superior izquierda
+            x1 = min(self.ix, x)
+            y1 = min(self.iy, y)
+            x2 = max(self.ix, x)
+            y2 = max(self.iy, y)
+
+            # Agregar la zona solo si tiene un tamaño mínimo
+            if abs(x2 - x1) > 20 and abs(y2 - y1) > 20:
+                zona = {'nombre': f"zona_{len(self.detector.zonas)}", 'x1': x1, 'y1': y1, 'x2': x2, 'y2': y2}
+                self.detector.agregar_zona(zona)
+                print(f"Nueva zona establecida: {zona}")
+            self.temp_zone = None
+
+
+def crear_subida_evidencia(subidor, varias_zonas, grabador=None):
+    """Callback de confirmación: codifica la foto una sola vez y la sube en segundo plano.
+
+    Con un GrabadorClips (clips.py) la foto sale junto con el clip cuando termina el post-roll.
+    """
+    def al_confirmar(nombre_zona, car_count, frame):
+        timestamp = time.strftime("%Y%m%d_%H%M%S")
+        jpeg = codificar_jpeg(frame, calidad=CALIDAD_JPEG, max_dim=MAX_DIM_FOTO)
+        mensaje = f'{car_count} auto{"s" if car_count > 1 else ""} {"infractores" if car_count > 0 else "en la plaza"}'
+        if varias_zonas():
+            mensaje += f' ({nombre_zona})'
+        nombre = f"infraccion_{timestamp}_{nombre_zona}.jpg"
+        if grabador is not None:
+            grabador.disparar(jpeg, {'mensaje': mensaje}, nombre)
+        else:
+            subidor.subir(jpeg, {'mensaje': mensaje}, nombre)
+    return al_confirmar
+
+
+def process_video(detector, cap, mostrar=True, controlador=None, sumideros=(), grabador=None):
+    """Lee la cámara, cuenta autos por zona y, si mostrar=True, dibuja la ventana y la alerta.
+
+    Con un ControladorTasa (controlador.py) el intervalo y la resolución se adaptan a la carga.
+    'sumideros' recibe también los frames anotados (p. ej. un canal de servidor_mjpeg.py).
+    'grabador' (GrabadorClips) recibe cada frame sin dibujar para el clip de las infracciones.
+    """
+    detector.calentar(forma_fuente(cap))  # La inferencia en frío se paga antes del primer frame real
+    seleccion = None
+    renderizador = Renderizador(([lambda imagen: cv2.imshow(VENTANA, imagen)] if mostrar else []) + list(sumideros))
+    if mostrar:
+        seleccion = SeleccionZona(detector)
+        cv2.namedWindow(VENTANA)
+        cv2.setMouseCallback(VENTANA, seleccion)
+        print("Detección de zona. Pulsa 'q' para salir.")
+        print("Haz clic y arrastra para agregar una zona restringida.")
+        print("Presiona 'r' para resetear las zonas, 'x' para borrar la última.")
+
+    try:
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                print("Error al leer el frame de la cámara.")
+                break
+
+            capturado_en = time.time()
+            if grabador is not None:
+                grabador.observar(frame, capturado_en)  # Antes de analizar: el clip incluye el frame que confirma
+
+            # Sin ventana ni espectadores no se dibuja nada: solo conteo por zona y evidencia
+            _, car_count, _ = (controlador or detector).process_frame(frame, capturado_en, anotar=False)
+            zona_temporal = seleccion.temp_zone if seleccion is not None else None
+            renderizador.publicar(renderizador.renderizar(detector.anotar, frame, zona_temporal))
+            if not mostrar:
+                continue
+
+            # Ventana de alerta; el frame anotado ya se mostró (búfer reutilizado, capa de zonas cacheada)
+            cv2.imshow('Alerta', ventana_alerta(car_count))
+
+            # Manejar teclas
+            key = cv2.waitKey(1) & 0xFF
+            if key == ord('q'):
+                break
+            elif key == ord('r'):
+                detector.reiniciar_zonas()
+                print("Zonas reseteadas a los valores iniciales")
+            elif key == ord('x') and detector.zonas:
+                detector.set_zonas(detector.zonas[:-1])
+                print("Última zona borrada")
+    except KeyboardInterrupt:
+        print("Deteniendo...")
+
+    # Liberar recursos
+    cap.release()
+    if mostrar:
+        cv2.destroyAllWindows()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Detección de autos en zonas restringidas")
+    parser.add_argument("--config", help="JSON de cámaras (entradas con \"tipo\": \"zona\"); sin ventana salvo --mostrar")
+    parser.add_argument("--camara", help="Nombre de la cámara de la config (por defecto la primera de tipo zona)")
+    parser.add_argument("--mostrar", action="store_true", help="Mostrar las ventanas también con --config")
+    parser.add_argument("--modelo", default=MODEL_PATH, help="Ruta del modelo YOLO")
+    parser.add_argument("--backend", default=BACKEND, choices=["pytorch", "onnx", "onnx-int8"],
+                        help="Motor de inferencia")
+    parser.add_argument("--verificar", action="store_true",
+                        help="Solo validar la config y salir (no carga cv2 ni el modelo)")
+    parser.add_argument("--stream", type=int, default=None, metavar="PUERTO",
+                        help="Servir los frames anotados como MJPEG en http://<host>:PUERTO/")
+    args = parser.parse_args()
+
+    camara = {'fuente': '0', 'nombre': 'zona'}  # Cámara de la PC por defecto
+    mostrar = True
+    if args.config:
+        camaras = [c for c in cargar_camaras(args.config) if c['tipo'] == 'zona']
+        if args.camara:
+            camaras = [c for c in camaras if c['nombre'] == args.camara]
+        if not camaras:
+            print(f"Error: No hay cámaras de zona en {args.config}")
+            return
+        camara = camaras[0]
+        mostrar = args.mostrar
+
+    zonas = camara.get('zonas') or ([camara['zona']] if 'zona' in camara else [ZONE])
+    if args.verificar:
+        nombres = [zona['nombre'] for zona in normalizar_zonas(zonas)]
+        print(f"Config válida: se usaría '{camara['nombre']}' ({camara['fuente']}) con zonas {', '.join(nombres)}")
+        return
+
+    cliente = ClienteAPI(spool_dir=os.path.join(SPOOL_DIR, camara['nombre'])).iniciar()  # Spool propio de la cámara
+    subidor = SubidorEvidencia(cliente, API_URL, archivo_dir=fotos_dir if ARCHIVAR_FOTOS else None)
+    detector = ZoneViolationDetector(
+        args.modelo,
+        zonas=zonas,
+        backend=args.backend,
+        modo_roi=camara.get('modo_roi', True),
+        imgsz_roi=camara.get('imgsz_roi', 320),
+        intervalo_deteccion=camara.get('intervalo_deteccion', 3),
+        tiempo_estable=camara.get('tiempo_estable_s', 3.0),
+        nombre=camara['nombre'],
+    )
+    grabador = GrabadorClips(subidor, CLIP_PRE_S, CLIP_POST_S, CLIP_FPS, nombre=camara['nombre']) if CLIPS else None
+    detector.al_confirmar = crear_subida_evidencia(subidor, lambda: len(detector.zonas) > 1, grabador)
+
+    cap = abrir_fuente(camara['fuente'])
+    if not cap.isOpened():
+        print("Error al abrir la cámara.")
+        cliente.detener()
+        return
+    servidor = ServidorMJPEG(args.stream).iniciar() if args.stream else None
+    process_video(detector, cap, mostrar, crear_controlador(camara, detector),
+                  [servidor.canal(camara['nombre'])] if servidor else (), grabador)
+    if servidor is not None:
+        servidor.detener()
+    cliente.detener()
+
+
+if __name__ == "__main__":
+    main()
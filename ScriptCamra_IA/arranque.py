@@ -0,0 +1,38 @@
+import importlib.util
+import sys
+import time
+
+# Arranque rápido de los scripts de cámara: las dependencias pesadas (cv2, requests)
+# se importan recién cuando se usan por primera vez, así que un --help o una
+# verificación de la config no las cargan. También se mide el tiempo desde el
+# arranque hasta el primer frame procesado, que es lo que tarda un trabajador
+# reiniciado en volver a reportar.
+
+INICIO = time.perf_counter()  # Aproxima el arranque del proceso: los scripts importan este módulo primero
+_primer_frame = set()
+
+
+def importar_diferido(nombre):
+    """Módulo que se carga en el primer acceso a uno de sus atributos (importlib.util.LazyLoader)."""
+    if nombre in sys.modules:
+        return sys.modules[nombre]
+    spec = importlib.util.find_spec(nombre)
+    if spec is None:
+        raise ImportError(f"No se encontró el módulo {nombre}")
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    modulo = importlib.util.module_from_spec(spec)
+    sys.modules[nombre] = modulo
+    loader.exec_module(modulo)
+    return modulo
+
+
+def reportar_primer_frame(camara):
+    """Registra una sola vez por cámara los segundos desde el arranque hasta su primer frame procesado."""
+    if camara in _primer_frame:
+        return
+    _primer_frame.add(camara)
+    segundos = time.perf_counter() - INICIO
+    from metricas import METRICAS
+    METRICAS.fijar("primer_frame_segundos", round(segundos, 3), camara=camara)
+    print(f"[{camara}] Primer frame procesado a los {segundos:.2f}s del arranque")
@@ -0,0 +1,79 @@
+import argparse
+import copy
+import timeit
+
+import numpy as np
+
+from intervalos import espacios_disponibles
+
+# Micro-benchmark: motor de intervalos con NumPy contra el ordenamiento y fusión en
+# Python que usaba calculate_available_space (listas de dicts con 'bbox').
+
+
+def espacio_disponible_anterior(cars, frame_width, pixels_per_meter, min_parking_space):
+    """Implementación anterior (modifica los bbox de la entrada al fusionar)."""
+    cars_sorted = sorted(cars, key=lambda v: v['center_x'])
+    merged_boxes = []
+    current_box = cars_sorted[0]['bbox']
+    for car in cars_sorted[1:]:
+        x1, _, x2, _ = current_box
+        next_x1, _, next_x2, _ = car['bbox']
+        if next_x1 <= x2 + 10:
+            current_box[2] = max(x2, next_x2)
+        else:
+            merged_boxes.append(current_box)
+            current_box = car['bbox']
+    merged_boxes.append(current_box)
+
+    available_segments = []
+    start_x = 0
+    for box in merged_boxes:
+        x1, _, x2, _ = box
+        gap_meters = (x1 - start_x) / pixels_per_meter
+        if gap_meters >= min_parking_space:
+            available_segments.append((start_x, x1, gap_meters))
+        start_x = x2
+    gap_meters = (frame_width - start_x) / pixels_per_meter
+    if gap_meters >= min_parking_space:
+        available_segments.append((start_x, frame_width, gap_meters))
+    return sum(segment[2] for segment in available_segments), available_segments
+
+
+def generar_cajas(n, frame_width, semilla=0):
+    """Extensiones x aleatorias de n autos de 40 a 160 píxeles de ancho."""
+    rng = np.random.default_rng(semilla)
+    x1 = rng.integers(0, frame_width - 160, n)
+    x2 = x1 + rng.integers(40, 160, n)
+    return np.stack([x1, x2], axis=1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara el motor de intervalos con la versión anterior")
+    parser.add_argument("--cajas", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--repeticiones", type=int, default=200)
+    args = parser.parse_args()
+
+    pixels_per_meter, min_metros = 10.0, 4.0
+    print(f"{'Cajas':>6} {'Anterior (us)':>14} {'NumPy (us)':>11} {'Aceleración':>12}")
+    for n in args.cajas:
+        frame_width = max(1280, n * 20)
+        extensiones = generar_cajas(n, frame_width)
+        cars = [{'bbox': [int(x1), 0, int(x2), 0], 'center_x': int((x1 + x2) // 2)}
+                for x1, x2 in extensiones]
+
+        # La versión anterior modifica sus entradas, así que cada corrida usa una copia
+        copias = [copy.deepcopy(cars) for _ in range(args.repeticiones)]
+        t_anterior = timeit.timeit(
+            lambda: espacio_disponible_anterior(copias.pop(), frame_width, pixels_per_meter, min_metros),
+            number=args.repeticiones)
+        t_numpy = timeit.timeit(
+            lambda: espacios_disponibles(extensiones, 0, frame_width, pixels_per_meter, min_metros),
+            number=args.repeticiones)
+
+        us_anterior = t_anterior / args.repeticiones * 1e6
+        us_numpy = t_numpy / args.repeticiones * 1e6
+        print(f"{n:>6} {us_anterior:>14.1f} {us_numpy:>11.1f} {us_anterior / us_numpy:>11.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+import argparse
+import csv
+import json
+import math
+import subprocess
+import sys
+import time
+
+import cv2
+import numpy as np
+
+import parqueos
+from multicamara import abrir_fuente, cargar_camaras, crear_detector, forma_fuente
+
+# Banco de pruebas sin ventana: reproduce videos grabados a máxima velocidad o a ritmo
+# real, con la calibración tomada del archivo de cámaras, y mide velocidad, latencia,
+# memoria y error del espacio disponible contra etiquetas manuales. El resultado va a
+# JSON para comparar entre commits.
+#
+# Archivo de casos: el mismo formato que multicamara.py (camaras_ejemplo.json) con
+# "fuente" apuntando a un video y, opcionalmente, "verdad": CSV con columnas
+# frame,espacio_disponible (metros, frame contado desde 0).
+
+PERCENTILES = (50, 95, 99)
+
+
+def memoria_pico_mb():
+    """Memoria residente máxima del proceso en MB (None si el sistema no la expone)."""
+    try:
+        import resource
+    except ImportError:
+        try:
+            import psutil
+            return round(psutil.Process().memory_info().peak_wset / 2**20, 1)  # Windows
+        except (ImportError, AttributeError):
+            return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reporta KB, macOS bytes
+    return round(pico / (2**20 if sys.platform == "darwin" else 2**10), 1)
+
+
+def cargar_verdad(ruta):
+    """Lee el CSV de etiquetas: {frame: espacio_disponible en metros}."""
+    with open(ruta, newline="", encoding="utf-8") as f:
+        return {int(fila["frame"]): float(fila["espacio_disponible"]) for fila in csv.DictReader(f)}
+
+
+def resumen_latencias(latencias_ms):
+    if not latencias_ms:
+        return {}
+    valores = np.asarray(latencias_ms)
+    resumen = {f"p{p}": round(float(v), 2) for p, v in zip(PERCENTILES, np.percentile(valores, PERCENTILES))}
+    resumen["media"] = round(float(valores.mean()), 2)
+    resumen["max"] = round(float(valores.max()), 2)
+    return resumen
+
+
+def resumen_error(pares):
+    """Error absoluto del espacio disponible (estimado, etiquetado) en metros."""
+    if not pares:
+        return {"n": 0}
+    estimado, verdad = np.asarray(pares, dtype=float).T
+    error = np.abs(estimado - verdad)
+    return {
+        "n": len(pares),
+        "mae_m": round(float(error.mean()), 3),
+        "rmse_m": round(float(math.sqrt((error ** 2).mean())), 3),
+        "max_m": round(float(error.max()), 3),
+    }
+
+
+def reproducir(camara, detector, ritmo_real=False, max_frames=None, anotar=False):
+    """Reproduce un video por el detector y devuelve las mediciones del caso."""
+    cap = abrir_fuente(camara["fuente"])
+    if not cap.isOpened():
+        raise RuntimeError(f"[{camara['nombre']}] No se pudo abrir {camara['fuente']}")
+    fps_video = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    verdad = cargar_verdad(camara["verdad"]) if camara.get("verdad") else {}
+    detector.calentar(forma_fuente(cap))  # Fuera de la medición: las latencias son de régimen
+
+    latencias_ms = []
+    pares_error = []
+    ultimo_espacio = None
+    descartados = 0
+    indice = 0
+    inicio = time.perf_counter()
+    while max_frames is None or indice < max_frames:
+        if ritmo_real:
+            # Como una cámara en vivo: si el procesamiento va atrasado, los frames vencidos se saltan
+            atraso = time.perf_counter() - inicio - indice / fps_video
+            if atraso > 1 / fps_video:
+                if not cap.grab():
+                    break
+                descartados += 1
+                if indice in verdad and ultimo_espacio is not None:
+                    pares_error.append((ultimo_espacio, verdad[indice]))
+                indice += 1
+                continue
+            if atraso < 0:
+                time.sleep(-atraso)
+        ret, frame = cap.read()
+        if not ret:
+            break
+        t0 = time.perf_counter()
+        _, ultimo_espacio, _ = detector.process_frame(frame, anotar=anotar)
+        latencias_ms.append((time.perf_counter() - t0) * 1000)
+        if indice in verdad:
+            pares_error.append((ultimo_espacio, verdad[indice]))
+        indice += 1
+    duracion = time.perf_counter() - inicio
+    cap.release()
+
+    return {
+        "nombre": camara["nombre"],
+        "fuente": str(camara["fuente"]),
+        "frames_leidos": indice,
+        "frames_procesados": len(latencias_ms),
+        "frames_descartados": descartados,
+        "fps": round(len(latencias_ms) / duracion, 2) if duracion > 0 else 0.0,
+        "primer_frame_ms": round(latencias_ms[0], 2) if latencias_ms else None,
+        "latencia_ms": resumen_latencias(latencias_ms),
+        "error_espacio": resumen_error(pares_error),
+        "compuerta": detector.metricas(),
+        "memoria_pico_mb": memoria_pico_mb(),
+    }
+
+
+def commit_actual():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"],
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def comparar(actual, base, ruta_base):
+    """Imprime la diferencia de FPS, p95 y error contra un resultado anterior."""
+    base = {caso["nombre"]: caso for caso in base["casos"]}
+    print(f"Comparación contra {ruta_base}:")
+    for caso in actual["casos"]:
+        anterior = base.get(caso["nombre"])
+        if anterior is None:
+            continue
+        p95, p95_base = caso["latencia_ms"].get("p95"), anterior["latencia_ms"].get("p95")
+        mae, mae_base = caso["error_espacio"].get("mae_m"), anterior["error_espacio"].get("mae_m")
+        linea = f"  {caso['nombre']}: FPS {anterior['fps']} -> {caso['fps']}"
+        if p95 is not None and p95_base is not None:
+            linea += f" | p95 {p95_base} -> {p95} ms"
+        if mae is not None and mae_base is not None:
+            linea += f" | MAE {mae_base} -> {mae} m"
+        print(linea)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Banco de pruebas del detector de espacio sobre videos grabados")
+    parser.add_argument("casos", help="JSON de cámaras con 'fuente' = video y 'verdad' = CSV opcional")
+    parser.add_argument("--modelo", default="models/yolov8n.pt", help="Ruta del modelo YOLO")
+    parser.add_argument("--backend", default="pytorch", choices=["pytorch", "onnx", "onnx-int8"],
+                        help="Motor de inferencia")
+    parser.add_argument("--ritmo-real", action="store_true",
+                        help="Reproducir a la velocidad del video (saltando frames atrasados)")
+    parser.add_argument("--anotar", action="store_true", help="Incluir el dibujo de la anotación en la medición")
+    parser.add_argument("--max-frames", type=int, default=None, help="Frames por video como máximo")
+    parser.add_argument("--salida", default="benchmark.json", help="Archivo JSON de resultados")
+    parser.add_argument("--comparar", help="JSON de una corrida anterior para ver la diferencia")
+    args = parser.parse_args()
+
+    # Sin ventana: la calibración viene del archivo, no de mouse_callback
+    camaras = [camara for camara in cargar_camaras(args.casos) if camara["tipo"] == "parqueo"]
+    base = None
+    if args.comparar:
+        # Se lee antes de correr por si --salida apunta al mismo archivo
+        with open(args.comparar, encoding="utf-8") as f:
+            base = json.load(f)
+    resultado = {
+        "commit": commit_actual(),
+        "fecha": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "backend": args.backend,
+        "modo": "ritmo_real" if args.ritmo_real else "maximo",
+        "anotado": args.anotar,
+        "casos": [],
+    }
+    for camara in camaras:
+        detector = crear_detector(camara, parqueos, args.modelo, backend=args.backend)
+        caso = reproducir(camara, detector, args.ritmo_real, args.max_frames, args.anotar)
+        resultado["casos"].append(caso)
+        lat = caso["latencia_ms"]
+        print(f"[{caso['nombre']}] {caso['frames_procesados']} frames | {caso['fps']} FPS "
+              f"| p50 {lat.get('p50')} ms, p95 {lat.get('p95')} ms, p99 {lat.get('p99')} ms "
+              f"| MAE {caso['error_espacio'].get('mae_m')} m | RSS pico {caso['memoria_pico_mb']} MB")
+    resultado["memoria_pico_mb"] = memoria_pico_mb()
+
+    with open(args.salida, "w", encoding="utf-8") as f:
+        json.dump(resultado, f, indent=2, ensure_ascii=False)
+    print(f"Resultados guardados en {args.salida}")
+    if base is not None:
+        comparar(resultado, base, args.comparar)
+
+
+if __name__ == "__main__":
+    main()
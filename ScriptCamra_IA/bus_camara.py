@@ -0,0 +1,316 @@
+import argparse
+import multiprocessing as mp
+import os
+import threading
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from postproceso import TRACK_DTYPE
+
+# Una sola captura y una sola inferencia por cámara, compartidas por varios analizadores
+# (espacio disponible, zona restringida, ...). El productor escribe cada frame y sus
+# detecciones en un anillo de memoria compartida; los consumidores leen vistas sobre ese
+# mismo buffer, sin copiar el frame ni repetir la inferencia.
+#
+# Cada ranura se protege con un número de secuencia (seqlock): el productor lo pone en -1
+# mientras escribe y luego publica el nuevo valor. Un consumidor que tardó más de lo que
+# el productor en dar la vuelta al anillo lo detecta con vigente() y descarta el resultado.
+# Los analizadores que guardan el frame (evidencia, clips) lo copian primero a un búfer
+# propio y validan la copia, así nunca trabajan sobre una ranura que se está reescribiendo.
+
+CONTROL_DTYPE = np.dtype([('seq', np.int64), ('fin', np.int64)])
+RANURA_DTYPE = np.dtype([('seq', np.int64), ('capturado_en', np.float64), ('n', np.int64)])
+ALINEACION = 64
+
+
+def _alinear(n):
+    return (n + ALINEACION - 1) // ALINEACION * ALINEACION
+
+
+def _dueno_tracker():
+    """PID del proceso que arrancó el resource_tracker que usa este proceso (el padre si lo heredó con spawn)."""
+    from multiprocessing import resource_tracker
+    tracker = resource_tracker._resource_tracker
+    if getattr(tracker, "_pid", None) is not None:
+        return os.getpid()
+    if getattr(tracker, "_fd", None) is not None:
+        return os.getppid()
+    return None
+
+
+def _adjuntar(nombre, tracker_creador=None):
+    """Abre un segmento existente sin que el resource_tracker de este proceso lo borre al salir."""
+    try:
+        return shared_memory.SharedMemory(name=nombre, track=False)  # Python 3.13+
+    except TypeError:
+        from multiprocessing import resource_tracker
+        shm = shared_memory.SharedMemory(name=nombre)
+        # Con spawn el hijo usa el tracker del padre: si es el mismo que el del creador, el registro
+        # es uno solo y lo quita el unlink() del creador; quitarlo acá haría fallar ese unlink()
+        if tracker_creador is None or tracker_creador != _dueno_tracker():
+            resource_tracker.unregister(shm._name, "shared_memory")
+        return shm
+
+
+class AnilloFrames:
+    """Anillo de 'ranuras' frames (alto, ancho, 3) uint8 con hasta max_detecciones tracks cada uno."""
+
+    def __init__(self, nombre, forma, ranuras=8, max_detecciones=128, crear=False, tracker=None):
+        self.forma = tuple(forma)
+        self.ranuras = ranuras
+        self.max_detecciones = max_detecciones
+        tam_control = _alinear(CONTROL_DTYPE.itemsize)
+        tam_meta = _alinear(RANURA_DTYPE.itemsize * ranuras)
+        tam_dets = _alinear(TRACK_DTYPE.itemsize * ranuras * max_detecciones)
+        tam_frames = int(np.prod(self.forma)) * ranuras
+        total = tam_control + tam_meta + tam_dets + tam_frames
+        if crear:
+            self.shm = shared_memory.SharedMemory(name=nombre, create=True, size=total)
+        else:
+            self.shm = _adjuntar(nombre, tracker)
+        self.nombre = self.shm.name
+        self.creador = crear
+        self.tracker = _dueno_tracker() if crear else tracker
+        buf = self.shm.buf
+        self.control = np.ndarray((1,), dtype=CONTROL_DTYPE, buffer=buf, offset=0)
+        self.meta = np.ndarray((ranuras,), dtype=RANURA_DTYPE, buffer=buf, offset=tam_control)
+        self.dets = np.ndarray((ranuras, max_detecciones), dtype=TRACK_DTYPE, buffer=buf,
+                               offset=tam_control + tam_meta)
+        self.frames = np.ndarray((ranuras,) + self.forma, dtype=np.uint8, buffer=buf,
+                                 offset=tam_control + tam_meta + tam_dets)
+        if crear:
+            self.control[0] = (-1, 0)
+            self.meta['seq'] = -1
+
+    def descripcion(self):
+        """Lo necesario para adjuntarse desde otro proceso: AnilloFrames(**descripcion())."""
+        return {"nombre": self.nombre, "forma": self.forma, "ranuras": self.ranuras,
+                "max_detecciones": self.max_detecciones, "tracker": self.tracker}
+
+    def publicar(self, frame, detecciones, capturado_en):
+        """Escribe el frame y sus detecciones en la próxima ranura y la publica."""
+        seq = int(self.control['seq'][0]) + 1
+        i = seq % self.ranuras
+        n = min(len(detecciones), self.max_detecciones)
+        self.meta['seq'][i] = -1  # Ranura en escritura
+        self.frames[i] = frame
+        self.dets[i, :n] = detecciones[:n]
+        self.meta[i] = (seq, capturado_en, n)
+        self.control['seq'][0] = seq
+        return seq
+
+    def ultimo_seq(self):
+        return int(self.control['seq'][0])
+
+    def terminado(self):
+        return bool(self.control['fin'][0])
+
+    def terminar(self):
+        self.control['fin'][0] = 1
+
+    def leer(self, seq):
+        """(vista del frame, copia de las detecciones, capturado_en) de 'seq', o None si ya se sobrescribió."""
+        i = seq % self.ranuras
+        if int(self.meta['seq'][i]) != seq:
+            return None
+        n = int(self.meta['n'][i])
+        capturado_en = float(self.meta['capturado_en'][i])
+        dets = self.dets[i, :n].copy()  # Son pocas; el frame queda como vista sin copiar
+        if not self.vigente(seq):
+            return None
+        return self.frames[i], dets, capturado_en
+
+    def vigente(self, seq):
+        """True si la ranura de 'seq' todavía no fue reutilizada por el productor."""
+        return int(self.meta['seq'][seq % self.ranuras]) == seq
+
+    def cerrar(self):
+        # Las vistas numpy deben soltarse antes de cerrar el segmento
+        self.control = self.meta = self.dets = self.frames = None
+        self.shm.close()
+        if self.creador:
+            self.shm.unlink()
+
+
+def producir(camara, model_path, backend, ranuras, cola_listo, intervalo_deteccion=1, imgsz=None):
+    """Proceso productor: captura, detecta con rastreador y publica en el anillo."""
+    from detectores import crear_backend
+    from multicamara import abrir_fuente
+    from rastreador import RastreadorIoU
+
+    cap = abrir_fuente(camara["fuente"])
+    ret, frame = cap.read()
+    if not ret:
+        cola_listo.put({"error": f"No se pudo leer de {camara['fuente']}"})
+        return
+    detector = crear_backend(backend, model_path)
+    detector.calentar(frame.shape, imgsz)
+    rastreador = RastreadorIoU(conf_alta=0.5)
+    anillo = AnilloFrames(f"anillo_{mp.current_process().pid}", frame.shape, ranuras=ranuras, crear=True)
+    cola_listo.put(anillo.descripcion())
+
+    frames = 0
+    try:
+        while ret:
+            capturado_en = time.time()
+            frames += 1
+            if frames % intervalo_deteccion == 0 or not rastreador.tracks or rastreador.incierto():
+                dets = detector.detectar([frame], (2,), rastreador.conf_baja, imgsz)[0]
+                tracks = rastreador.actualizar(dets)
+            else:
+                tracks = rastreador.predecir()
+            anillo.publicar(frame, tracks, capturado_en)
+            ret, frame = cap.read()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        anillo.terminar()
+        cap.release()
+        time.sleep(1.0)  # Margen para que los consumidores vean el fin antes de liberar
+        anillo.cerrar()
+
+
+class ConsumidorAnillo(threading.Thread):
+    """Hilo que entrega a 'analizar(frame, detecciones, capturado_en)' el frame más reciente del anillo."""
+
+    def __init__(self, anillo, analizar, nombre="consumidor", espera=0.002, copiar=False):
+        super().__init__(name=nombre, daemon=True)
+        self.anillo = anillo
+        self.analizar = analizar
+        # copiar=True: 'analizar' recibe una copia propia y validada del frame (para quien lo guarda o codifica)
+        self.copiar = copiar
+        self.copia = None
+        self.espera = espera  # Sondeo mientras no hay frame nuevo
+        self.ultimo = -1
+        self.procesados = 0
+        self.saltados = 0       # Frames que llegaron mientras se analizaba el anterior
+        self.sobrescritos = 0   # Frames reutilizados por el productor antes de terminar de leerlos
+        self.activo = True
+
+    def run(self):
+        while self.activo:
+            seq = self.anillo.ultimo_seq()
+            if seq <= self.ultimo:
+                if self.anillo.terminado():
+                    break
+                time.sleep(self.espera)
+                continue
+            if self.ultimo >= 0:
+                self.saltados += seq - self.ultimo - 1
+            self.ultimo = seq
+            lectura = self.anillo.leer(seq)
+            if lectura is None:
+                self.sobrescritos += 1
+                continue
+            frame, detecciones, capturado_en = lectura
+            if self.copiar:
+                if self.copia is None:
+                    self.copia = np.empty_like(frame)
+                np.copyto(self.copia, frame)
+                if not self.anillo.vigente(seq):
+                    self.sobrescritos += 1  # La ranura cambió durante la copia: se descarta
+                    continue
+                frame = self.copia
+            self.analizar(frame, detecciones, capturado_en)
+            if not self.copiar and not self.anillo.vigente(seq):
+                self.sobrescritos += 1  # El frame cambió durante el análisis (anillo muy chico)
+            self.procesados += 1
+
+    def detener(self):
+        self.activo = False
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Una captura e inferencia por cámara para varios análisis")
+    parser.add_argument("config", help="JSON de cámaras; las entradas con la misma 'fuente' comparten productor")
+    parser.add_argument("--modelo", default="models/yolov8n.pt", help="Ruta del modelo YOLO")
+    parser.add_argument("--backend", default="pytorch", choices=["pytorch", "onnx", "onnx-int8"],
+                        help="Motor de inferencia")
+    parser.add_argument("--ranuras", type=int, default=8, help="Frames en el anillo de memoria compartida")
+    args = parser.parse_args()
+
+    import parqueos
+    from apiFinalMovil import (API_URL, ARCHIVAR_FOTOS, CLIP_FPS, CLIP_POST_S, CLIP_PRE_S, CLIPS, ZoneViolationDetector,
+                               crear_subida_evidencia, fotos_dir)
+    from clips import GrabadorClips
+    from evidencia import SubidorEvidencia
+    from multicamara import cargar_camaras, crear_detector
+    from reportero import ReporteOcupacion
+
+    fuentes = {}
+    camaras = cargar_camaras(args.config)
+    for camara in camaras:
+        fuentes.setdefault(str(camara["fuente"]), []).append(camara)
+
+    ctx = mp.get_context("spawn")
+    productores, consumidores, anillos = [], [], []
+    cliente = parqueos.cliente_api("bus_" + "+".join(camara["nombre"] for camara in camaras))
+    subidor = SubidorEvidencia(cliente, API_URL, archivo_dir=fotos_dir if ARCHIVAR_FOTOS else None)
+    for fuente, entradas in fuentes.items():
+        cola_listo = ctx.Queue()
+        intervalo = min(c.get("intervalo_deteccion", 1) for c in entradas)
+        p = ctx.Process(target=producir, args=(entradas[0], args.modelo, args.backend, args.ranuras, cola_listo,
+                                               intervalo), name=f"productor-{fuente}", daemon=True)
+        p.start()
+        listo = cola_listo.get()
+        if "error" in listo:
+            print(f"[{fuente}] {listo['error']}")
+            continue
+        anillo = AnilloFrames(**listo)
+        productores.append(p)
+        anillos.append(anillo)
+
+        for camara in entradas:
+            # Los analizadores no cargan modelo: reciben las detecciones del productor
+            if camara["tipo"] == "parqueo":
+                detector = crear_detector(camara, parqueos, args.modelo, backend=None)
+                reporte = ReporteOcupacion(
+                    lambda espacio, espacios, plazas=None, camara=camara, detector=detector: parqueos.enviar_ocupacion(
+                        camara["parqueo_id"], espacio, espacios, detector.last_capturado_en, plazas),
+                    nombre=camara["nombre"])
+
+                def analizar(frame, dets, capturado_en, detector=detector, reporte=reporte):
+                    detector.analizar(frame, capturado_en, detecciones=dets)
+                    reporte.observar(detector.last_espacio_disponible, detector.last_espacios,
+                                     plazas=detector.estado_plazas())
+            else:
+                detector = ZoneViolationDetector(args.modelo, zonas=camara.get("zonas") or [camara["zona"]],
+                                                 backend=None, nombre=camara["nombre"],
+                                                 tiempo_estable=camara.get("tiempo_estable_s", 3.0))
+                grabador = (GrabadorClips(subidor, CLIP_PRE_S, CLIP_POST_S, CLIP_FPS, nombre=camara["nombre"])
+                            if CLIPS else None)
+                detector.al_confirmar = crear_subida_evidencia(subidor, lambda d=detector: len(d.zonas) > 1, grabador)
+
+                def analizar(frame, dets, capturado_en, detector=detector, grabador=grabador):
+                    if grabador is not None:
+                        grabador.observar(frame, capturado_en)
+                    detector.analizar(frame, capturado_en, detecciones=dets)
+            # Las zonas guardan el frame como evidencia y en el clip: trabajan sobre una copia
+            consumidor = ConsumidorAnillo(anillo, analizar, nombre=camara["nombre"], copiar=camara["tipo"] == "zona")
+            consumidor.start()
+            consumidores.append(consumidor)
+        print(f"[{fuente}] 1 captura e inferencia para {len(entradas)} análisis: "
+              f"{', '.join(c['nombre'] for c in entradas)}")
+
+    try:
+        for consumidor in consumidores:
+            consumidor.join()
+    except KeyboardInterrupt:
+        print("Deteniendo...")
+        for consumidor in consumidores:
+            consumidor.detener()
+    for consumidor in consumidores:
+        consumidor.join()
+        print(f"[{consumidor.name}] Procesados: {consumidor.procesados} | Saltados: {consumidor.saltados} "
+              f"| Sobrescritos: {consumidor.sobrescritos}")
+    for anillo in anillos:
+        anillo.cerrar()
+    for p in productores:
+        p.join(timeout=5)
+    parqueos.cliente_api().detener()
+
+
+if __name__ == "__main__":
+    main()
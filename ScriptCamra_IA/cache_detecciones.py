@@ -0,0 +1,58 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+# Memoización de detecciones: un frame idéntico a uno ya inferido (imagen estática,
+# video en pausa, el mismo frame reprocesado tras recalibrar) devuelve las mismas
+# cajas sin volver a correr YOLO. La clave es una huella barata del frame: un hash
+# del frame submuestreado sin promediar, así que cualquier diferencia de ruido entre
+# dos frames reales de cámara cambia la huella y no se reutilizan cajas viejas.
+
+PASO_HUELLA = 4  # Se toma 1 de cada PASO_HUELLA píxeles en cada eje
+
+
+def huella_frame(frame, paso=PASO_HUELLA):
+    """Hash de 16 bytes del frame submuestreado (incluye la forma)."""
+    muestra = np.ascontiguousarray(frame[::paso, ::paso])
+    h = hashlib.blake2b(muestra.data, digest_size=16)
+    h.update(str(frame.shape).encode())
+    return h.digest()
+
+
+class CacheDetecciones:
+    """LRU chico de detecciones por clave (huella del frame, recorte, resolución)."""
+
+    def __init__(self, capacidad=8):
+        self.capacidad = capacidad
+        self.entradas = OrderedDict()
+        self.lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+
+    def obtener(self, clave):
+        with self.lock:
+            detecciones = self.entradas.get(clave)
+            if detecciones is None:
+                self.fallos += 1
+                return None
+            self.entradas.move_to_end(clave)
+            self.aciertos += 1
+        return detecciones.copy()  # Quien la recibe puede modificarla (p. ej. desplazar)
+
+    def guardar(self, clave, detecciones):
+        with self.lock:
+            self.entradas[clave] = detecciones.copy()
+            self.entradas.move_to_end(clave)
+            while len(self.entradas) > self.capacidad:
+                self.entradas.popitem(last=False)
+
+    def metricas(self):
+        consultas = self.aciertos + self.fallos
+        return {
+            "aciertos": self.aciertos,
+            "fallos": self.fallos,
+            "tasa_aciertos": self.aciertos / consultas if consultas else 0.0,
+            "entradas": len(self.entradas),
+        }
@@ -0,0 +1,235 @@
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+
+from arranque import importar_diferido
+from metricas import METRICAS
+
+requests = importar_diferido("requests")  # Se carga con la primera petición
+
+# Cliente HTTP en segundo plano para los scripts de cámara: sesión persistente,
+# cola de salida acotada, reintentos con retroceso exponencial y un spool en disco
+# (solo se agrega al final) para cuando el API no responde.
+
+SPOOL_DIR = "spool"
+
+
+class ClienteAPI:
+    def __init__(self, spool_dir=SPOOL_DIR, max_cola=256, timeout=5, reintentos=3,
+                 espera_base=0.5, espera_max=30.0, reintento_spool_s=10.0):
+        self.spool_dir = spool_dir
+        self.spool_path = os.path.join(spool_dir, "salida.jsonl")
+        self.timeout = timeout
+        self.reintentos = reintentos
+        self.espera_base = espera_base
+        self.espera_max = espera_max
+        self.reintento_spool_s = reintento_spool_s
+        self.cola = queue.Queue(maxsize=max_cola)
+        self.lock_spool = threading.Lock()
+        self.hilo = None
+        self.activo = False
+        self.desconectado = os.path.exists(self.spool_path)  # Hay pendientes de una corrida anterior
+        self.proximo_reintento = 0.0
+        self.enviados = 0
+        self.fallidos = 0
+        self.encolados_spool = 0
+
+        self.session = requests.Session()
+        adaptador = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=8)
+        self.session.mount("http://", adaptador)
+        self.session.mount("https://", adaptador)
+        METRICAS.registrar_fuente("api", self.estadisticas)
+
+    def iniciar(self):
+        if self.hilo is None:
+            self.activo = True
+            self.hilo = threading.Thread(target=self._bucle, name="cliente-api", daemon=True)
+            self.hilo.start()
+        return self
+
+    def detener(self, timeout=10):
+        """Espera a vaciar la cola (lo que no se pueda enviar queda en el spool)."""
+        if self.hilo is not None:
+            self.activo = False
+            self.cola.put(None)
+            self.hilo.join(timeout)
+            self.hilo = None
+        self.session.close()
+
+    def estadisticas(self):
+        return {"enviados": self.enviados, "fallidos": self.fallidos, "encolados_spool": self.encolados_spool,
+                "en_cola": self.cola.qsize(), "desconectado": self.desconectado}
+
+    def enviar(self, metodo, url, json=None, data=None, archivos=None, clave_colapso=None, capturado_en=None):
+        """Encola una petición sin bloquear; si la cola está llena va directo al spool.
+
+        archivos: {campo: (nombre, bytes, tipo_mime)}. clave_colapso: peticiones con la
+        misma clave se reemplazan por la última al reenviar el spool (p. ej. un parqueo).
+        capturado_en: time.time() del frame de origen, para la métrica de edad del dato.
+        """
+        peticion = {
+            "id": uuid.uuid4().hex, "metodo": metodo, "url": url, "json": json, "data": data,
+            "archivos": archivos, "clave": clave_colapso, "creado": time.time(), "capturado_en": capturado_en,
+        }
+        try:
+            self.cola.put_nowait(peticion)
+        except queue.Full:
+            self._al_spool(peticion)
+            self.desconectado = True  # Lo que siga debe ir detrás de esta petición
+
+    def _bucle(self):
+        while True:
+            try:
+                peticion = self.cola.get(timeout=self.reintento_spool_s)
+            except queue.Empty:
+                peticion = False
+            if peticion is None:
+                break
+            if self.desconectado and time.time() >= self.proximo_reintento:
+                self._reenviar_spool()
+            if not peticion:
+                continue
+            if self.desconectado:
+                # Mientras haya pendientes, lo nuevo va detrás en el spool para respetar el orden
+                self._al_spool(peticion)
+            elif not self._enviar_con_reintentos(peticion):
+                self._al_spool(peticion)
+                self.desconectado = True
+        # Al detener: lo que quedó en la cola también se guarda
+        while not self.cola.empty():
+            peticion = self.cola.get_nowait()
+            if peticion:
+                self._al_spool(peticion)
+
+    def _enviar_una(self, peticion):
+        files = None
+        if peticion["archivos"]:
+            files = {campo: tuple(valor) for campo, valor in peticion["archivos"].items()}
+        with METRICAS.cronometro("http_segundos", metodo=peticion["metodo"]):
+            resp = self.session.request(peticion["metodo"], peticion["url"], json=peticion["json"],
+                                        data=peticion["data"], files=files, timeout=self.timeout)
+        if resp.status_code >= 500:
+            raise requests.HTTPError(f"{resp.status_code}", response=resp)
+        return resp
+
+    def _enviar_con_reintentos(self, peticion, reintentos=None):
+        reintentos = self.reintentos if reintentos is None else reintentos
+        for intento in range(reintentos + 1):
+            try:
+                resp = self._enviar_una(peticion)
+            except requests.RequestException as e:
+                respuesta = getattr(e, "response", None)
+                METRICAS.incrementar("http_peticiones", resultado=str(respuesta.status_code) if respuesta is not None
+                                     else "sin_respuesta")
+                if intento == reintentos:
+                    print(f"[API] Sin respuesta de {peticion['url']}: {e}")
+                    self.fallidos += 1
+                    return False
+                time.sleep(min(self.espera_base * 2 ** intento, self.espera_max))
+                continue
+            self.enviados += 1
+            METRICAS.incrementar("http_peticiones", resultado=str(resp.status_code))
+            if peticion.get("capturado_en") is not None:
+                # Frescura de punta a punta: captura del frame -> respuesta del API
+                edad = time.time() - peticion["capturado_en"]
+                METRICAS.observar("edad_frame_segundos", edad, clave=peticion["clave"] or "")
+                METRICAS.fijar("edad_frame_ultima_segundos", edad, clave=peticion["clave"] or "")
+            if resp.ok:
+                print(f"[API] {peticion['metodo']} {peticion['url']} -> {resp.status_code}")
+            else:
+                # Los 4xx no se reintentan: la petición es inválida, no el API caído
+                print(f"[API] Fallo {resp.status_code} en {peticion['url']}: {resp.text[:200]}")
+            return True
+
+    def _al_spool(self, peticion):
+        registro = dict(peticion)
+        if registro["archivos"]:
+            # Los binarios se guardan aparte; el JSONL solo lleva la ruta
+            os.makedirs(self.spool_dir, exist_ok=True)
+            archivos = {}
+            for campo, (nombre, contenido, mime) in registro["archivos"].items():
+                ruta = os.path.join(self.spool_dir, f"{registro['id']}_{campo}.bin")
+                with open(ruta, "wb") as f:
+                    f.write(contenido)
+                archivos[campo] = [nombre, ruta, mime]
+            registro["archivos"] = archivos
+        with self.lock_spool:
+            os.makedirs(self.spool_dir, exist_ok=True)
+            with open(self.spool_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(registro) + "\n")
+        self.encolados_spool += 1
+
+    def _leer_spool(self):
+        with self.lock_spool:
+            if not os.path.exists(self.spool_path):
+                return []
+            with open(self.spool_path, encoding="utf-8") as f:
+                return [json.loads(linea) for linea in f if linea.strip()]
+
+    def _reenviar_spool(self):
+        """Reenvía el spool en orden, quedándose solo con la última petición por clave."""
+        self.proximo_reintento = time.time() + self.reintento_spool_s
+        registros = self._leer_spool()
+        pendientes = colapsar(registros)
+        ids_pendientes = {registro["id"] for registro in pendientes}
+        for registro in registros:
+            if registro["id"] not in ids_pendientes:
+                self._borrar_binarios(registro)
+        for i, registro in enumerate(pendientes):
+            peticion = dict(registro)
+            if peticion["archivos"]:
+                archivos = {}
+                for campo, (nombre, ruta, mime) in peticion["archivos"].items():
+                    with open(ruta, "rb") as f:
+                        archivos[campo] = (nombre, f.read(), mime)
+                peticion["archivos"] = archivos
+            if not self._enviar_con_reintentos(peticion, reintentos=0):
+                self._reescribir_spool(pendientes[i:], len(registros))
+                return
+            self._borrar_binarios(registro)
+        # Si llegaron peticiones al spool mientras se reenviaba, se sigue desconectado
+        self.desconectado = self._reescribir_spool([], len(registros))
+        if pendientes:
+            print(f"[API] Reconectado: {len(pendientes)} peticiones del spool reenviadas")
+
+    def _reescribir_spool(self, registros, leidos):
+        """Deja en el spool 'registros' más lo que se agregó después de leer 'leidos' líneas."""
+        with self.lock_spool:
+            nuevos = []
+            if os.path.exists(self.spool_path):
+                with open(self.spool_path, encoding="utf-8") as f:
+                    nuevos = [linea for linea in f if linea.strip()][leidos:]
+            if not registros and not nuevos:
+                if os.path.exists(self.spool_path):
+                    os.remove(self.spool_path)
+                return False
+            temporal = self.spool_path + ".tmp"
+            with open(temporal, "w", encoding="utf-8") as f:
+                for registro in registros:
+                    f.write(json.dumps(registro) + "\n")
+                f.writelines(nuevos)
+            os.replace(temporal, self.spool_path)
+            return True
+
+    def _borrar_binarios(self, registro):
+        for _, ruta, _ in (registro["archivos"] or {}).values():
+            if os.path.exists(ruta):
+                os.remove(ruta)
+
+
+def colapsar(registros):
+    """Deja solo la última petición de cada clave_colapso, en el orden de esa última aparición."""
+    ultima = {}
+    for i, registro in enumerate(registros):
+        if registro.get("clave"):
+            ultima[registro["clave"]] = i
+    resultado = []
+    for i, registro in enumerate(registros):
+        clave = registro.get("clave")
+        if clave and ultima[clave] != i:
+            continue
+        resultado.append(registro)
+    return resultado
@@ -0,0 +1,149 @@
+import math
+import os
+import queue
+import tempfile
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from arranque import importar_diferido
+from evidencia import codificar_jpeg
+from metricas import METRICAS
+
+cv2 = importar_diferido("cv2")
+
+# Clips de video para las infracciones. Cada cámara guarda en memoria los últimos
+# segundos como JPEG (no frames crudos), así que la memoria queda acotada por
+# pre_roll + post_roll sin importar la resolución de la cámara. El bucle de la cámara
+# solo copia el frame a un búfer; la codificación ocurre en el hilo del grabador.
+# Cuando se confirma una infracción, otro hilo espera el post-roll, arma el clip con
+# los frames de [t - pre_roll, t + post_roll] y lo sube junto con la foto en la misma
+# petición.
+
+FOURCC = "mp4v"
+MIME_VIDEO = "video/mp4"
+
+
+class AnilloJPEG:
+    """Últimos 'segundos' de una cámara como (instante, jpeg), a lo sumo 'fps' por segundo."""
+
+    def __init__(self, segundos, fps=8, calidad=70, max_dim=640):
+        self.fps = fps
+        self.calidad = calidad
+        self.max_dim = max_dim
+        self.frames = deque(maxlen=math.ceil(segundos * fps) + 2)  # Tope fijo de memoria
+        self.lock = threading.Lock()
+        self.ultimo = None
+
+    def agregar(self, frame, ahora=None):
+        """Codifica y guarda el frame si pasó 1/fps desde el anterior; si no, no hace nada."""
+        ahora = time.time() if ahora is None else ahora
+        if self.ultimo is not None and ahora - self.ultimo < 1 / self.fps:
+            return
+        self.ultimo = ahora
+        jpeg = codificar_jpeg(frame, self.calidad, self.max_dim)
+        with self.lock:
+            self.frames.append((ahora, jpeg))
+
+    def entre(self, desde, hasta):
+        with self.lock:
+            return [(t, jpeg) for t, jpeg in self.frames if desde <= t <= hasta]
+
+    def bytes_en_memoria(self):
+        with self.lock:
+            return sum(len(jpeg) for _, jpeg in self.frames)
+
+
+def escribir_clip(frames):
+    """Arma un MP4 con [(instante, jpeg), ...] y devuelve sus bytes (None si no hay frames)."""
+    if not frames:
+        return None
+    duracion = frames[-1][0] - frames[0][0]
+    fps = (len(frames) - 1) / duracion if duracion > 0 else 1.0
+    primero = cv2.imdecode(np.frombuffer(frames[0][1], np.uint8), cv2.IMREAD_COLOR)
+    alto, ancho = primero.shape[:2]
+    descriptor, ruta = tempfile.mkstemp(suffix=".mp4")
+    os.close(descriptor)
+    try:
+        escritor = cv2.VideoWriter(ruta, cv2.VideoWriter_fourcc(*FOURCC), fps, (ancho, alto))
+        if not escritor.isOpened():
+            raise RuntimeError(f"No se pudo abrir el escritor de video ({FOURCC})")
+        escritor.write(primero)
+        for _, jpeg in frames[1:]:
+            escritor.write(cv2.imdecode(np.frombuffer(jpeg, np.uint8), cv2.IMREAD_COLOR))
+        escritor.release()
+        with open(ruta, "rb") as f:
+            return f.read()
+    finally:
+        os.remove(ruta)
+
+
+class GrabadorClips:
+    """Anillo de pre-roll de una cámara + hilo que arma y sube los clips de las infracciones."""
+
+    def __init__(self, subidor, pre_roll=5.0, post_roll=3.0, fps=8, calidad=70, max_dim=640, nombre="zona"):
+        self.subidor = subidor
+        self.pre_roll = pre_roll
+        self.post_roll = post_roll
+        self.nombre = nombre
+        self.anillo = AnilloJPEG(pre_roll + post_roll, fps, calidad, max_dim)
+        self.pendientes = queue.Queue(maxsize=16)
+        # Una sola ranura entre la cámara y el hilo que codifica: si se atrasa, se pisa el frame sin codificar
+        self.cond = threading.Condition()
+        self.pendiente = None      # Último frame copiado por observar()
+        self.pendiente_en = None   # Su instante (None: no hay frame nuevo)
+        self.trabajo = None        # Búfer que está codificando el hilo
+        self.ultimo_observado = None
+        METRICAS.registrar_fuente("clips", lambda: {"bytes_anillo": self.anillo.bytes_en_memoria(),
+                                                    "pendientes": self.pendientes.qsize()}, camara=nombre)
+        threading.Thread(target=self._codificar, name=f"clips-{nombre}", daemon=True).start()
+        threading.Thread(target=self._bucle, name=f"clips-{nombre}-subida", daemon=True).start()
+
+    def observar(self, frame, ahora=None):
+        """Llamar con cada frame de la cámara (sin dibujar): solo lo copia, se codifica en segundo plano."""
+        ahora = time.time() if ahora is None else ahora
+        if self.ultimo_observado is not None and ahora - self.ultimo_observado < 1 / self.anillo.fps:
+            return  # El anillo no guarda más de fps frames por segundo: este ni se copia
+        self.ultimo_observado = ahora
+        with self.cond:
+            if self.pendiente is None or self.pendiente.shape != frame.shape:
+                self.pendiente = np.empty_like(frame)
+            np.copyto(self.pendiente, frame)
+            self.pendiente_en = ahora
+            self.cond.notify()
+
+    def _codificar(self):
+        while True:
+            with self.cond:
+                self.cond.wait_for(lambda: self.pendiente_en is not None)
+                # Intercambio de búferes: el próximo frame se copia mientras este se codifica
+                self.pendiente, self.trabajo = self.trabajo, self.pendiente
+                ahora, self.pendiente_en = self.pendiente_en, None
+            self.anillo.agregar(self.trabajo, ahora)
+
+    def disparar(self, jpeg, datos, nombre, ahora=None):
+        """Infracción confirmada: la foto y el clip se suben juntos cuando termina el post-roll."""
+        ahora = time.time() if ahora is None else ahora
+        try:
+            self.pendientes.put_nowait((ahora, jpeg, datos, nombre))
+        except queue.Full:
+            # Demasiadas infracciones a la vez: la foto no se pierde, va sin clip
+            print(f"[{self.nombre}] Cola de clips llena, se sube solo la foto: {nombre}")
+            self.subidor.subir(jpeg, datos, nombre)
+
+    def _bucle(self):
+        while True:
+            instante, jpeg, datos, nombre = self.pendientes.get()
+            time.sleep(max(0.0, instante + self.post_roll - time.time()))
+            frames = self.anillo.entre(instante - self.pre_roll, instante + self.post_roll)
+            video = None
+            inicio = time.perf_counter()
+            try:
+                video = escribir_clip(frames)
+            except Exception as e:
+                print(f"[{self.nombre}] No se pudo armar el clip de {nombre}: {e}")
+            METRICAS.observar("clip_segundos", time.perf_counter() - inicio, camara=self.nombre)
+            nombre_video = os.path.splitext(nombre)[0] + ".mp4" if video is not None else None
+            self.subidor.subir(jpeg, datos, nombre, video=video, nombre_video=nombre_video)
@@ -0,0 +1,88 @@
+import time
+
+import numpy as np
+
+from arranque import importar_diferido
+
+cv2 = importar_diferido("cv2")
+
+# Compuerta de movimiento: compara una versión reducida del frame con la del último
+# frame inferido y solo deja pasar a YOLO cuando la escena cambió (o cada cierto tiempo).
+
+
+class CompuertaMovimiento:
+    def __init__(self, escala=0.25, umbral_pixel=25, fraccion_cambio=0.01,
+                 forzar_cada=5.0, tolerancia_px=20):
+        self.escala = escala                    # Factor de reducción del frame antes de comparar
+        self.umbral_pixel = umbral_pixel        # Diferencia de gris para considerar un píxel cambiado
+        self.fraccion_cambio = fraccion_cambio  # Fracción de píxeles cambiados que activa la inferencia
+        self.forzar_cada = forzar_cada          # Segundos máximos sin una detección completa
+        self.tolerancia_px = tolerancia_px      # Diferencia de cajas que cuenta como falso negativo
+        self.roi = None                         # (x1, y1, x2, y2) en coordenadas del frame completo
+        self.referencia = None
+        self.actual = None
+        self.ultima_inferencia = 0.0
+        self.frames = 0
+        self.inferencias = 0
+        self.verificaciones = 0  # Detecciones forzadas en escenas que la compuerta veía estáticas
+        self.falsos_negativos = 0
+
+    def set_roi(self, roi):
+        """Restringe la comparación a la franja de la calle; None usa el frame completo."""
+        self.roi = roi
+        self.referencia = None
+
+    def _reducir(self, frame):
+        if self.roi is not None:
+            x1, y1, x2, y2 = self.roi
+            frame = frame[y1:y2, x1:x2]
+        pequeno = cv2.resize(frame, None, fx=self.escala, fy=self.escala, interpolation=cv2.INTER_AREA)
+        gris = cv2.cvtColor(pequeno, cv2.COLOR_BGR2GRAY)
+        return cv2.GaussianBlur(gris, (5, 5), 0)
+
+    def decidir(self, frame, ahora=None):
+        """Devuelve el motivo para inferir ('inicial', 'cambio', 'forzada') o None para reutilizar."""
+        ahora = time.time() if ahora is None else ahora
+        self.frames += 1
+        self.actual = self._reducir(frame)
+        if self.referencia is None or self.referencia.shape != self.actual.shape:
+            return 'inicial'
+        diferencia = cv2.absdiff(self.actual, self.referencia)
+        cambiados = np.count_nonzero(diferencia > self.umbral_pixel)
+        if cambiados > self.fraccion_cambio * diferencia.size:
+            return 'cambio'
+        if ahora - self.ultima_inferencia >= self.forzar_cada:
+            return 'forzada'
+        return None
+
+    def registrar_inferencia(self, motivo, nuevas, previas, ahora=None):
+        """Actualiza la referencia tras inferir; en las forzadas mide si la compuerta se equivocó."""
+        self.inferencias += 1
+        self.ultima_inferencia = time.time() if ahora is None else ahora
+        self.referencia = self.actual
+        if motivo == 'forzada' and previas is not None:
+            self.verificaciones += 1
+            if detecciones_distintas(nuevas, previas, self.tolerancia_px):
+                self.falsos_negativos += 1
+
+    def metricas(self):
+        """Fracción de inferencias ahorradas y tasa de falsos negativos de la compuerta."""
+        return {
+            'frames': self.frames,
+            'inferencias': self.inferencias,
+            'fraccion_ahorrada': 1 - self.inferencias / self.frames if self.frames else 0.0,
+            'verificaciones': self.verificaciones,
+            'falsos_negativos': self.falsos_negativos,
+            'tasa_falsos_negativos': self.falsos_negativos / self.verificaciones if self.verificaciones else 0.0,
+        }
+
+
+def detecciones_distintas(a, b, tolerancia_px=20):
+    """True si cambió la cantidad de autos o alguna caja se movió más de tolerancia_px."""
+    if len(a) != len(b):
+        return True
+    if len(a) == 0:
+        return False
+    cajas_a = np.sort(np.stack([a['x1'], a['y1'], a['x2'], a['y2']], axis=1), axis=0)
+    cajas_b = np.sort(np.stack([b['x1'], b['y1'], b['x2'], b['y2']], axis=1), axis=0)
+    return bool(np.abs(cajas_a.astype(np.int64) - cajas_b).max() > tolerancia_px)
@@ -0,0 +1,149 @@
+import math
+import os
+import time
+
+from metricas import METRICAS
+
+# Control adaptativo de la tasa de inferencia por cámara. Con muchas cámaras en una
+# sola máquina, detectar en cada frame no alcanza y el bucle se atrasa. El controlador
+# envuelve analizar()/process_frame() del detector, mide cuánto tiempo pasa la cámara
+# analizando, la edad de los frames al terminar y la carga del equipo, y recorre una
+# escalera de niveles (intervalo de detección, resolución) para mantenerse dentro del
+# presupuesto: baja un nivel en cuanto se pasa y sube solo después de varios periodos
+# con holgura, para no oscilar.
+
+# (factor del intervalo de detección, factor de imgsz) respecto de la configuración de la cámara
+ESCALERA = ((1, 1.0), (2, 1.0), (2, 0.75), (3, 0.75), (3, 0.6), (5, 0.5), (8, 0.5), (12, 0.4))
+IMGSZ_MIN = 160
+MULTIPLO_IMGSZ = 32  # YOLOv8 necesita lados múltiplos del stride máximo
+
+
+def carga_equipo():
+    """Carga del último minuto por núcleo (1.0 = todos ocupados), o None si el sistema no la expone."""
+    if not hasattr(os, "getloadavg"):
+        return None
+    return os.getloadavg()[0] / (os.cpu_count() or 1)
+
+
+def niveles_desde(intervalo_base, imgsz_base, escalera=ESCALERA):
+    """Niveles (intervalo, imgsz) concretos a partir de la configuración base de la cámara."""
+    niveles = []
+    for factor_intervalo, factor_imgsz in escalera:
+        imgsz = max(IMGSZ_MIN, int(imgsz_base * factor_imgsz) // MULTIPLO_IMGSZ * MULTIPLO_IMGSZ)
+        nivel = (max(1, math.ceil(intervalo_base * factor_intervalo)), imgsz)
+        if nivel not in niveles:
+            niveles.append(nivel)
+    return niveles
+
+
+class ControladorTasa:
+    """Ajusta intervalo de detección e imgsz de un detector para cumplir una cuota de tiempo y una latencia máxima."""
+
+    def __init__(self, detector, cuota=None, latencia_max=1.0, carga_max=0.9, periodo=2.0,
+                 periodos_para_subir=3, holgura=0.5, escalera=ESCALERA):
+        self.detector = detector
+        self.cuota = cuota                # Fracción del tiempo que la cámara puede pasar analizando (None: sin límite)
+        self.latencia_max = latencia_max  # Edad máxima del frame al terminar su análisis (s)
+        self.carga_max = carga_max        # Carga por núcleo del equipo a partir de la cual se degrada
+        self.periodo = periodo
+        self.periodos_para_subir = periodos_para_subir
+        self.holgura = holgura            # Para subir de nivel las medidas deben quedar bajo holgura * límite
+        # Con ONNX estático o inferencia por lotes la resolución es fija: solo se mueve el intervalo
+        self.ajusta_imgsz = (getattr(detector, "servicio_inferencia", None) is None
+                             and getattr(detector.backend, "imgsz_fijo", None) is None)
+        imgsz_base = detector.imgsz_roi if detector.modo_roi else (detector.imgsz or 640)
+        self.niveles = niveles_desde(detector.intervalo_deteccion, imgsz_base, escalera)
+        if not self.ajusta_imgsz:
+            self.niveles = [(intervalo, imgsz_base) for intervalo in dict.fromkeys(i for i, _ in self.niveles)]
+        self.nivel = 0
+        self.cambios = 0
+        self.periodos_holgados = 0
+        self._reiniciar_periodo(time.perf_counter())
+        self.ultimas = {"ocupacion": 0.0, "edad_max_s": 0.0, "fps_analisis": 0.0}
+        METRICAS.registrar_fuente("control", self.metricas, camara=detector.nombre)
+
+    def _reiniciar_periodo(self, ahora):
+        self.inicio_periodo = ahora
+        self.ocupado = 0.0
+        self.frames = 0
+        self.edad_max = 0.0
+
+    def analizar(self, frame, capturado_en=None, **kwargs):
+        """detector.analizar() medido; cada 'periodo' segundos revisa el nivel."""
+        return self._medir(self.detector.analizar, frame, capturado_en, **kwargs)
+
+    def process_frame(self, frame, capturado_en=None, anotar=True):
+        """detector.process_frame() medido (el dibujo también cuenta para la cuota)."""
+        return self._medir(self.detector.process_frame, frame, capturado_en, anotar=anotar)
+
+    def _medir(self, funcion, frame, capturado_en, **kwargs):
+        inicio = time.perf_counter()
+        resultado = funcion(frame, capturado_en, **kwargs)
+        fin = time.perf_counter()
+        self.ocupado += fin - inicio
+        self.frames += 1
+        if capturado_en is not None:
+            self.edad_max = max(self.edad_max, time.time() - capturado_en)
+        if fin - self.inicio_periodo >= self.periodo:
+            self._revisar(fin)
+        return resultado
+
+    def _revisar(self, ahora):
+        duracion = ahora - self.inicio_periodo
+        ocupacion = self.ocupado / duracion
+        carga = carga_equipo()
+        self.ultimas = {"ocupacion": ocupacion, "edad_max_s": self.edad_max, "fps_analisis": self.frames / duracion}
+        if carga is not None:
+            self.ultimas["carga_equipo"] = carga
+
+        excedido = ((self.cuota is not None and ocupacion > self.cuota)
+                    or self.edad_max > self.latencia_max
+                    or (carga is not None and carga > self.carga_max))
+        holgado = ((self.cuota is None or ocupacion < self.cuota * self.holgura)
+                   and self.edad_max < self.latencia_max * self.holgura
+                   and (carga is None or carga < self.carga_max * self.holgura))
+        if excedido:
+            self.periodos_holgados = 0
+            if self.nivel < len(self.niveles) - 1:
+                self._fijar_nivel(self.nivel + 1, ocupacion, carga)
+        elif holgado:
+            self.periodos_holgados += 1
+            if self.periodos_holgados >= self.periodos_para_subir and self.nivel > 0:
+                self.periodos_holgados = 0
+                self._fijar_nivel(self.nivel - 1, ocupacion, carga)
+        else:
+            self.periodos_holgados = 0
+        self._reiniciar_periodo(ahora)
+
+    def _fijar_nivel(self, nivel, ocupacion, carga):
+        direccion = "baja" if nivel > self.nivel else "sube"
+        self.nivel = nivel
+        self.cambios += 1
+        intervalo, imgsz = self.niveles[nivel]
+        self.detector.intervalo_deteccion = intervalo
+        if self.ajusta_imgsz:
+            if self.detector.modo_roi:
+                self.detector.imgsz_roi = imgsz
+            else:
+                self.detector.imgsz = imgsz
+        texto_carga = f", carga {carga:.2f}" if carga is not None else ""
+        print(f"[{self.detector.nombre}] Control: {direccion} a nivel {nivel} (1 detección cada {intervalo} "
+              f"frame(s), imgsz {imgsz}) | ocupación {ocupacion:.0%}, edad {self.edad_max:.2f}s{texto_carga}")
+
+    def tasa_efectiva(self):
+        """Detecciones por segundo que la cámara está haciendo con el nivel actual."""
+        return self.ultimas["fps_analisis"] / self.niveles[self.nivel][0]
+
+    def metricas(self):
+        intervalo, imgsz = self.niveles[self.nivel]
+        return dict(self.ultimas, nivel=self.nivel, intervalo_deteccion=intervalo, imgsz=imgsz,
+                    detecciones_por_segundo=self.tasa_efectiva(), cambios=self.cambios)
+
+
+def crear_controlador(camara, detector):
+    """Controlador según la clave 'control' de la cámara ({"cuota", "latencia_max_s", "carga_max"}), o None."""
+    opciones = camara.get("control")
+    if not opciones:
+        return None
+    return ControladorTasa(detector, cuota=opciones.get("cuota"), latencia_max=opciones.get("latencia_max_s", 1.0),
+                           carga_max=opciones.get("carga_max", 0.9))
@@ -0,0 +1,162 @@
+import os
+import time
+
+import numpy as np
+
+from arranque import importar_diferido
+from postproceso import DETECCION_DTYPE, detecciones_vacias, filtrar_detecciones
+
+cv2 = importar_diferido("cv2")
+
+# Backends de inferencia para el detector de autos. Todos exponen
+# detectar(frames, clases, conf_min, imgsz) y devuelven un arreglo DETECCION_DTYPE
+# por frame, de modo que CarSpaceDetector y el script de zona no dependen del motor.
+
+IOU_NMS = 0.45
+COLOR_RELLENO = 114  # Gris del relleno de letterbox que usa ultralytics
+
+
+class BackendDetector:
+    """Interfaz común de los backends de detección."""
+
+    nombre = "base"
+    imgsz_fijo = None  # Resolución impuesta por el modelo (ONNX estático); None si acepta cualquiera
+
+    def detectar(self, frames, clases=(2,), conf_min=0.5, imgsz=None):
+        raise NotImplementedError
+
+    def calentar(self, forma=(480, 640, 3), imgsz=None, repeticiones=2):
+        """Inferencias sobre un frame negro a la resolución de trabajo; devuelve los segundos que tomaron.
+
+        La primera inferencia inicializa kernels, memoria y (en PyTorch) la fusión de capas;
+        mejor pagarla antes del primer frame real que en medio del reporte.
+        """
+        frame = np.zeros(forma, dtype=np.uint8)
+        inicio = time.perf_counter()
+        for _ in range(repeticiones):
+            self.detectar([frame], imgsz=imgsz)
+        return time.perf_counter() - inicio
+
+
+class BackendPyTorch(BackendDetector):
+    """YOLOv8 de ultralytics sobre PyTorch (con su propio pre-procesamiento y NMS)."""
+
+    nombre = "pytorch"
+
+    def __init__(self, ruta_modelo):
+        from ultralytics import YOLO
+        self.model = YOLO(ruta_modelo)
+
+    def detectar(self, frames, clases=(2,), conf_min=0.5, imgsz=None):
+        kwargs = {"imgsz": imgsz} if imgsz is not None else {}
+        results = self.model(frames, verbose=False, conf=conf_min, **kwargs)
+        return [filtrar_detecciones([r], clases, conf_min) for r in results]
+
+
+def letterbox(frame, imgsz):
+    """Redimensiona conservando la proporción y rellena a imgsz x imgsz; devuelve (imagen, escala, dx, dy)."""
+    alto, ancho = frame.shape[:2]
+    escala = min(imgsz / alto, imgsz / ancho)
+    nuevo_ancho, nuevo_alto = int(round(ancho * escala)), int(round(alto * escala))
+    dx, dy = (imgsz - nuevo_ancho) // 2, (imgsz - nuevo_alto) // 2
+    salida = np.full((imgsz, imgsz, 3), COLOR_RELLENO, dtype=np.uint8)
+    salida[dy:dy + nuevo_alto, dx:dx + nuevo_ancho] = cv2.resize(
+        frame, (nuevo_ancho, nuevo_alto), interpolation=cv2.INTER_LINEAR)
+    return salida, escala, dx, dy
+
+
+def preprocesar(frame, imgsz):
+    """Frame BGR -> tensor NCHW float32 RGB normalizado, con los datos para deshacer el letterbox."""
+    imagen, escala, dx, dy = letterbox(frame, imgsz)
+    tensor = cv2.dnn.blobFromImage(imagen, 1 / 255.0, swapRB=True)
+    return tensor, escala, dx, dy
+
+
+def decodificar_yolov8(salida, clases, conf_min, escala, dx, dy, forma):
+    """Salida cruda (4 + num_clases, N) de YOLOv8 -> detecciones con NMS por clase."""
+    clases = np.asarray(clases)
+    puntajes = salida[4 + clases]  # Solo las clases pedidas
+    mejor = puntajes.argmax(axis=0)
+    conf = puntajes[mejor, np.arange(puntajes.shape[1])]
+    mascara = conf > conf_min
+    if not mascara.any():
+        return detecciones_vacias()
+    cx, cy, w, h = salida[:4, mascara]
+    conf, cls = conf[mascara], clases[mejor[mascara]]
+
+    x1 = (cx - w / 2 - dx) / escala
+    y1 = (cy - h / 2 - dy) / escala
+    x2 = (cx + w / 2 - dx) / escala
+    y2 = (cy + h / 2 - dy) / escala
+    # NMS por clase desplazando las cajas de cada clase a una región distinta
+    desplazamiento = cls * 10000.0
+    cajas_nms = np.stack([x1 + desplazamiento, y1, x2 - x1, y2 - y1], axis=1)
+    indices = np.asarray(cv2.dnn.NMSBoxes(cajas_nms.tolist(), conf.tolist(), conf_min, IOU_NMS)).reshape(-1)
+
+    alto, ancho = forma[:2]
+    dets = np.empty(len(indices), dtype=DETECCION_DTYPE)
+    dets['x1'] = np.clip(x1[indices], 0, ancho)
+    dets['y1'] = np.clip(y1[indices], 0, alto)
+    dets['x2'] = np.clip(x2[indices], 0, ancho)
+    dets['y2'] = np.clip(y2[indices], 0, alto)
+    dets['conf'] = conf[indices]
+    dets['cls'] = cls[indices]
+    return dets
+
+
+class BackendONNX(BackendDetector):
+    """Modelo YOLOv8 exportado a ONNX sobre onnxruntime (CPU)."""
+
+    nombre = "onnx"
+
+    def __init__(self, ruta_modelo, hilos=None):
+        import onnxruntime as ort
+        opciones = ort.SessionOptions()
+        opciones.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if hilos:
+            opciones.intra_op_num_threads = hilos
+        self.session = ort.InferenceSession(ruta_modelo, sess_options=opciones,
+                                            providers=["CPUExecutionProvider"])
+        entrada = self.session.get_inputs()[0]
+        self.nombre_entrada = entrada.name
+        # Con exportación estática el tamaño y el lote vienen fijos en el modelo
+        self.lote_fijo = entrada.shape[0] if isinstance(entrada.shape[0], int) else None
+        self.imgsz_fijo = entrada.shape[2] if isinstance(entrada.shape[2], int) else None
+
+    def detectar(self, frames, clases=(2,), conf_min=0.5, imgsz=None):
+        imgsz = self.imgsz_fijo or imgsz or 640
+        preparados = [preprocesar(frame, imgsz) for frame in frames]
+        if self.lote_fijo == 1:
+            salidas = [self.session.run(None, {self.nombre_entrada: p[0]})[0][0] for p in preparados]
+        else:
+            lote = np.concatenate([p[0] for p in preparados])
+            salidas = self.session.run(None, {self.nombre_entrada: lote})[0]
+        return [decodificar_yolov8(salida, clases, conf_min, escala, dx, dy, frame.shape)
+                for salida, (_, escala, dx, dy), frame in zip(salidas, preparados, frames)]
+
+
+class BackendONNXInt8(BackendONNX):
+    """Variante INT8 cuantizada estáticamente (ver exportar_modelo.py)."""
+
+    nombre = "onnx-int8"
+
+    def __init__(self, ruta_modelo, hilos=None):
+        if not ruta_modelo.endswith("_int8.onnx"):
+            ruta_modelo = os.path.splitext(ruta_modelo)[0] + "_int8.onnx"
+        super().__init__(ruta_modelo, hilos)
+
+
+BACKENDS = {
+    "pytorch": BackendPyTorch,
+    "onnx": BackendONNX,
+    "onnx-int8": BackendONNXInt8,
+}
+
+
+def crear_backend(nombre, ruta_modelo, **kwargs):
+    """Crea un backend por nombre ('pytorch', 'onnx', 'onnx-int8')."""
+    if nombre not in BACKENDS:
+        raise ValueError(f"Backend desconocido: {nombre} (opciones: {', '.join(BACKENDS)})")
+    if nombre != "pytorch" and ruta_modelo.endswith(".pt"):
+        ruta_modelo = os.path.splitext(ruta_modelo)[0] + ".onnx"
+    return BACKENDS[nombre](ruta_modelo, **kwargs)
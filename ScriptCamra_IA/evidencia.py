@@ -0,0 +1,61 @@
+import os
+import queue
+import threading
+import time
+
+from arranque import importar_diferido
+from metricas import METRICAS
+
+cv2 = importar_diferido("cv2")
+
+# Evidencia de infracciones: la foto se codifica una sola vez en memoria y los bytes
+# se suben en segundo plano; el archivo local es opcional (archivo histórico).
+
+
+def codificar_jpeg(frame, calidad=85, max_dim=None):
+    """Codifica el frame como JPEG en memoria, reduciéndolo si supera max_dim píxeles."""
+    inicio = time.perf_counter()
+    if max_dim is not None:
+        alto, ancho = frame.shape[:2]
+        escala = max_dim / max(alto, ancho)
+        if escala < 1:
+            frame = cv2.resize(frame, (int(ancho * escala), int(alto * escala)), interpolation=cv2.INTER_AREA)
+    ok, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, calidad])
+    if not ok:
+        raise ValueError("No se pudo codificar el frame como JPEG")
+    METRICAS.observar("jpeg_segundos", time.perf_counter() - inicio)
+    return buffer.tobytes()
+
+
+class SubidorEvidencia:
+    def __init__(self, cliente, url, archivo_dir=None):
+        self.cliente = cliente          # ClienteAPI: envía en segundo plano con reintentos y spool
+        self.url = url
+        self.archivo_dir = archivo_dir  # None: no se guarda copia local
+        self.cola_archivo = queue.Queue(maxsize=32)
+        if archivo_dir is not None:
+            os.makedirs(archivo_dir, exist_ok=True)
+            threading.Thread(target=self._archivar, name="archivo-evidencia", daemon=True).start()
+
+    def subir(self, jpeg, datos, nombre, video=None, nombre_video=None):
+        """Encola el POST con la imagen ya codificada (y el clip, si hay) y, si corresponde, su copia en disco."""
+        archivos = {'image': (nombre, jpeg, 'image/jpeg')}
+        if video is not None:
+            archivos['video'] = (nombre_video, video, 'video/mp4')
+        self.cliente.enviar('POST', self.url, data=datos, archivos=archivos)
+        if self.archivo_dir is not None:
+            for nombre_archivo, contenido in ((nombre, jpeg), (nombre_video, video)):
+                if contenido is None:
+                    continue
+                try:
+                    self.cola_archivo.put_nowait((nombre_archivo, contenido))
+                except queue.Full:
+                    print(f"[Evidencia] Archivo local omitido (cola llena): {nombre_archivo}")
+
+    def _archivar(self):
+        while True:
+            nombre, jpeg = self.cola_archivo.get()
+            ruta = os.path.join(self.archivo_dir, nombre)
+            with open(ruta, 'wb') as f:
+                f.write(jpeg)
+            print(f"[Evidencia guardada] {ruta}")
@@ -0,0 +1,87 @@
+import argparse
+import os
+
+import cv2
+import numpy as np
+
+from detectores import preprocesar
+
+# Exporta el modelo YOLOv8 a ONNX y genera la variante INT8 con cuantización estática,
+# calibrada con frames reales de las cámaras (muestras de un video grabado).
+
+
+def frames_de_muestra(ruta_video, cantidad):
+    """Toma 'cantidad' frames repartidos uniformemente a lo largo del video."""
+    cap = cv2.VideoCapture(ruta_video)
+    total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) or cantidad
+    indices = set(np.linspace(0, total - 1, cantidad).astype(int).tolist())
+    frames = []
+    i = 0
+    while len(frames) < cantidad:
+        if not cap.grab():
+            break
+        if i in indices:
+            ret, frame = cap.retrieve()
+            if ret:
+                frames.append(frame)
+        i += 1
+    cap.release()
+    return frames
+
+
+def exportar_onnx(ruta_pt, imgsz):
+    """Exporta el .pt de ultralytics a ONNX con entrada fija imgsz x imgsz."""
+    from ultralytics import YOLO
+    ruta = YOLO(ruta_pt).export(format="onnx", imgsz=imgsz, dynamic=False, simplify=True)
+    print(f"Modelo ONNX exportado: {ruta}")
+    return ruta
+
+
+def cuantizar_int8(ruta_onnx, frames, imgsz):
+    """Cuantización estática QDQ (pesos int8 por canal, activaciones uint8) calibrada con frames."""
+    from onnxruntime.quantization import (CalibrationDataReader, QuantFormat, QuantType,
+                                          quantize_static)
+    from onnxruntime.quantization.shape_inference import quant_pre_process
+    import onnxruntime as ort
+
+    nombre_entrada = ort.InferenceSession(ruta_onnx, providers=["CPUExecutionProvider"]).get_inputs()[0].name
+
+    class LectorCalibracion(CalibrationDataReader):
+        def __init__(self):
+            self.datos = iter([{nombre_entrada: preprocesar(frame, imgsz)[0]} for frame in frames])
+
+        def get_next(self):
+            return next(self.datos, None)
+
+    base = os.path.splitext(ruta_onnx)[0]
+    ruta_pre = base + "_pre.onnx"
+    ruta_int8 = base + "_int8.onnx"
+    quant_pre_process(ruta_onnx, ruta_pre)
+    quantize_static(ruta_pre, ruta_int8, LectorCalibracion(), quant_format=QuantFormat.QDQ,
+                    per_channel=True, activation_type=QuantType.QUInt8, weight_type=QuantType.QInt8)
+    os.remove(ruta_pre)
+    print(f"Modelo INT8 generado: {ruta_int8} ({len(frames)} frames de calibración)")
+    return ruta_int8
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Exporta YOLOv8 a ONNX y lo cuantiza a INT8")
+    parser.add_argument("--modelo", default="models/yolov8n.pt", help="Modelo .pt de ultralytics")
+    parser.add_argument("--video", help="Video de las cámaras para calibrar la cuantización")
+    parser.add_argument("--frames", type=int, default=200, help="Frames de calibración")
+    parser.add_argument("--imgsz", type=int, default=640, help="Tamaño de entrada del modelo exportado")
+    args = parser.parse_args()
+
+    ruta_onnx = exportar_onnx(args.modelo, args.imgsz)
+    if not args.video:
+        print("Sin --video no se genera la variante INT8 (se necesita para calibrar)")
+        return
+    frames = frames_de_muestra(args.video, args.frames)
+    if not frames:
+        print(f"Error: No se pudieron leer frames de {args.video}")
+        return
+    cuantizar_int8(ruta_onnx, frames, args.imgsz)
+
+
+if __name__ == "__main__":
+    main()
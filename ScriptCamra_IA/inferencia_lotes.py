@@ -0,0 +1,155 @@
+import argparse
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+# Servicio de inferencia por lotes: junta frames de varias cámaras (o frames
+# consecutivos de una misma cámara) y los pasa al modelo en una sola llamada.
+
+
+class InferenciaPorLotes:
+    def __init__(self, backend, max_lote=8, espera_max=0.02, **kwargs_modelo):
+        self.backend = backend  # BackendDetector (ver detectores.py)
+        self.max_lote = max_lote
+        self.espera_max = espera_max  # Segundos máximos que espera el primer frame del lote
+        self.kwargs_modelo = kwargs_modelo
+        self.cola = queue.Queue()
+        self.hilo = None
+        self.activo = False
+        self.lock_stats = threading.Lock()
+        self.stats = {}  # tamaño de lote -> {"lotes", "frames", "tiempo"}
+
+    def iniciar(self):
+        """Arranca el hilo que arma y ejecuta los lotes."""
+        if self.hilo is None:
+            self.activo = True
+            self.hilo = threading.Thread(target=self._bucle, name="inferencia-lotes", daemon=True)
+            self.hilo.start()
+        return self
+
+    def detener(self):
+        """Detiene el hilo de inferencia después de vaciar la cola."""
+        if self.hilo is not None:
+            self.activo = False
+            self.cola.put(None)
+            self.hilo.join()
+            self.hilo = None
+
+    def enviar(self, frame):
+        """Encola un frame y devuelve un Future con su resultado."""
+        futuro = Future()
+        self.cola.put((frame, futuro))
+        return futuro
+
+    def inferir(self, frame):
+        """Encola un frame y espera sus detecciones (arreglo DETECCION_DTYPE)."""
+        return self.enviar(frame).result()
+
+    def _armar_lote(self):
+        item = self.cola.get()
+        if item is None:
+            return []
+        lote = [item]
+        limite = time.perf_counter() + self.espera_max
+        while len(lote) < self.max_lote:
+            restante = limite - time.perf_counter()
+            if restante <= 0:
+                break
+            try:
+                item = self.cola.get(timeout=restante)
+            except queue.Empty:
+                break
+            if item is None:
+                self.cola.put(None)  # Reenviar la señal de parada para el bucle
+                break
+            lote.append(item)
+        return lote
+
+    def _bucle(self):
+        while self.activo or not self.cola.empty():
+            lote = self._armar_lote()
+            if not lote:
+                continue
+            frames = [frame for frame, _ in lote]
+            inicio = time.perf_counter()
+            try:
+                resultados = self.backend.detectar(frames, **self.kwargs_modelo)
+            except Exception as e:
+                for _, futuro in lote:
+                    futuro.set_exception(e)
+                continue
+            self._registrar(len(lote), time.perf_counter() - inicio)
+            for (_, futuro), resultado in zip(lote, resultados):
+                futuro.set_result(resultado)
+
+    def _registrar(self, tam, duracion):
+        with self.lock_stats:
+            s = self.stats.setdefault(tam, {"lotes": 0, "frames": 0, "tiempo": 0.0})
+            s["lotes"] += 1
+            s["frames"] += tam
+            s["tiempo"] += duracion
+
+    def reporte(self):
+        """Devuelve el rendimiento (frames/s y ms por frame) por tamaño de lote."""
+        with self.lock_stats:
+            filas = []
+            for tam in sorted(self.stats):
+                s = self.stats[tam]
+                fps = s["frames"] / s["tiempo"] if s["tiempo"] > 0 else 0.0
+                filas.append({
+                    "lote": tam,
+                    "lotes": s["lotes"],
+                    "frames": s["frames"],
+                    "fps": round(fps, 2),
+                    "ms_por_frame": round(1000 / fps, 2) if fps else None,
+                })
+            return filas
+
+    def imprimir_reporte(self):
+        """Imprime la tabla de rendimiento por tamaño de lote."""
+        print(f"{'Lote':>5} {'Lotes':>7} {'Frames':>8} {'FPS':>9} {'ms/frame':>9}")
+        for fila in self.reporte():
+            print(f"{fila['lote']:>5} {fila['lotes']:>7} {fila['frames']:>8} "
+                  f"{fila['fps']:>9.2f} {fila['ms_por_frame'] or 0:>9.2f}")
+
+
+def main():
+    import cv2
+    from detectores import BACKENDS, crear_backend
+
+    parser = argparse.ArgumentParser(description="Mide el rendimiento de YOLO según el tamaño de lote")
+    parser.add_argument("video", help="Video de prueba")
+    parser.add_argument("--modelo", default="models/yolov8n.pt", help="Ruta del modelo YOLO")
+    parser.add_argument("--backend", default="pytorch", choices=sorted(BACKENDS),
+                        help="Motor de inferencia")
+    parser.add_argument("--lotes", type=int, nargs="+", default=[1, 2, 4, 8],
+                        help="Tamaños de lote a medir")
+    parser.add_argument("--frames", type=int, default=64, help="Frames a inferir por tamaño de lote")
+    args = parser.parse_args()
+
+    cap = cv2.VideoCapture(args.video)
+    frames = []
+    while len(frames) < args.frames:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(frame)
+    cap.release()
+    if not frames:
+        print("Error: No se pudieron leer frames del video")
+        return
+
+    backend = crear_backend(args.backend, args.modelo)
+    backend.detectar(frames[:1])  # Calentamiento
+    for tam in args.lotes:
+        servicio = InferenciaPorLotes(backend, max_lote=tam, espera_max=0.05).iniciar()
+        futuros = [servicio.enviar(frame) for frame in frames]
+        for futuro in futuros:
+            futuro.result()
+        servicio.detener()
+        servicio.imprimir_reporte()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+from collections import namedtuple
+
+import numpy as np
+
+# Motor de intervalos en x para calcular espacio ocupado y disponible en la calle.
+# Trabaja sobre arreglos (N, 2) de extensiones [x1, x2] y nunca modifica la entrada.
+
+MARGEN_FUSION = 10  # Píxeles de separación bajo los cuales dos autos se consideran unidos
+
+ResultadoEspacio = namedtuple(
+    'ResultadoEspacio',
+    ['ocupados', 'huecos', 'validos', 'metros_validos', 'metros_ocupados'],
+)
+
+
+def extensiones_x(dets):
+    """Arreglo (N, 2) [x1, x2] a partir de un arreglo estructurado de detecciones."""
+    return np.stack([dets['x1'], dets['x2']], axis=1)
+
+
+def fusionar_intervalos(extensiones, margen=MARGEN_FUSION):
+    """Une los intervalos que se superponen o están a menos de 'margen' píxeles."""
+    ext = np.asarray(extensiones).reshape(-1, 2)
+    if len(ext) == 0:
+        return np.empty((0, 2), dtype=ext.dtype)
+    orden = np.argsort(ext[:, 0], kind='stable')
+    inicios = ext[orden, 0]
+    fines = ext[orden, 1]
+    # Un intervalo abre un grupo nuevo si empieza después del fin acumulado anterior + margen
+    fin_acumulado = np.maximum.accumulate(fines)
+    nuevo = np.empty(len(ext), dtype=bool)
+    nuevo[0] = True
+    nuevo[1:] = inicios[1:] > fin_acumulado[:-1] + margen
+    idx = np.flatnonzero(nuevo)
+    return np.stack([inicios[idx], np.maximum.reduceat(fines, idx)], axis=1)
+
+
+def huecos_entre(fusionados, inicio, fin):
+    """Huecos (G, 2) entre los intervalos fusionados dentro de [inicio, fin]."""
+    bordes_izq = np.concatenate([[inicio], fusionados[:, 1]])
+    bordes_der = np.concatenate([fusionados[:, 0], [fin]])
+    huecos = np.stack([bordes_izq, bordes_der], axis=1)
+    return huecos[huecos[:, 1] > huecos[:, 0]]
+
+
+def espacios_disponibles(extensiones, inicio, fin, pixels_per_meter, min_metros, margen=MARGEN_FUSION):
+    """Intervalos ocupados, huecos y huecos >= min_metros en un tramo de calle."""
+    fusionados = fusionar_intervalos(extensiones, margen)
+    huecos = huecos_entre(fusionados, inicio, fin)
+    metros = (huecos[:, 1] - huecos[:, 0]) / pixels_per_meter
+    validos = metros >= min_metros
+    metros_ocupados = (fusionados[:, 1] - fusionados[:, 0]).sum() / pixels_per_meter
+    return ResultadoEspacio(
+        ocupados=fusionados,
+        huecos=huecos,
+        validos=np.column_stack([huecos[validos], metros[validos]]),
+        metros_validos=float(metros[validos].sum()),
+        metros_ocupados=float(metros_ocupados),
+    )
+
@@ -0,0 +1,238 @@
+import bisect
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Métricas de los procesos de cámara: cronómetros por etapa con histogramas de
+# cubetas fijas (observar cuesta un bisect y una suma), contadores, medidores y
+# fuentes que se leen al momento de exportar. Se exponen en texto Prometheus por
+# HTTP local y, opcionalmente, se vuelcan a JSON cada cierto tiempo.
+
+PREFIJO = "camara_"
+LIMITES_SEGUNDOS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+LIMITES_EDAD = (0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 30.0, 60.0, 300.0, 3600.0)
+
+
+class Histograma:
+    """Histograma de cubetas fijas (límites superiores, como los de Prometheus)."""
+
+    def __init__(self, limites=LIMITES_SEGUNDOS):
+        self.limites = tuple(limites)
+        self.cuentas = [0] * (len(self.limites) + 1)  # La última cubeta es +Inf
+        self.suma = 0.0
+        self.total = 0
+
+    def observar(self, valor):
+        self.cuentas[bisect.bisect_left(self.limites, valor)] += 1
+        self.suma += valor
+        self.total += 1
+
+    def acumuladas(self):
+        acumulado, resultado = 0, []
+        for cuenta in self.cuentas:
+            acumulado += cuenta
+            resultado.append(acumulado)
+        return resultado
+
+    def percentil(self, p):
+        """Percentil aproximado interpolando dentro de la cubeta que lo contiene."""
+        if self.total == 0:
+            return None
+        objetivo = self.total * p / 100
+        anterior, inferior = 0, 0.0
+        for limite, acumulado in zip(self.limites, self.acumuladas()):
+            if acumulado >= objetivo:
+                dentro = acumulado - anterior
+                return inferior + (limite - inferior) * ((objetivo - anterior) / dentro if dentro else 1.0)
+            anterior, inferior = acumulado, limite
+        return self.limites[-1]  # Cae en +Inf: se informa el último límite
+
+
+class Cronometro:
+    """Context manager que observa la duración del bloque en un histograma."""
+
+    __slots__ = ("registro", "nombre", "etiquetas", "inicio")
+
+    def __init__(self, registro, nombre, etiquetas):
+        self.registro = registro
+        self.nombre = nombre
+        self.etiquetas = etiquetas
+        self.inicio = 0.0
+
+    def __enter__(self):
+        self.inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.registro.observar(self.nombre, time.perf_counter() - self.inicio, **self.etiquetas)
+        return False
+
+
+def _clave(nombre, etiquetas):
+    return nombre, tuple(sorted(etiquetas.items()))
+
+
+def _escapar(valor):
+    return str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _formato_etiquetas(etiquetas, extra=None):
+    pares = list(etiquetas) + ([extra] if extra else [])
+    if not pares:
+        return ""
+    return "{" + ",".join(f'{k}="{_escapar(v)}"' for k, v in pares) + "}"
+
+
+class Registro:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histogramas = {}  # (nombre, etiquetas) -> Histograma
+        self.contadores = {}   # (nombre, etiquetas) -> valor
+        self.medidores = {}    # (nombre, etiquetas) -> valor
+        self.fuentes = {}      # (prefijo, etiquetas) -> función que devuelve un dict numérico
+        self.limites = {}      # nombre -> límites del histograma
+
+    def definir_histograma(self, nombre, limites):
+        """Fija las cubetas de un histograma (por defecto LIMITES_SEGUNDOS)."""
+        self.limites[nombre] = tuple(limites)
+
+    def observar(self, nombre, valor, **etiquetas):
+        clave = _clave(nombre, etiquetas)
+        with self.lock:
+            histograma = self.histogramas.get(clave)
+            if histograma is None:
+                histograma = self.histogramas[clave] = Histograma(self.limites.get(nombre, LIMITES_SEGUNDOS))
+            histograma.observar(valor)
+
+    def cronometro(self, nombre, **etiquetas):
+        """with METRICAS.cronometro("etapa_segundos", etapa="inferencia"): ..."""
+        return Cronometro(self, nombre, etiquetas)
+
+    def incrementar(self, nombre, cantidad=1, **etiquetas):
+        clave = _clave(nombre, etiquetas)
+        with self.lock:
+            self.contadores[clave] = self.contadores.get(clave, 0) + cantidad
+
+    def fijar(self, nombre, valor, **etiquetas):
+        with self.lock:
+            self.medidores[_clave(nombre, etiquetas)] = valor
+
+    def registrar_fuente(self, prefijo, funcion, **etiquetas):
+        """Agrega una función (p. ej. detector.metricas) que se lee al exportar."""
+        with self.lock:
+            self.fuentes[_clave(prefijo, etiquetas)] = funcion
+
+    def _leer_fuentes(self):
+        with self.lock:
+            fuentes = list(self.fuentes.items())
+        valores = {}
+        for (prefijo, etiquetas), funcion in fuentes:
+            try:
+                datos = funcion()
+            except Exception as e:
+                print(f"[Métricas] Error leyendo la fuente {prefijo}: {e}")
+                continue
+            for campo, valor in datos.items():
+                if isinstance(valor, (bool, int, float)):
+                    valores[(f"{prefijo}_{campo}", etiquetas)] = float(valor)
+        return valores
+
+    def texto_prometheus(self):
+        """Exporta todo en el formato de texto de Prometheus."""
+        lineas = []
+        with self.lock:
+            histogramas = {clave: (h.limites, h.acumuladas(), h.suma, h.total)
+                           for clave, h in self.histogramas.items()}
+            contadores = dict(self.contadores)
+            medidores = dict(self.medidores)
+        medidores.update(self._leer_fuentes())
+
+        tipos_vistos = set()
+        for (nombre, etiquetas), (limites, acumuladas, suma, total) in sorted(histogramas.items()):
+            metrica = PREFIJO + nombre
+            if metrica not in tipos_vistos:
+                tipos_vistos.add(metrica)
+                lineas.append(f"# TYPE {metrica} histogram")
+            for limite, acumulado in zip(list(limites) + ["+Inf"], acumuladas):
+                lineas.append(f"{metrica}_bucket{_formato_etiquetas(etiquetas, ('le', limite))} {acumulado}")
+            lineas.append(f"{metrica}_sum{_formato_etiquetas(etiquetas)} {suma}")
+            lineas.append(f"{metrica}_count{_formato_etiquetas(etiquetas)} {total}")
+        for tipo, valores, sufijo in (("counter", contadores, "_total"), ("gauge", medidores, "")):
+            for (nombre, etiquetas), valor in sorted(valores.items()):
+                metrica = PREFIJO + nombre + sufijo
+                if metrica not in tipos_vistos:
+                    tipos_vistos.add(metrica)
+                    lineas.append(f"# TYPE {metrica} {tipo}")
+                lineas.append(f"{metrica}{_formato_etiquetas(etiquetas)} {valor}")
+        return "\n".join(lineas) + "\n"
+
+    def a_dict(self):
+        """Resumen en JSON: histogramas con media y percentiles aproximados, contadores y medidores."""
+        def nombre_con_etiquetas(nombre, etiquetas):
+            return nombre + _formato_etiquetas(etiquetas)
+
+        with self.lock:
+            histogramas = {
+                nombre_con_etiquetas(*clave): {
+                    "total": h.total,
+                    "media": h.suma / h.total if h.total else None,
+                    "p50": h.percentil(50), "p95": h.percentil(95), "p99": h.percentil(99),
+                }
+                for clave, h in self.histogramas.items()
+            }
+            contadores = {nombre_con_etiquetas(*clave): v for clave, v in self.contadores.items()}
+            medidores = {nombre_con_etiquetas(*clave): v for clave, v in self.medidores.items()}
+        medidores.update({nombre_con_etiquetas(*clave): v for clave, v in self._leer_fuentes().items()})
+        return {"instante": time.time(), "histogramas": histogramas,
+                "contadores": contadores, "medidores": medidores}
+
+    def volcar_json(self, ruta):
+        """Escribe el resumen en 'ruta' de forma atómica."""
+        temporal = ruta + ".tmp"
+        with open(temporal, "w", encoding="utf-8") as f:
+            json.dump(self.a_dict(), f, indent=2, ensure_ascii=False)
+        os.replace(temporal, ruta)
+
+    def volcado_periodico(self, ruta, intervalo=10.0):
+        """Hilo que vuelca el JSON cada 'intervalo' segundos; devuelve la etapa ya iniciada."""
+        from pipeline import EtapaPeriodica
+        etapa = EtapaPeriodica(lambda: self.volcar_json(ruta), intervalo, nombre="metricas-json")
+        etapa.start()
+        return etapa
+
+    def servir(self, puerto, host="127.0.0.1"):
+        """Expone /metrics (texto Prometheus) y /metrics.json en un hilo de fondo."""
+        registro = self
+
+        class Manejador(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.startswith("/metrics.json"):
+                    cuerpo = json.dumps(registro.a_dict(), ensure_ascii=False).encode("utf-8")
+                    tipo = "application/json"
+                elif self.path.startswith("/metrics"):
+                    cuerpo = registro.texto_prometheus().encode("utf-8")
+                    tipo = "text/plain; version=0.0.4; charset=utf-8"
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", tipo)
+                self.send_header("Content-Length", str(len(cuerpo)))
+                self.end_headers()
+                self.wfile.write(cuerpo)
+
+            def log_message(self, formato, *args):
+                pass  # Sin una línea por cada scrape
+
+        servidor = ThreadingHTTPServer((host, puerto), Manejador)
+        servidor.daemon_threads = True
+        threading.Thread(target=servidor.serve_forever, name="metricas-http", daemon=True).start()
+        print(f"[Métricas] http://{host}:{puerto}/metrics")
+        return servidor
+
+
+# Registro compartido por todo el proceso
+METRICAS = Registro()
+METRICAS.definir_histograma("edad_frame_segundos", LIMITES_EDAD)
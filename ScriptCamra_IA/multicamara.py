@@ -0,0 +1,349 @@
+import argparse
+import json
+import multiprocessing as mp
+import os
+import sys
+import time
+
+# Supervisor de varias cámaras: un proceso por cámara (o por grupo de cámaras),
+# cada uno con su propio modelo YOLO y un presupuesto fijo de hilos de torch.
+
+ESPERA_REINICIO = 2.0       # Segundos de espera antes de reiniciar un trabajador caído
+ESPERA_REINICIO_MAX = 60.0  # Tope del retroceso exponencial entre reinicios
+TIEMPO_ESTABLE = 300.0      # Segundos arriba tras los que un trabajador vuelve a la espera mínima
+
+
+def cargar_camaras(ruta):
+    """Lee la lista de cámaras (fuente, parqueo y calibración, o zona restringida) desde un archivo JSON.
+
+    "tipo": "parqueo" (por defecto) requiere 'parqueo_id' y 'puntos', o 'plazas' ([{"nombre", "puntos"}])
+    para la ocupación por plaza; "zona" requiere 'zona' (rectángulo) o 'zonas' ([{"nombre", "puntos": [[x, y], ...]}]).
+    """
+    from plazas import validar_plazas
+    with open(ruta, encoding="utf-8") as f:
+        camaras = json.load(f)
+    for i, camara in enumerate(camaras):
+        if "fuente" not in camara:
+            raise ValueError(f"Cámara {i}: se requiere 'fuente'")
+        tipo = camara.setdefault("tipo", "parqueo")
+        if tipo == "parqueo":
+            if "parqueo_id" not in camara:
+                raise ValueError(f"Cámara {i}: se requiere 'parqueo_id'")
+            if "plazas" in camara:
+                try:
+                    validar_plazas(camara["plazas"])
+                except ValueError as e:
+                    raise ValueError(f"Cámara {i}: {e}") from None
+            puntos = camara.get("puntos")
+            if puntos is not None or "plazas" not in camara:  # Con plazas la línea es opcional
+                if puntos is None or len(puntos) != 2:
+                    raise ValueError(f"Cámara {i}: 'puntos' debe tener los 2 extremos de la línea")
+                camara["puntos"] = [tuple(p) for p in puntos]
+        elif tipo == "zona":
+            zona = camara.get("zona")
+            zonas = camara.get("zonas")
+            if zonas is not None:
+                if not zonas or any(len(z.get("puntos", ())) < 3 for z in zonas):
+                    raise ValueError(f"Cámara {i}: cada zona de 'zonas' necesita 'puntos' (3 o más)")
+            elif not isinstance(zona, dict) or not {"x1", "y1", "x2", "y2"} <= set(zona):
+                raise ValueError(f"Cámara {i}: 'zona' debe tener x1, y1, x2, y2 (o usar 'zonas' poligonales)")
+        else:
+            raise ValueError(f"Cámara {i}: tipo desconocido '{tipo}' (parqueo o zona)")
+        camara.setdefault("nombre", f"camara_{i}")
+    return camaras
+
+
+def agrupar_camaras(camaras, camaras_por_proceso=1):
+    """Agrupa las cámaras por su campo 'grupo' o en bloques de tamaño fijo."""
+    grupos = {}
+    for i, camara in enumerate(camaras):
+        clave = camara.get("grupo", f"bloque_{i // camaras_por_proceso}")
+        grupos.setdefault(clave, []).append(camara)
+    return list(grupos.values())
+
+
+def presupuesto_hilos(num_trabajadores, num_nucleos=None):
+    """Reparte los núcleos disponibles entre los trabajadores sin sobresuscribirlos."""
+    num_nucleos = num_nucleos or os.cpu_count() or 1
+    return max(1, num_nucleos // max(1, num_trabajadores))
+
+
+def abrir_fuente(fuente):
+    """Abre una cámara por índice ('0') o por URI/ruta de archivo."""
+    import cv2
+    if isinstance(fuente, str) and fuente.isdigit():
+        fuente = int(fuente)
+    return cv2.VideoCapture(fuente)
+
+
+def forma_fuente(cap, por_defecto=(480, 640, 3)):
+    """Forma (alto, ancho, 3) de los frames que va a entregar la captura, sin leer ninguno."""
+    import cv2
+    ancho = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    alto = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    return (alto, ancho, 3) if ancho > 0 and alto > 0 else por_defecto
+
+
+def crear_detector(camara, parqueos, model_path, servicio=None, backend="pytorch", compuerta=True,
+                   cache_detecciones=0):
+    """Detector de espacio configurado y calibrado según la entrada de la cámara.
+
+    compuerta=False para frames que no son consecutivos (análisis offline); cache_detecciones > 0 solo
+    para fuentes que repiten frames idénticos (imágenes estáticas).
+    """
+    from compuerta_movimiento import CompuertaMovimiento
+    from plazas import COBERTURA_MIN, MapaPlazas
+    from rastreador import RastreadorIoU
+    detector = parqueos.CarSpaceDetector(
+        model_path=model_path,
+        street_length_meters=camara.get("longitud_m", 20),
+        min_parking_space=camara.get("espacio_minimo_m", 4.0),
+        servicio_inferencia=servicio,
+        compuerta=CompuertaMovimiento(forzar_cada=camara.get("forzar_deteccion_s", 5.0)) if compuerta else None,
+        modo_roi=camara.get("modo_roi", False),
+        imgsz_roi=camara.get("imgsz_roi", 320),
+        rastreador=RastreadorIoU() if camara.get("intervalo_deteccion", 1) > 1 else None,
+        intervalo_deteccion=camara.get("intervalo_deteccion", 1),
+        backend=backend,
+        nombre=camara["nombre"],
+        cache_detecciones=cache_detecciones,
+        mapa_plazas=(MapaPlazas(camara["plazas"], camara.get("cobertura_plaza", COBERTURA_MIN))
+                     if camara.get("plazas") else None),
+    )
+    if camara.get("puntos"):
+        detector.set_pixels_per_meter(*camara["puntos"])
+    return detector
+
+
+def atender_camara(estado, parqueos):
+    """Bucle de una cámara dentro del trabajador: lee, detecta y actualiza el API."""
+    camara = estado["camara"]
+    try:
+        _bucle_camara(estado, parqueos)
+    except Exception as e:
+        # Se marca el error y se avisa al trabajador: termina con código != 0 sin esperar a las demás cámaras
+        print(f"[{camara['nombre']}] Error en la cámara: {e}")
+        estado["error"] = e
+        estado["fallo"].set()
+    finally:
+        estado["cap"].release()
+
+
+def _bucle_camara(estado, parqueos):
+    from controlador import crear_controlador
+    from pipeline import HiloCaptura
+    from renderizado import Renderizador
+    from reportero import ReporteOcupacion
+    camara = estado["camara"]
+    # La captura corre en su propio hilo y deja solo el frame más reciente
+    captura = HiloCaptura(estado["cap"], descartar=camara.get("en_vivo", True), camara=camara["nombre"])
+    captura.start()
+    detector = estado["detector"]
+    controlador = crear_controlador(camara, detector)
+    renderizador = Renderizador([estado["canal"]] if estado.get("canal") else [])
+    reporte = ReporteOcupacion(
+        lambda espacio, espacios, plazas=None: parqueos.enviar_ocupacion(camara["parqueo_id"], espacio, espacios,
+                                                                         detector.last_capturado_en, plazas),
+        histeresis_m=camara.get("histeresis_m", 1.0),
+        permanencia_s=camara.get("permanencia_s", 3.0),
+        latido_s=camara.get("latido_s", 60.0),
+        nombre=camara["nombre"],
+    )
+    try:
+        # Si otra cámara del trabajador falló, esta también se detiene: el supervisor reinicia el proceso entero
+        while not estado["fallo"].is_set():
+            item = captura.salida.get(timeout=0.5)
+            if item is None:
+                if captura.salida.terminada():
+                    print(f"[{camara['nombre']}] Fin del video ({captura.salida.descartados} frames descartados)")
+                    break
+                continue
+            _, capturado_en, frame = item
+            (controlador or detector).analizar(frame, capturado_en)
+            # Sin ventana: solo se dibuja si hay alguien mirando el stream
+            renderizador.publicar(renderizador.renderizar(detector.anotar, frame))
+
+            if reporte.observar(detector.last_espacio_disponible, detector.last_espacios,
+                                plazas=detector.estado_plazas()):
+                print(reporte.resumen())
+                metricas = detector.metricas()
+                print(f"[{camara['nombre']}] Inferencia ahorrada: {metricas['fraccion_ahorrada']:.0%} "
+                      f"| Falsos negativos: {metricas['tasa_falsos_negativos']:.0%}")
+    finally:
+        captura.detener()
+        captura.join(timeout=2)  # Antes de que atender_camara libere la captura
+
+
+def trabajador(camaras, hilos, model_path, espera_lote=0.02, backend="pytorch", puerto_metricas=None,
+               metricas_json=None, puerto_stream=None):
+    """Proceso trabajador: detecta espacio libre en sus cámaras y actualiza el API."""
+    # Limitar hilos antes de importar torch para que no cree su pool completo
+    os.environ["OMP_NUM_THREADS"] = str(hilos)
+    os.environ["MKL_NUM_THREADS"] = str(hilos)
+    import threading
+    import cv2
+    import torch
+    from detectores import crear_backend
+    import parqueos
+    from inferencia_lotes import InferenciaPorLotes
+
+    torch.set_num_threads(hilos)
+    cv2.setNumThreads(1)
+    parqueos.iniciar_metricas(puerto_metricas, metricas_json)
+    # Spool propio del grupo: el mismo nombre tras un reinicio, distinto al de los otros trabajadores
+    parqueos.cliente_api("+".join(camara["nombre"] for camara in camaras))
+    # Stream MJPEG opcional: un canal por cámara, que solo dibuja mientras alguien mira
+    servidor_stream = None
+    if puerto_stream:
+        from servidor_mjpeg import ServidorMJPEG
+        servidor_stream = ServidorMJPEG(puerto_stream).iniciar()
+
+    # Un solo modelo por trabajador; con varias cámaras sus frames se infieren en lote
+    servicio = None
+    if len(camaras) > 1:
+        # Umbral común del lote; cada detector vuelve a filtrar con el suyo
+        conf_min = 0.1 if any(camara.get("intervalo_deteccion", 1) > 1 for camara in camaras) else 0.5
+        kwargs_modelo = {"clases": (2,), "conf_min": conf_min}
+        if all(camara.get("modo_roi") for camara in camaras):
+            # El lote comparte resolución: se usa la del recorte de la calle
+            kwargs_modelo["imgsz"] = max(camara.get("imgsz_roi", 320) for camara in camaras)
+        backend_lote = crear_backend(backend, model_path)
+        backend_lote.calentar(imgsz=kwargs_modelo.get("imgsz"))
+        servicio = InferenciaPorLotes(backend_lote, max_lote=len(camaras),
+                                      espera_max=espera_lote, **kwargs_modelo).iniciar()
+
+    estados = []
+    hilos_camara = []
+    fallo = threading.Event()  # Lo marca la primera cámara que falla
+    for camara in camaras:
+        cap = abrir_fuente(camara["fuente"])
+        if not cap.isOpened():
+            raise RuntimeError(f"[{camara['nombre']}] No se pudo abrir la fuente {camara['fuente']}")
+        detector = crear_detector(camara, parqueos, model_path, servicio, backend)
+        detector.calentar(forma_fuente(cap))
+        estado = {"camara": camara, "cap": cap, "detector": detector, "error": None, "fallo": fallo,
+                  "canal": servidor_stream.canal(camara["nombre"]) if servidor_stream else None}
+        estados.append(estado)
+        hilos_camara.append(threading.Thread(target=atender_camara, args=(estado, parqueos),
+                                             name=camara["nombre"], daemon=True))
+    print(f"[PID {os.getpid()}] {len(camaras)} cámara(s) con {hilos} hilo(s) de torch")
+
+    for h in hilos_camara:
+        h.start()
+    # Se espera a que terminen todas las cámaras o a que falle la primera
+    while not fallo.wait(0.5) and any(h.is_alive() for h in hilos_camara):
+        pass
+    if fallo.is_set():
+        caidas = [estado["camara"]["nombre"] for estado in estados if estado["error"] is not None]
+        print(f"[PID {os.getpid()}] Falló {', '.join(caidas)}: se detienen las demás cámaras para reiniciar")
+    for h in hilos_camara:
+        h.join(timeout=5)
+    if servicio is not None:
+        servicio.imprimir_reporte()
+        servicio.detener()
+    if servidor_stream is not None:
+        servidor_stream.detener()
+    parqueos.cliente_api().detener()  # Lo pendiente queda en el spool para el próximo arranque
+    if any(estado["error"] is not None for estado in estados):
+        sys.exit(1)
+
+
+def supervisar(grupos, model_path, hilos=None, espera_lote=0.02, backend="pytorch", puerto_metricas=None,
+               metricas_json=None, puerto_stream=None):
+    """Arranca un proceso por grupo y reinicia los que terminan con error.
+
+    Cada trabajador expone sus métricas en puerto_metricas + i y las vuelca a <metricas_json>_<i>.json;
+    con puerto_stream, sirve sus cámaras como MJPEG en puerto_stream + i.
+    """
+    ctx = mp.get_context("spawn")
+    hilos = hilos or presupuesto_hilos(len(grupos))
+    procesos = {}
+    reintentos = {}
+    iniciados = {}
+    reiniciar_en = {}  # Trabajadores caídos esperando su reinicio -> instante en que toca
+
+    def arrancar(i):
+        puerto = puerto_metricas + i if puerto_metricas else None
+        ruta_json = f"{os.path.splitext(metricas_json)[0]}_{i}.json" if metricas_json else None
+        stream = puerto_stream + i if puerto_stream else None
+        p = ctx.Process(target=trabajador, args=(grupos[i], hilos, model_path, espera_lote, backend,
+                                                 puerto, ruta_json, stream),
+                        name=f"trabajador-{i}", daemon=True)
+        p.start()
+        procesos[i] = p
+        iniciados[i] = time.time()
+        print(f"[Supervisor] Trabajador {i} iniciado (PID {p.pid})")
+
+    for i in range(len(grupos)):
+        reintentos[i] = 0
+        arrancar(i)
+
+    try:
+        while procesos or reiniciar_en:
+            time.sleep(1)
+            ahora = time.time()
+            for i, p in list(procesos.items()):
+                if p.is_alive():
+                    if reintentos[i] and ahora - iniciados[i] >= TIEMPO_ESTABLE:
+                        reintentos[i] = 0  # Se recuperó: una caída aislada más adelante no espera el máximo
+                    continue
+                del procesos[i]
+                if p.exitcode == 0:
+                    print(f"[Supervisor] Trabajador {i} terminó normalmente")
+                    continue
+                espera = min(ESPERA_REINICIO * 2 ** reintentos[i], ESPERA_REINICIO_MAX)
+                reintentos[i] += 1
+                print(f"[Supervisor] Trabajador {i} cayó (código {p.exitcode}), reinicio en {espera:.0f}s")
+                # Sin dormir acá: mientras tanto se siguen vigilando los demás trabajadores
+                reiniciar_en[i] = ahora + espera
+            for i, instante in list(reiniciar_en.items()):
+                if ahora >= instante:
+                    del reiniciar_en[i]
+                    arrancar(i)
+    except KeyboardInterrupt:
+        print("[Supervisor] Deteniendo trabajadores...")
+        for p in procesos.values():
+            p.terminate()
+        for p in procesos.values():
+            p.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Detector de espacio libre para varias cámaras")
+    parser.add_argument("config", help="Archivo JSON con la lista de cámaras")
+    parser.add_argument("--modelo", default="models/yolov8n.pt", help="Ruta del modelo YOLO")
+    parser.add_argument("--camaras-por-proceso", type=int, default=1,
+                        help="Cámaras atendidas por cada proceso trabajador")
+    parser.add_argument("--hilos", type=int, default=None,
+                        help="Hilos de torch por trabajador (por defecto núcleos / trabajadores)")
+    parser.add_argument("--backend", default="pytorch", choices=["pytorch", "onnx", "onnx-int8"],
+                        help="Motor de inferencia (ver exportar_modelo.py para ONNX/INT8)")
+    parser.add_argument("--puerto-metricas", type=int, default=None,
+                        help="Puerto base del endpoint /metrics (el trabajador i usa puerto + i)")
+    parser.add_argument("--metricas-json", default=None,
+                        help="Volcar métricas a JSON cada 10 s (metricas.json -> metricas_<i>.json)")
+    parser.add_argument("--espera-lote", type=float, default=0.02,
+                        help="Segundos máximos para juntar frames de un lote de inferencia")
+    parser.add_argument("--puerto-stream", type=int, default=None,
+                        help="Puerto base del stream MJPEG de las cámaras anotadas (el trabajador i usa puerto + i)")
+    parser.add_argument("--latencia-max", type=float, default=None,
+                        help="Activa el control adaptativo: edad máxima del frame al terminar de analizarlo (s)")
+    parser.add_argument("--cuota", type=float, default=None,
+                        help="Control adaptativo: fracción del tiempo que cada cámara puede pasar analizando")
+    args = parser.parse_args()
+
+    camaras = [camara for camara in cargar_camaras(args.config) if camara["tipo"] == "parqueo"]
+    # Los valores de la línea de comandos son el default; la clave 'control' de cada cámara manda
+    control = {clave: valor for clave, valor in (("latencia_max_s", args.latencia_max), ("cuota", args.cuota))
+               if valor is not None}
+    if control:
+        for camara in camaras:
+            camara["control"] = dict(control, **camara.get("control", {}))
+    grupos = agrupar_camaras(camaras, args.camaras_por_proceso)
+    print(f"[Supervisor] {len(camaras)} cámara(s) en {len(grupos)} trabajador(es)")
+    supervisar(grupos, args.modelo, args.hilos, args.espera_lote, args.backend,
+               args.puerto_metricas, args.metricas_json, args.puerto_stream)
+
+
+if __name__ == "__main__":
+    main()
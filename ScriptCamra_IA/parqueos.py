@@ -1,144 +1,252 @@
-import cv2
+import argparse
 import numpy as np
-from ultralytics import YOLO
 import os
+import sys
 import math
+import threading
 import time
-import requests
+from arranque import importar_diferido, reportar_primer_frame
+from cliente_api import ClienteAPI
+from postproceso import como_dicts, desplazar
+from detectores import BackendDetector, crear_backend
+from intervalos import fusionar_intervalos, espacios_disponibles, extensiones_x
+from cache_detecciones import CacheDetecciones, huella_frame
+from compuerta_movimiento import CompuertaMovimiento
+from controlador import crear_controlador
+from roi import franja_linea, recortar
+from renderizado import CapaEstatica, Renderizador
+from reportero import ReporteOcupacion
+from servidor_mjpeg import ServidorMJPEG
+from pipeline import HiloCaptura, EtapaProcesamiento, EtapaPeriodica, estadisticas_pipeline
+from metricas import METRICAS
+
+cv2 = importar_diferido("cv2")  # Se carga con el primer frame, no al importar el script
 
 # Configuración del modelo - MODIFICA ESTA RUTA CON LA UBICACIÓN DE TU MODELO
 MODEL_PATH = "models/yolov8n.pt"  # Ajusta según tu configuración
 
-# Variables globales para almacenar los puntos de la línea de 20 metros
-points = []
-line_defined = False
+# Endpoint del API de notificaciones para actualizar un parqueo
+API_PARQUEOS = "http://192.168.1.3:8001/api/parqueos/{}/"
+PARQUEO_ID = 2  # Parqueo por defecto cuando se usa una sola cámara
+SPOOL_DIR = "spool"  # Peticiones pendientes cuando el API no responde (una subcarpeta por proceso)
+METRICAS_PUERTO = 9108  # Endpoint local /metrics (None para desactivarlo)
+METRICAS_JSON = None    # Ruta para volcar las métricas a JSON periódicamente (None: no se vuelca)
+_cliente_api = None
+_lock_cliente_api = threading.Lock()  # Las cámaras de un trabajador lo piden desde varios hilos
+
+VENTANA = "Detector de Autos - Espacio Disponible"
 
 def mouse_callback(event, x, y, flags, param):
-    """Captura los clics del mouse para definir la línea de 20 metros."""
-    global points, line_defined
-    if event == cv2.EVENT_LBUTTONDOWN and not line_defined:
-        if len(points) < 2:
-            points.append((x, y))
-            print(f"Punto {len(points)} seleccionado: ({x}, {y})")
-        if len(points) == 2:
-            line_defined = True
-            print("Línea de 20 metros definida.")
+    """Captura los clics del mouse para definir la línea de 20 metros (param: el detector)."""
+    if event == cv2.EVENT_LBUTTONDOWN:
+        param.agregar_punto(x, y)
 
 class CarSpaceDetector:
-    def __init__(self, model_path, street_length_meters=20, min_parking_space=4.0):
-        print(f"Cargando modelo YOLOv8 desde: {model_path}")
-        self.model = YOLO(model_path)
+    def __init__(self, model_path, street_length_meters=20, min_parking_space=4.0, servicio_inferencia=None,
+                 compuerta=None, margen_roi_metros=3, modo_roi=False, imgsz_roi=320,
+                 rastreador=None, intervalo_deteccion=1, backend="pytorch", nombre="principal",
+                 cache_detecciones=0, mapa_plazas=None):
+        # Si se comparte un servicio de inferencia por lotes, se usa su backend
+        self.servicio_inferencia = servicio_inferencia
+        if servicio_inferencia is not None:
+            self.backend = servicio_inferencia.backend
+        elif backend is None or isinstance(backend, BackendDetector):
+            self.backend = backend  # None: las detecciones llegan de afuera (ver bus_camara.py)
+        else:
+            print(f"Cargando modelo YOLOv8 ({backend}) desde: {model_path}")
+            self.backend = crear_backend(backend, model_path)
         self.street_length_meters = street_length_meters
         self.min_parking_space = min_parking_space  # Umbral mínimo para espacio útil (metros)
         self.vehicle_classes = [2]  # Solo autos (clase 2 en COCO)
         self.class_names = {2: 'car'}
         self.pixels_per_meter = None  # Se calculará con la línea definida por el usuario
+        # Calibración propia de cada detector: puntos marcados con el mouse o cargados de la config
+        self.points = []
+        self.line_defined = False
         self.last_espacio_disponible = 0  # Último valor de espacio disponible
         self.last_espacios = 0  # Último valor de espacios válidos
+        # Compuerta de movimiento opcional: reutiliza las detecciones si la calle no cambió
+        self.compuerta = compuerta
+        self.margen_roi_metros = margen_roi_metros  # Margen de la franja de calle alrededor de la línea
+        # Modo ROI: inferir solo sobre la franja de la calle y a menor resolución
+        self.modo_roi = modo_roi
+        self.imgsz_roi = imgsz_roi
+        self.imgsz = None  # Resolución sobre el frame completo (None: la del modelo); la ajusta controlador.py
+        self.calibracion = None
+        self.ultimas_detecciones = None
+        self.ultimo_resultado = None  # (autos, espacio, segmentos) del último frame analizado
+        # Modo plazas (MapaPlazas): ocupación por polígono de plaza en lugar de huecos sobre la línea
+        self.mapa_plazas = mapa_plazas
+        self.capa_estatica = CapaEstatica()  # Línea de referencia y textos fijos, dibujados una vez
+        # Rastreador opcional: YOLO cada 'intervalo_deteccion' frames y propagación en los demás
+        self.rastreador = rastreador
+        self.intervalo_deteccion = intervalo_deteccion
+        self.conf_min = rastreador.conf_baja if rastreador is not None else 0.5
+        self.frames_vistos = 0
+        # Métricas por cámara: etiqueta común y captura del frame del último resultado
+        self.nombre = nombre
+        self.last_capturado_en = None
+        if compuerta is not None:
+            METRICAS.registrar_fuente("compuerta", self.metricas, camara=nombre)
+        self.cache = None
+        self.usar_cache(cache_detecciones)
+    
+    def usar_cache(self, capacidad=8):
+        """Un frame idéntico a uno reciente no se vuelve a inferir (0 desactiva la caché).
+
+        Solo conviene con imágenes estáticas: dos frames reales de cámara nunca coinciden y la huella cuesta.
+        """
+        self.cache = CacheDetecciones(capacidad) if capacidad else None
+        if self.cache is not None:
+            METRICAS.registrar_fuente("cache", self.cache.metricas, camara=self.nombre)
     
     def set_pixels_per_meter(self, point1, point2):
         """Calcula la relación píxeles por metro basada en la línea de 20 metros."""
         distance_pixels = math.sqrt((point2[0] - point1[0])**2 + (point2[1] - point1[1])**2)
         self.pixels_per_meter = distance_pixels / 20  # 20 metros
+        self.calibracion = (point1, point2)
+        self.points = [tuple(point1), tuple(point2)]
+        self.line_defined = True
+        if self.compuerta is not None:
+            self.compuerta.set_roi(None)  # Se recalcula con la forma del próximo frame
+    
+    def agregar_punto(self, x, y):
+        """Agrega un extremo de la línea de calibración; con el segundo queda calibrado."""
+        if self.line_defined:
+            return
+        self.points.append((x, y))
+        print(f"Punto {len(self.points)} seleccionado: ({x}, {y})")
+        if len(self.points) == 2:
+            self.set_pixels_per_meter(*self.points)
+            print("Línea de 20 metros definida.")
+    
+    def reiniciar_calibracion(self):
+        """Descarta la línea para volver a marcarla con el mouse."""
+        self.points = []
+        self.line_defined = False
+        self.pixels_per_meter = None
+        self.calibracion = None
+    
+    @property
+    def calibrado(self):
+        """Hay línea de referencia o mapa de plazas: ya se puede analizar."""
+        return self.line_defined or self.mapa_plazas is not None
+    
+    def roi_calle(self, forma):
+        """Franja de la calle alrededor de la línea de calibración (o de las plazas), o None si no hay."""
+        if self.mapa_plazas is not None:
+            return self.mapa_plazas.rect(forma)
+        if self.calibracion is None or not self.pixels_per_meter:
+            return None
+        margen = int(self.margen_roi_metros * self.pixels_per_meter)
+        return franja_linea(*self.calibracion, margen, forma)
     
     def detect_vehicles(self, frame):
-        """Detecta autos en el frame usando YOLOv8."""
-        results = self.model(frame)
-        cars = []
-        for result in results:
-            boxes = result.boxes
-            if boxes is not None:
-                for box in boxes:
-                    cls = int(box.cls[0])
-                    conf = float(box.conf[0])
-                    if cls in self.vehicle_classes and conf > 0.5:
-                        x1, y1, x2, y2 = box.xyxy[0].cpu().numpy()
-                        car_info = {
-                            'class': cls,
-                            'class_name': self.class_names[cls],
-                            'confidence': conf,
-                            'bbox': [int(x1), int(y1), int(x2), int(y2)],
-                            'center_x': int((x1 + x2) / 2),
-                            'center_y': int((y1 + y2) / 2),
-                            'width': int(x2 - x1),
-                            'height': int(y2 - y1)
-                        }
-                        cars.append(car_info)
+        """Detecta autos en el frame usando YOLOv8; devuelve un arreglo estructurado (DETECCION_DTYPE)."""
+        rect = self.roi_calle(frame.shape) if self.modo_roi else None
+        imgsz = self.imgsz_roi if rect is not None else self.imgsz
+        # Sin ROI, recalibrar no cambia la clave: solo se recalculan los metros
+        clave = (huella_frame(frame), rect, imgsz) if self.cache is not None else None
+        if clave is not None:
+            cars = self.cache.obtener(clave)
+            if cars is not None:
+                return cars
+        if rect is not None:
+            frame = recortar(frame, rect)
+        with METRICAS.cronometro("etapa_segundos", etapa="inferencia", camara=self.nombre):
+            if self.servicio_inferencia is not None:
+                cars = self.servicio_inferencia.inferir(frame)
+                cars = cars[np.isin(cars['cls'], self.vehicle_classes) & (cars['conf'] > self.conf_min)]
+            else:
+                cars = self.backend.detectar([frame], self.vehicle_classes, self.conf_min, imgsz)[0]
+        # Las cajas vuelven a coordenadas del frame completo para dibujo y cálculo en metros
+        if rect is not None:
+            cars = desplazar(cars, rect[0], rect[1])
+        if clave is not None:
+            self.cache.guardar(clave, cars)
+        return cars
+    
+    def calentar(self, forma=(480, 640, 3)):
+        """Inferencia de prueba con la forma y resolución reales (recorte ROI si aplica) antes del primer frame."""
+        if self.backend is None or self.servicio_inferencia is not None:
+            return 0.0  # Sin modelo propio: lo calienta quien lo carga
+        rect = self.roi_calle(forma) if self.modo_roi else None
+        if rect is not None:
+            forma, imgsz = (rect[3] - rect[1], rect[2] - rect[0], 3), self.imgsz_roi
+        else:
+            imgsz = self.imgsz
+        segundos = self.backend.calentar(forma, imgsz)
+        print(f"[{self.nombre}] Modelo calentado en {segundos:.2f}s")
+        return segundos
+    
+    def obtener_detecciones(self, frame):
+        """Detecta o propaga los autos del frame (rastreador y compuerta de movimiento si están activos)."""
+        self.frames_vistos += 1
+        if self.rastreador is None:
+            if self.frames_vistos % self.intervalo_deteccion and self.ultimo_resultado is not None:
+                return self.ultimo_resultado[0]  # Sin rastreador se repiten las últimas cajas
+            return self._detectar_con_compuerta(frame)
+        toca_detectar = self.frames_vistos % self.intervalo_deteccion == 0
+        if self.rastreador.tracks and not toca_detectar and not self.rastreador.incierto():
+            return self.rastreador.predecir()
+        return self.rastreador.actualizar(self._detectar_con_compuerta(frame))
+    
+    def _detectar_con_compuerta(self, frame):
+        if self.compuerta is None:
+            return self.detect_vehicles(frame)
+        if self.compuerta.roi is None:
+            rect = self.roi_calle(frame.shape)
+            if rect is not None:
+                self.compuerta.set_roi(rect)
+        motivo = self.compuerta.decidir(frame)
+        if motivo is None and self.ultimas_detecciones is not None:
+            return self.ultimas_detecciones
+        cars = self.detect_vehicles(frame)
+        self.compuerta.registrar_inferencia(motivo, cars, self.ultimas_detecciones)
+        self.ultimas_detecciones = cars
         return cars
     
+    def metricas(self):
+        """Métricas del detector (por ahora, las de la compuerta de movimiento)."""
+        return self.compuerta.metricas() if self.compuerta is not None else {}
+    
     def calculate_occupied_space(self, cars):
         """Calcula el espacio ocupado por los autos, considerando superposiciones."""
-        if not cars or not self.pixels_per_meter:
+        if len(cars) == 0 or not self.pixels_per_meter:
             return 0
-        cars_sorted = sorted(cars, key=lambda v: v['center_x'])
-        merged_boxes = []
-        current_box = cars_sorted[0]['bbox']
-        for car in cars_sorted[1:]:
-            x1, _, x2, _ = current_box
-            next_x1, _, next_x2, _ = car['bbox']
-            if next_x1 <= x2 + 10:  # Margen de 10 píxeles
-                current_box[2] = max(x2, next_x2)
-            else:
-                merged_boxes.append(current_box)
-                current_box = car['bbox']
-        merged_boxes.append(current_box)
-        occupied_pixels = sum(box[2] - box[0] for box in merged_boxes)
+        merged_boxes = fusionar_intervalos(extensiones_x(cars))
+        occupied_pixels = (merged_boxes[:, 1] - merged_boxes[:, 0]).sum()
         occupied_meters = occupied_pixels / self.pixels_per_meter
         return min(occupied_meters, self.street_length_meters)
     
     def calculate_available_space(self, cars, frame_width):
         """Calcula el espacio disponible, considerando solo segmentos >= min_parking_space."""
-        if not cars or not self.pixels_per_meter:
+        if len(cars) == 0 or not self.pixels_per_meter:
             return self.street_length_meters, [(0, frame_width, self.street_length_meters)]
         
-        cars_sorted = sorted(cars, key=lambda v: v['center_x'])
-        merged_boxes = []
-        current_box = cars_sorted[0]['bbox']
-        for car in cars_sorted[1:]:
-            x1, _, x2, _ = current_box
-            next_x1, _, next_x2, _ = car['bbox']
-            if next_x1 <= x2 + 10:
-                current_box[2] = max(x2, next_x2)
-            else:
-                merged_boxes.append(current_box)
-                current_box = car['bbox']
-        merged_boxes.append(current_box)
-        
-        available_segments = []
-        start_x = 0
-        for box in merged_boxes:
-            x1, _, x2, _ = box
-            gap_pixels = x1 - start_x
-            gap_meters = gap_pixels / self.pixels_per_meter
-            if gap_meters >= self.min_parking_space:
-                available_segments.append((start_x, x1, gap_meters))
-            start_x = x2
-        
-        # Espacio al final de la calle
-        gap_pixels = frame_width - start_x
-        gap_meters = gap_pixels / self.pixels_per_meter
-        if gap_meters >= self.min_parking_space:
-            available_segments.append((start_x, frame_width, gap_meters))
-        
-        total_available = sum(segment[2] for segment in available_segments)
-        return total_available, available_segments
+        resultado = espacios_disponibles(extensiones_x(cars), 0, frame_width,
+                                         self.pixels_per_meter, self.min_parking_space)
+        available_segments = [(int(x1), int(x2), float(m)) for x1, x2, m in resultado.validos]
+        return resultado.metros_validos, available_segments
     
     def draw_reference_line(self, frame):
         """Dibuja la línea de 20 metros definida por el usuario."""
-        if len(points) == 2:
-            cv2.line(frame, points[0], points[1], (0, 0, 0), 5)
-            mid_x = (points[0][0] + points[1][0]) // 2
-            mid_y = (points[0][1] + points[1][1]) // 2
+        if len(self.points) == 2:
+            cv2.line(frame, self.points[0], self.points[1], (0, 0, 0), 5)
+            mid_x = (self.points[0][0] + self.points[1][0]) // 2
+            mid_y = (self.points[0][1] + self.points[1][1]) // 2
             cv2.putText(frame, "20 metros", (mid_x, mid_y - 15), 
                         cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 0, 0), 2)
     
     def draw_detections(self, frame, cars):
         """Dibuja las cajas delimitadoras de los autos detectados."""
-        for car in cars:
+        for car in como_dicts(cars, self.class_names):
             x1, y1, x2, y2 = car['bbox']
             color = (0, 255, 0)
             cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
             label = f"Auto: {car['confidence']:.2f} | Pos: ({car['center_x']}, {car['center_y']})"
+            if 'track_id' in car:
+                label = f"#{car['track_id']} " + label
             cv2.putText(frame, label, (x1, y1-10), cv2.FONT_HERSHEY_SIMPLEX, 
                         0.5, color, 2)
         return frame
@@ -151,83 +259,178 @@ class CarSpaceDetector:
             cv2.putText(frame, f"{length:.2f}m", (int((start_x + end_x)/2), y_pos - 10), 
                         cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 0, 0), 2)
     
-    def process_frame(self, frame):
-        """Procesa un frame, dibujando detecciones, línea de referencia y estadísticas."""
-        global line_defined
-        frame_copy = frame.copy()
-        
-        # Si la línea no está definida, mostrar mensaje y devolver frame sin procesar
-        if not line_defined:
-            cv2.putText(frame_copy, "Haz clic en 2 puntos para definir la linea de 20m", 
-                        (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
+    def analizar(self, frame, capturado_en=None, detecciones=None):
+        """Detecta autos y calcula el espacio disponible sin dibujar nada; devuelve (autos, espacio, segmentos).
+
+        Con 'detecciones' (ya calculadas por otro proceso para este frame) no se corre la inferencia.
+        """
+        self.last_capturado_en = capturado_en if capturado_en is not None else time.time()
+        if not self.calibrado:
             self.last_espacio_disponible = 0
             self.last_espacios = 0
-            return frame_copy, 0, 0
-        
-        # Calcular píxeles por metro si no está definido
-        if len(points) == 2 and self.pixels_per_meter is None:
-            self.set_pixels_per_meter(points[0], points[1])
+            self.ultimo_resultado = None
+            return None
         
         # Detectar autos
-        cars = self.detect_vehicles(frame_copy)
-        frame_width = frame_copy.shape[1]
-        
-        # Dibujar detecciones y línea de referencia
-        frame_with_detections = self.draw_detections(frame_copy, cars)
-        self.draw_reference_line(frame_with_detections)
+        if detecciones is None:
+            cars = self.obtener_detecciones(frame)
+        else:
+            cars = detecciones[np.isin(detecciones['cls'], self.vehicle_classes)]
         
-        # Calcular espacio disponible y ocupado
-        available_space, available_segments = self.calculate_available_space(cars, frame_width)
-        occupied_space = self.street_length_meters - available_space
+        if self.mapa_plazas is not None:
+            # Modo plazas: el "espacio" es la cantidad de plazas libres y no hay segmentos
+            with METRICAS.cronometro("etapa_segundos", etapa="postproceso", camara=self.nombre):
+                self.mapa_plazas.actualizar(cars)
+            libres = self.mapa_plazas.libres()
+            self.last_espacio_disponible = libres
+            self.last_espacios = libres
+            self.ultimo_resultado = (cars, libres, [])
+            reportar_primer_frame(self.nombre)
+            return self.ultimo_resultado
         
-        # Dibujar segmentos disponibles
-        self.draw_available_segments(frame_with_detections, available_segments)
-        
-        if round(available_space, 2) == 20.0:
-            espacio_disponible = int(round(available_space))
-            espacios = 4
-            info_text = [
-                f"Autos detectados: {len(cars)}",
-                f"Espacio ocupado: {occupied_space:.2f}m",
-                f"Espacio disponible: {espacio_disponible}m",
-                f"Espacios validos: {espacios}",
-                f"Longitud total: {self.street_length_meters}m",
-                f"Pixeles por metro: {self.pixels_per_meter:.2f}"
-            ]
-        else:
-            espacio_disponible = int(round(available_space))
-            espacios = len(available_segments)
-            info_text = [
-                f"Autos detectados: {len(cars)}",
-                f"Espacio ocupado: {occupied_space:.2f}m",
-                f"Espacio disponible: {espacio_disponible}m",
-                f"Espacios validos: {espacios}",
-                f"Longitud total: {self.street_length_meters}m",
-                f"Pixeles por metro: {self.pixels_per_meter:.2f}"
-            ]
+        # Calcular espacio disponible
+        with METRICAS.cronometro("etapa_segundos", etapa="postproceso", camara=self.nombre):
+            available_space, available_segments = self.calculate_available_space(cars, frame.shape[1])
         
         # Actualizar las variables de instancia
-        self.last_espacio_disponible = espacio_disponible
-        self.last_espacios = espacios
-        
+        self.last_espacio_disponible = int(round(available_space))
+        self.last_espacios = 4 if round(available_space, 2) == 20.0 else len(available_segments)
+        self.ultimo_resultado = (cars, available_space, available_segments)
+        reportar_primer_frame(self.nombre)
+        return self.ultimo_resultado
+    
+    def estado_plazas(self):
+        """{"nombre": "libre" | "ocupada"} del último frame, o None fuera del modo plazas."""
+        return self.mapa_plazas.estado() if self.mapa_plazas is not None else None
+    
+    def draw_info_text(self, frame, lineas, desde=0):
+        """Escribe líneas de información con fondo blanco para mejor legibilidad."""
         y_offset = 20
-        for i, text in enumerate(info_text):
-            # Dibujar texto con fondo blanco para mejor legibilidad
-            cv2.putText(frame_with_detections, text, (10, y_offset + i*25), 
+        for i, text in enumerate(lineas, desde):
+            cv2.putText(frame, text, (10, y_offset + i*25), 
                         cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 4)
-            cv2.putText(frame_with_detections, text, (10, y_offset + i*25), 
+            cv2.putText(frame, text, (10, y_offset + i*25), 
                         cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 0), 2)
+    
+    def draw_static_overlay(self, frame):
+        """Lo que solo cambia con la calibración: línea de referencia y datos fijos."""
+        self.draw_reference_line(frame)
+        self.draw_info_text(frame, [f"Longitud total: {self.street_length_meters}m",
+                                    f"Pixeles por metro: {self.pixels_per_meter:.2f}"], desde=4)
+    
+    def anotar(self, frame, salida=None):
+        """Dibuja el último resultado de analizar() sobre una copia del frame (o sobre 'salida', preasignado)."""
+        if salida is None:
+            frame_copy = frame.copy()
+        else:
+            np.copyto(salida, frame)
+            frame_copy = salida
+        
+        # Si la línea no está definida, mostrar mensaje y devolver frame sin procesar
+        if self.ultimo_resultado is None:
+            self.capa_estatica.componer(frame_copy, "sin_linea", lambda imagen: cv2.putText(
+                imagen, "Haz clic en 2 puntos para definir la linea de 20m",
+                (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2))
+            return frame_copy
+        
+        inicio_dibujo = time.perf_counter()
+        cars, available_space, available_segments = self.ultimo_resultado
+        occupied_space = self.street_length_meters - available_space
         
-        return frame_with_detections, available_space, len(cars)
+        # Detecciones y segmentos cambian en cada frame; la línea y los datos fijos vienen de la capa cacheada
+        frame_with_detections = self.draw_detections(frame_copy, cars)
+        if self.mapa_plazas is not None:
+            # El color de cada plaza depende de la ocupación: se dibujan en cada frame
+            self.mapa_plazas.dibujar(frame_with_detections)
+            self.draw_info_text(frame_with_detections, [
+                f"Autos detectados: {len(cars)}",
+                f"Plazas libres: {self.last_espacios} de {len(self.mapa_plazas)}",
+            ])
+            METRICAS.observar("etapa_segundos", time.perf_counter() - inicio_dibujo, etapa="dibujo", camara=self.nombre)
+            return frame_with_detections
+        self.capa_estatica.componer(frame_with_detections,
+                                    (tuple(self.points), self.pixels_per_meter, self.street_length_meters),
+                                    self.draw_static_overlay)
+        self.draw_available_segments(frame_with_detections, available_segments)
+        
+        self.draw_info_text(frame_with_detections, [
+            f"Autos detectados: {len(cars)}",
+            f"Espacio ocupado: {occupied_space:.2f}m",
+            f"Espacio disponible: {self.last_espacio_disponible}m",
+            f"Espacios validos: {self.last_espacios}",
+        ])
+        METRICAS.observar("etapa_segundos", time.perf_counter() - inicio_dibujo, etapa="dibujo", camara=self.nombre)
+        
+        return frame_with_detections
+    
+    def process_frame(self, frame, capturado_en=None, anotar=True):
+        """Procesa un frame; con anotar=False no se dibuja nada y el frame devuelto es None."""
+        resultado = self.analizar(frame, capturado_en)
+        available_space, car_count = (resultado[1], len(resultado[0])) if resultado is not None else (0, 0)
+        return (self.anotar(frame) if anotar else None), available_space, car_count
 
 def main():
-    global line_defined, points
-    if not os.path.exists(MODEL_PATH):
-        print(f"Error: No se encontró el modelo en la ruta: {MODEL_PATH}")
+    parser = argparse.ArgumentParser(description="Detector de espacio disponible para estacionar")
+    parser.add_argument("--config", help="JSON de cámaras (formato de multicamara.py); sin ventana salvo --mostrar")
+    parser.add_argument("--camara", help="Nombre de la cámara de la config (por defecto la primera)")
+    parser.add_argument("--mostrar", action="store_true", help="Mostrar la ventana anotada también con --config")
+    parser.add_argument("--modelo", default=MODEL_PATH, help="Ruta del modelo YOLO")
+    parser.add_argument("--backend", default="pytorch", choices=["pytorch", "onnx", "onnx-int8"],
+                        help="Motor de inferencia")
+    parser.add_argument("--verificar", action="store_true",
+                        help="Solo validar la config y salir (no carga cv2 ni el modelo)")
+    parser.add_argument("--stream", type=int, default=None, metavar="PUERTO",
+                        help="Servir los frames anotados como MJPEG en http://<host>:PUERTO/ (con --config)")
+    args = parser.parse_args()
+    
+    if args.verificar:
+        main_config(args)
+        return
+    iniciar_metricas(METRICAS_PUERTO, METRICAS_JSON)
+    if args.config:
+        main_config(args)
+    else:
+        main_interactivo(args.modelo, args.backend)
+
+def main_config(args):
+    """Modo servidor: fuente y calibración desde el archivo, sin input() ni ventana."""
+    from multicamara import abrir_fuente, cargar_camaras, crear_detector
+    if not args.config:
+        print("Error: --verificar necesita --config")
+        return
+    camaras = [c for c in cargar_camaras(args.config) if c["tipo"] == "parqueo"]
+    if args.camara:
+        camaras = [c for c in camaras if c["nombre"] == args.camara]
+    if not camaras:
+        print(f"Error: No hay cámaras de parqueo{' llamadas ' + args.camara if args.camara else ''} en {args.config}")
+        return
+    camara = camaras[0]
+    if args.verificar:
+        print(f"Config válida: {len(camaras)} cámara(s) de parqueo; se usaría '{camara['nombre']}' "
+              f"({camara['fuente']}, parqueo {camara['parqueo_id']})")
+        return
+    detector = crear_detector(camara, sys.modules[__name__], args.modelo, backend=args.backend)
+    cap = abrir_fuente(camara["fuente"])
+    if not cap.isOpened():
+        print(f"Error: No se pudo abrir la fuente {camara['fuente']}")
+        return
+    print(f"[{camara['nombre']}] Procesando {camara['fuente']} (parqueo {camara['parqueo_id']})")
+    cliente_api(camara["nombre"])  # Spool propio de la cámara
+    servidor = ServidorMJPEG(args.stream).iniciar() if args.stream else None
+    process_video(detector, cap, camara["parqueo_id"], descartar_frames=camara.get("en_vivo", True),
+                  mostrar=args.mostrar, controlador=crear_controlador(camara, detector),
+                  sumideros=[servidor.canal(camara["nombre"])] if servidor else ())
+    if servidor is not None:
+        servidor.detener()
+
+def main_interactivo(model_path=MODEL_PATH, backend="pytorch"):
+    if backend == "pytorch" and not os.path.exists(model_path):
+        print(f"Error: No se encontró el modelo en la ruta: {model_path}")
         return
     
-    print(f"Cargando modelo desde: {MODEL_PATH}")
-    detector = CarSpaceDetector(model_path=MODEL_PATH, street_length_meters=20)
+    print(f"Cargando modelo desde: {model_path}")
+    detector = CarSpaceDetector(model_path=model_path, street_length_meters=20,
+                                compuerta=CompuertaMovimiento(forzar_cada=5.0), backend=backend)
     
     print("Selecciona la fuente de video:")
     print("1. Cámara web (0)")
@@ -235,8 +438,8 @@ def main():
     print("3. Imagen estática")
     choice = input("Ingresa tu opción (1-3): ")
     
-    cv2.namedWindow("Detector de Autos - Espacio Disponible")
-    cv2.setMouseCallback("Detector de Autos - Espacio Disponible", mouse_callback)
+    cv2.namedWindow(VENTANA)
+    cv2.setMouseCallback(VENTANA, mouse_callback, detector)
     
     if choice == '1':
         print("Intentando abrir cámara web...")
@@ -255,7 +458,7 @@ def main():
             print("Error: No se pudo abrir el archivo de video")
             return
         print("Video cargado exitosamente")
-        process_video(detector, cap)
+        process_video(detector, cap, descartar_frames=False)
     
     elif choice == '3':
         image_path = input("Ingresa la ruta de la imagen: ")
@@ -270,89 +473,157 @@ def main():
     else:
         print("Opción no válida")
 
-def process_video(detector, cap):
-    global line_defined, points
+def actualizar_parqueo(detector, parqueo_id=PARQUEO_ID):
+    """Envía al API el último espacio disponible calculado por el detector."""
+    enviar_ocupacion(parqueo_id, detector.last_espacio_disponible, detector.last_espacios,
+                     detector.last_capturado_en, detector.estado_plazas())
+
+def enviar_ocupacion(parqueo_id, espacio_disponible, espacios, capturado_en=None, estado_plazas=None):
+    """PATCH del espacio disponible y la cantidad de espacios válidos de un parqueo.
+
+    capturado_en: instante de captura del frame que originó el dato (mide la edad al llegar al API).
+    estado_plazas: {"nombre": "libre" | "ocupada"} en el modo plazas (se guarda en Parqueo.estado_plazas).
+    """
+    payload = {
+        "descripcion": f"Espacios disponibles: {espacios}",
+        "espacio_disponible": espacio_disponible
+    }
+    if estado_plazas is not None:
+        payload["descripcion"] = f"Plazas libres: {espacios} de {len(estado_plazas)}"
+        payload["estado_plazas"] = estado_plazas
+    # El envío ocurre en segundo plano; si el API no responde queda en el spool
+    cliente_api().enviar("PATCH", API_PARQUEOS.format(parqueo_id), json=payload,
+                         clave_colapso=f"parqueo:{parqueo_id}", capturado_en=capturado_en)
+
+def cliente_api(nombre_spool="principal"):
+    """Cliente HTTP en segundo plano compartido por todo el proceso.
+
+    nombre_spool: subcarpeta de SPOOL_DIR de este proceso (solo cuenta en la primera llamada). Dos procesos
+    nunca deben compartirla: cada uno reenvía y reescribe su spool sin coordinarse con los demás.
+    """
+    global _cliente_api
+    with _lock_cliente_api:
+        if _cliente_api is None:
+            _cliente_api = ClienteAPI(spool_dir=os.path.join(SPOOL_DIR, nombre_spool)).iniciar()
+    return _cliente_api
+
+def iniciar_metricas(puerto=None, ruta_json=None, intervalo_json=10.0):
+    """Levanta el endpoint /metrics y el volcado a JSON si están configurados."""
+    if puerto:
+        try:
+            METRICAS.servir(puerto)
+        except OSError as e:
+            print(f"[Métricas] No se pudo abrir el puerto {puerto}: {e}")
+    if ruta_json:
+        return METRICAS.volcado_periodico(ruta_json, intervalo_json)
+    return None
+
+def process_video(detector, cap, parqueo_id=PARQUEO_ID, descartar_frames=True, mostrar=True, controlador=None,
+                  sumideros=()):
+    """Procesa video en etapas: captura, inferencia y reporte en hilos; la ventana en el hilo principal.
+
+    Con mostrar=False no se dibuja ni se abre ventana (servidor sin pantalla); se corta con Ctrl+C.
+    Con un ControladorTasa (controlador.py) el intervalo y la resolución se adaptan a la carga.
+    'sumideros' recibe también los frames anotados (p. ej. un canal de servidor_mjpeg.py).
+    """
     if not cap.isOpened():
         print("Error: No se pudo abrir la fuente de video")
         return
     
-    print("Presiona 'q' para salir, 'r' para reiniciar la selección de puntos")
-    frame_count = 0
-    last_update_time = time.time()  # Tiempo de la última actualización
+    # La inferencia en frío se paga acá y no con el primer frame real
+    from multicamara import forma_fuente
+    detector.calentar(forma_fuente(cap))
     
-    while True:
-        ret, frame = cap.read()
-        if not ret or frame is None or frame.size == 0:
-            print("Error: No se pudo leer el frame o fin del video")
-            break
-        
-        frame_count += 1
-        try:
-            processed_frame, available_space, car_count = detector.process_frame(frame)
-            if processed_frame is None or processed_frame.size == 0:
-                print("Frame procesado vacío, usando frame original")
-                processed_frame = frame
-            
-            cv2.imshow("Detector de Autos - Espacio Disponible", processed_frame)
-            
-            if frame_count % 20 == 0 and line_defined:
-                print(f"Frame {frame_count} | Autos: {car_count} | Espacio disponible: {available_space:.2f}m")
+    if mostrar:
+        print("Presiona 'q' para salir, 'r' para reiniciar la selección de puntos")
+    
+    # La anotación solo se genera si hay alguien mirando (sin sumideros, renderizar() no hace nada)
+    renderizador = Renderizador(([lambda imagen: cv2.imshow(VENTANA, imagen)] if mostrar else []) + list(sumideros))
+    
+    def inferir(item):
+        frame_id, capturado_en, frame = item
+        _, available_space, car_count = (controlador or detector).process_frame(frame, capturado_en, anotar=False)
+        processed_frame = renderizador.renderizar(detector.anotar, frame)
+        return frame_id, capturado_en, processed_frame, available_space, car_count
+    
+    # Solo se escribe en el API cuando el estado cambia de verdad (o por latido)
+    reporte = ReporteOcupacion(
+        lambda espacio, espacios, plazas=None: enviar_ocupacion(parqueo_id, espacio, espacios,
+                                                                detector.last_capturado_en, plazas),
+        nombre=f"parqueo {parqueo_id}")
+    
+    def reportar():
+        # Cada segundo, solo si la línea (o el mapa de plazas) está definida
+        if detector.calibrado:
+            reporte.observar(detector.last_espacio_disponible, detector.last_espacios,
+                             plazas=detector.estado_plazas())
+    
+    # Con cámaras en vivo se descarta el frame viejo; con archivos se procesan todos
+    captura = HiloCaptura(cap, descartar=descartar_frames, camara=detector.nombre)
+    etapa_inferencia = EtapaProcesamiento(inferir, captura.salida, nombre="inferencia")
+    METRICAS.registrar_fuente("pipeline", lambda: estadisticas_pipeline(captura, etapa_inferencia),
+                              camara=detector.nombre)
+    etapa_reporte = EtapaPeriodica(reportar, intervalo=1, nombre="reporte")
+    for hilo in (captura, etapa_inferencia, etapa_reporte):
+        hilo.start()
+    
+    frame_count = 0
+    try:
+        while not etapa_inferencia.salida.terminada():
+            item = etapa_inferencia.salida.get(timeout=0.05 if mostrar else 0.5)
+            if item is not None:
+                frame_id, _, processed_frame, available_space, car_count = item
+                frame_count += 1
+                renderizador.publicar(processed_frame)
+                
+                if frame_count % 20 == 0 and detector.calibrado:
+                    stats = estadisticas_pipeline(captura, etapa_inferencia)
+                    print(f"Frame {frame_id} | Autos: {car_count} | Espacio disponible: {available_space:.2f}m "
+                          f"| Descartados: {stats['descartados_captura']}")
+                    print(reporte.resumen())
+                    metricas = detector.metricas()
+                    if metricas:
+                        print(f"Compuerta | Inferencia ahorrada: {metricas['fraccion_ahorrada']:.0%} "
+                              f"| Falsos negativos: {metricas['tasa_falsos_negativos']:.0%}")
+            if not mostrar:
+                continue
             
-            # Verificar si han pasado 5 segundos y la línea está definida
-            current_time = time.time()
-            if line_defined and current_time - last_update_time >= 5:
-                payload = {
-                    "descripcion": f"Espacios disponibles: {detector.last_espacios}",
-                    "espacio_disponible": detector.last_espacio_disponible
-                }
-                try:
-                    response = requests.patch("http://192.168.1.3:8001/api/parqueos/2/", json=payload)
-                    if response.status_code == 200:
-                        print("API actualizada exitosamente")
-                    else:
-                        print(f"Fallo al actualizar la API: {response.status_code}")
-                except Exception as e:
-                    print(f"Error al actualizar la API: {e}")
-                last_update_time = current_time
-        
-        except Exception as e:
-            print(f"Error procesando frame {frame_count}: {e}")
-            continue
-        
-        key = cv2.waitKey(1) & 0xFF
-        if key == ord('q'):
-            break
-        elif key == ord('r'):
-            points = []
-            line_defined = False
-            detector.pixels_per_meter = None  # Resetear para nueva línea
-            print("Selección de puntos reiniciada.")
+            key = cv2.waitKey(1) & 0xFF
+            if key == ord('q'):
+                break
+            elif key == ord('r'):
+                detector.reiniciar_calibracion()
+                print("Selección de puntos reiniciada.")
+    except KeyboardInterrupt:
+        print("Deteniendo...")
     
-    print(f"Total de frames procesados: {frame_count}")
+    captura.detener()
+    etapa_reporte.detener()
+    captura.join()
+    etapa_inferencia.join()
+    stats = estadisticas_pipeline(captura, etapa_inferencia)
+    print(reporte.resumen())
+    print(f"Total de frames procesados: {stats['frames_procesados']} de {stats['frames_leidos']} leídos "
+          f"({stats['descartados_captura']} descartados en captura)")
     cap.release()
-    cv2.destroyAllWindows()
+    if mostrar:
+        cv2.destroyAllWindows()
 
-def process_image(detector, image):
-    global line_defined, points
+def process_image(detector, image, parqueo_id=PARQUEO_ID):
+    # La misma imagen se analiza en cada vuelta (y tras recalibrar): la caché evita repetir la inferencia
+    if detector.cache is None:
+        detector.usar_cache()
+    cv2.namedWindow("Resultado - Detector de Autos")
+    cv2.setMouseCallback("Resultado - Detector de Autos", mouse_callback, detector)
     print("Haz clic en dos puntos para definir la línea de 20 metros. Presiona 'q' para salir, 'r' para reiniciar.")
+    renderizador = Renderizador([lambda imagen: cv2.imshow("Resultado - Detector de Autos", imagen)])
     
     while True:
-        processed_image, available_space, car_count = detector.process_frame(image)
-        cv2.imshow("Resultado - Detector de Autos", processed_image)
+        _, available_space, car_count = detector.process_frame(image, anotar=False)
+        renderizador.publicar(renderizador.renderizar(detector.anotar, image))
         
-        if line_defined:
-            payload = {
-                "descripcion": f"Espacios disponibles: {detector.last_espacios}",
-                "espacio_disponible": detector.last_espacio_disponible
-            }
-            try:
-                response = requests.patch("http://192.168.1.3:8001/api/parqueos/2/", json=payload)
-                if response.status_code == 200:
-                    print("API actualizada exitosamente")
-                else:
-                    print(f"Fallo al actualizar la API: {response.status_code}")
-            except Exception as e:
-                print(f"Error al actualizar la API: {e}")
+        if detector.calibrado:
+            actualizar_parqueo(detector, parqueo_id)
             
             print(f"Análisis completado:")
             print(f"Autos detectados: {car_count}")
@@ -366,12 +637,12 @@ def process_image(detector, image):
         if key == ord('q'):
             break
         elif key == ord('r'):
-            points = []
-            line_defined = False
-            detector.pixels_per_meter = None  # Resetear para nueva línea
+            detector.reiniciar_calibracion()
             print("Selección de puntos reiniciada.")
     
     cv2.destroyAllWindows()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
+    if _cliente_api is not None:
+        _cliente_api.detener()
\ No newline at end of file
@@ -0,0 +1,143 @@
+import threading
+import time
+from collections import deque
+
+from metricas import METRICAS
+
+# Etapas del pipeline de video (captura -> inferencia -> render/reporte) conectadas
+# por colas acotadas que descartan el frame más viejo cuando se llenan.
+
+
+class ColaUltimo:
+    """Cola acotada que, al llenarse, descarta el elemento más viejo."""
+
+    def __init__(self, maxsize=1):
+        self.items = deque()
+        self.maxsize = maxsize
+        self.cond = threading.Condition()
+        self.cerrada = False
+        self.descartados = 0
+        self.recibidos = 0
+
+    def put(self, item, bloquear=False):
+        """Agrega un elemento; si bloquear=False descarta el más viejo en vez de esperar."""
+        with self.cond:
+            if bloquear:
+                while len(self.items) >= self.maxsize and not self.cerrada:
+                    self.cond.wait()
+            elif len(self.items) >= self.maxsize:
+                self.items.popleft()
+                self.descartados += 1
+            self.items.append(item)
+            self.recibidos += 1
+            self.cond.notify_all()
+
+    def get(self, timeout=None):
+        """Devuelve el siguiente elemento; None si la cola está cerrada y vacía o vence el timeout."""
+        with self.cond:
+            if not self.cond.wait_for(lambda: self.items or self.cerrada, timeout):
+                return None
+            if not self.items:
+                return None
+            item = self.items.popleft()
+            self.cond.notify_all()
+            return item
+
+    def cerrar(self):
+        """Marca el fin del flujo y despierta a quien espere."""
+        with self.cond:
+            self.cerrada = True
+            self.cond.notify_all()
+
+    def terminada(self):
+        with self.cond:
+            return self.cerrada and not self.items
+
+
+class HiloCaptura(threading.Thread):
+    """Lee frames de un cv2.VideoCapture y deja solo el más reciente en la cola."""
+
+    def __init__(self, cap, salida=None, descartar=True, camara="principal"):
+        super().__init__(name="captura", daemon=True)
+        self.camara = camara  # Etiqueta de las métricas
+        self.cap = cap
+        self.salida = salida or ColaUltimo(1)
+        self.descartar = descartar  # False para archivos de video: no se pierde ningún frame
+        self.frames_leidos = 0
+        self.activo = True
+
+    def run(self):
+        while self.activo:
+            inicio = time.perf_counter()
+            ret, frame = self.cap.read()
+            METRICAS.observar("etapa_segundos", time.perf_counter() - inicio, etapa="captura", camara=self.camara)
+            if not ret or frame is None or frame.size == 0:
+                print("Error: No se pudo leer el frame o fin del video")
+                break
+            self.frames_leidos += 1
+            self.salida.put((self.frames_leidos, time.time(), frame), bloquear=not self.descartar)
+        self.salida.cerrar()
+
+    def detener(self):
+        self.activo = False
+        self.salida.cerrar()
+
+
+class EtapaProcesamiento(threading.Thread):
+    """Aplica una función a cada elemento de la cola de entrada y publica el resultado."""
+
+    def __init__(self, funcion, entrada, salida=None, nombre="procesamiento"):
+        super().__init__(name=nombre, daemon=True)
+        self.funcion = funcion
+        self.entrada = entrada
+        self.salida = salida or ColaUltimo(1)
+        self.procesados = 0
+        self.errores = 0
+
+    def run(self):
+        while True:
+            item = self.entrada.get(timeout=0.5)
+            if item is None:
+                if self.entrada.terminada():
+                    break
+                continue
+            try:
+                resultado = self.funcion(item)
+            except Exception as e:
+                self.errores += 1
+                print(f"Error en la etapa {self.name} (frame {item[0]}): {e}")
+                continue
+            self.procesados += 1
+            self.salida.put(resultado)
+        self.salida.cerrar()
+
+
+class EtapaPeriodica(threading.Thread):
+    """Ejecuta una función cada 'intervalo' segundos fuera del bucle de frames."""
+
+    def __init__(self, funcion, intervalo, nombre="periodica"):
+        super().__init__(name=nombre, daemon=True)
+        self.funcion = funcion
+        self.intervalo = intervalo
+        self.evento_fin = threading.Event()
+
+    def run(self):
+        while not self.evento_fin.wait(self.intervalo):
+            try:
+                self.funcion()
+            except Exception as e:
+                print(f"Error en la etapa {self.name}: {e}")
+
+    def detener(self):
+        self.evento_fin.set()
+
+
+def estadisticas_pipeline(captura, etapa):
+    """Contadores de frames leídos, procesados y descartados por etapa."""
+    return {
+        "frames_leidos": captura.frames_leidos,
+        "descartados_captura": captura.salida.descartados,
+        "frames_procesados": etapa.procesados,
+        "errores_procesamiento": etapa.errores,
+        "descartados_render": etapa.salida.descartados,
+    }
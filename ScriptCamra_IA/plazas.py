@@ -0,0 +1,112 @@
+import numpy as np
+
+from arranque import importar_diferido
+
+cv2 = importar_diferido("cv2")
+
+# Ocupación por plaza: cada plaza de estacionamiento es un polígono en la imagen de
+# la cámara. En cada frame se arma una sola matriz (autos x plazas) con NumPy: la
+# fracción de la caja de cada plaza cubierta por la caja de cada auto, anulada donde
+# el punto de apoyo del auto no cae dentro del polígono. Cada auto ocupa la plaza con
+# mayor cobertura, así que un auto grande no marca también a las vecinas. Todo es
+# difusión sobre arreglos (N, M) y (N, M, K), sin bucles por plaza: cientos de plazas
+# por cámara cuestan lo mismo que unas pocas.
+
+COBERTURA_MIN = 0.3     # Fracción mínima de la plaza cubierta por el auto para ocuparla
+FRACCION_APOYO = 0.8    # Altura (desde arriba) del punto de apoyo dentro de la caja del auto
+
+
+def validar_plazas(plazas):
+    """Lanza ValueError si 'plazas' no es [{"nombre", "puntos": [[x, y], ...]}] con nombres únicos."""
+    if not plazas:
+        raise ValueError("'plazas' debe tener al menos una plaza")
+    nombres = set()
+    for i, plaza in enumerate(plazas):
+        if "nombre" not in plaza or len(plaza.get("puntos", ())) < 3:
+            raise ValueError(f"Plaza {i}: se requiere 'nombre' y 'puntos' (3 o más)")
+        if plaza["nombre"] in nombres:
+            raise ValueError(f"Plaza {i}: nombre repetido '{plaza['nombre']}'")
+        nombres.add(plaza["nombre"])
+
+
+class MapaPlazas:
+    """Polígonos de las plazas de una cámara y su ocupación vectorizada frente a las detecciones."""
+
+    def __init__(self, plazas, cobertura_min=COBERTURA_MIN):
+        validar_plazas(plazas)
+        self.nombres = [plaza["nombre"] for plaza in plazas]
+        self.cobertura_min = cobertura_min
+        self.poligonos = [np.asarray(plaza["puntos"], dtype=np.int32).reshape(-1, 2) for plaza in plazas]
+        # Todos los polígonos con K vértices repitiendo el último: las aristas de largo 0 no cruzan nada
+        k = max(len(p) for p in self.poligonos)
+        vertices = np.stack([np.concatenate([p, np.repeat(p[-1:], k - len(p), axis=0)])
+                             for p in self.poligonos]).astype(np.float32)  # (M, K, 2)
+        self.xi, self.yi = vertices[..., 0], vertices[..., 1]
+        self.xj, self.yj = np.roll(self.xi, 1, axis=1), np.roll(self.yi, 1, axis=1)
+        dy = self.yj - self.yi
+        self.pendiente = (self.xj - self.xi) / np.where(dy == 0, 1, dy)  # Solo se usa donde la arista cruza
+        self.cajas = np.concatenate([vertices.min(axis=1), vertices.max(axis=1)], axis=1)  # (M, 4)
+        self.areas = np.maximum(1.0, (self.cajas[:, 2] - self.cajas[:, 0]) * (self.cajas[:, 3] - self.cajas[:, 1]))
+        self.ocupadas = np.zeros(len(self.nombres), dtype=bool)
+
+    def __len__(self):
+        return len(self.nombres)
+
+    def dentro(self, xs, ys):
+        """Matriz booleana (num_puntos, num_plazas): qué puntos caen dentro de cada polígono (par-impar)."""
+        x = np.asarray(xs, dtype=np.float32)[:, None, None]
+        y = np.asarray(ys, dtype=np.float32)[:, None, None]
+        cruza = (self.yi > y) != (self.yj > y)
+        corte = self.xi + (y - self.yi) * self.pendiente
+        return ((cruza & (x < corte)).sum(axis=2) % 2).astype(bool)
+
+    def cobertura(self, cars):
+        """Matriz (autos, plazas): fracción de la caja de cada plaza que cubre la caja de cada auto."""
+        x1 = np.maximum(cars['x1'][:, None], self.cajas[:, 0])
+        y1 = np.maximum(cars['y1'][:, None], self.cajas[:, 1])
+        x2 = np.minimum(cars['x2'][:, None], self.cajas[:, 2])
+        y2 = np.minimum(cars['y2'][:, None], self.cajas[:, 3])
+        return np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None) / self.areas
+
+    def actualizar(self, cars):
+        """Recalcula qué plazas están ocupadas con las detecciones del frame; devuelve el arreglo booleano."""
+        ocupadas = np.zeros(len(self), dtype=bool)
+        if len(cars) == 0:
+            self.ocupadas = ocupadas
+            return ocupadas
+        apoyo_x = (cars['x1'] + cars['x2']) / 2
+        apoyo_y = cars['y1'] + (cars['y2'] - cars['y1']) * FRACCION_APOYO
+        puntaje = self.cobertura(cars) * self.dentro(apoyo_x, apoyo_y)
+        mejor = puntaje.argmax(axis=1)
+        valido = puntaje[np.arange(len(cars)), mejor] >= self.cobertura_min
+        ocupadas[mejor[valido]] = True
+        self.ocupadas = ocupadas  # Se reemplaza entero: el hilo de reporte nunca ve un estado a medias
+        return ocupadas
+
+    def libres(self):
+        return int(len(self) - self.ocupadas.sum())
+
+    def estado(self):
+        """{"nombre": "libre" | "ocupada"} del último frame, como se guarda en Parqueo.estado_plazas."""
+        return {nombre: "ocupada" if ocupada else "libre" for nombre, ocupada in zip(self.nombres, self.ocupadas)}
+
+    def rect(self, forma, margen_px=None):
+        """Rectángulo que envuelve todas las plazas con margen, recortado al frame (para el modo ROI).
+
+        Sin margen se usa el alto de la plaza más alta: la caja de un auto sobresale de su plaza en perspectiva.
+        """
+        alto, ancho = forma[:2]
+        if margen_px is None:
+            margen_px = (self.cajas[:, 3] - self.cajas[:, 1]).max()
+        x1, y1 = self.cajas[:, :2].min(axis=0) - margen_px
+        x2, y2 = self.cajas[:, 2:].max(axis=0) + margen_px
+        return max(0, int(x1)), max(0, int(y1)), min(ancho, int(x2)), min(alto, int(y2))
+
+    def dibujar(self, frame):
+        """Plazas libres en verde y ocupadas en rojo (una llamada a polylines por color)."""
+        libres = [p for p, ocupada in zip(self.poligonos, self.ocupadas) if not ocupada]
+        ocupadas = [p for p, ocupada in zip(self.poligonos, self.ocupadas) if ocupada]
+        if libres:
+            cv2.polylines(frame, libres, True, (0, 200, 0), 2)
+        if ocupadas:
+            cv2.polylines(frame, ocupadas, True, (0, 0, 255), 2)
@@ -0,0 +1,89 @@
+import numpy as np
+
+# Post-procesamiento de las detecciones de YOLO compartido por los scripts de cámara.
+# Las detecciones se guardan en un arreglo estructurado compacto en vez de una
+# lista de diccionarios por caja.
+
+DETECCION_DTYPE = np.dtype([
+    ('x1', np.int32), ('y1', np.int32), ('x2', np.int32), ('y2', np.int32),
+    ('conf', np.float32), ('cls', np.int16),
+])
+
+# Detecciones con identificador estable asignado por el rastreador
+TRACK_DTYPE = np.dtype(DETECCION_DTYPE.descr + [('id', np.int32)])
+
+
+def detecciones_vacias():
+    """Arreglo de detecciones sin elementos."""
+    return np.empty(0, dtype=DETECCION_DTYPE)
+
+
+def filtrar_detecciones(results, clases=(2,), conf_min=0.5):
+    """Filtra por clase y confianza con una sola máscara y una sola copia a NumPy por frame."""
+    partes = []
+    for result in results:
+        boxes = result.boxes
+        if boxes is None or len(boxes) == 0:
+            continue
+        # boxes.data es (N, 6) [x1, y1, x2, y2, conf, cls] (o 7 columnas con id de track)
+        datos = boxes.data
+        datos = datos.cpu().numpy() if hasattr(datos, 'cpu') else np.asarray(datos)
+        conf = datos[:, -2]
+        cls = datos[:, -1]
+        mascara = np.isin(cls, clases) & (conf > conf_min)
+        if not mascara.any():
+            continue
+        datos = datos[mascara]
+        dets = np.empty(len(datos), dtype=DETECCION_DTYPE)
+        dets['x1'] = datos[:, 0]
+        dets['y1'] = datos[:, 1]
+        dets['x2'] = datos[:, 2]
+        dets['y2'] = datos[:, 3]
+        dets['conf'] = datos[:, -2]
+        dets['cls'] = datos[:, -1]
+        partes.append(dets)
+    if not partes:
+        return detecciones_vacias()
+    return partes[0] if len(partes) == 1 else np.concatenate(partes)
+
+
+def centros(dets):
+    """Centros (cx, cy) enteros de cada detección."""
+    return (dets['x1'] + dets['x2']) // 2, (dets['y1'] + dets['y2']) // 2
+
+
+def como_dicts(dets, class_names=None):
+    """Vista en diccionarios (formato anterior) para el código de dibujo."""
+    class_names = class_names or {}
+    cx, cy = centros(dets)
+    autos = []
+    tiene_id = 'id' in dets.dtype.names
+    for i, d in enumerate(dets):
+        x1, y1, x2, y2 = int(d['x1']), int(d['y1']), int(d['x2']), int(d['y2'])
+        cls, conf = int(d['cls']), float(d['conf'])
+        auto = {
+            'class': cls,
+            'class_name': class_names.get(cls, str(cls)),
+            'confidence': conf,
+            'bbox': [x1, y1, x2, y2],
+            'center_x': int(cx[i]),
+            'center_y': int(cy[i]),
+            'width': x2 - x1,
+            'height': y2 - y1,
+        }
+        if tiene_id:
+            auto['track_id'] = int(d['id'])
+        autos.append(auto)
+    return autos
+
+
+def desplazar(dets, dx, dy):
+    """Lleva detecciones hechas sobre un recorte a coordenadas del frame completo."""
+    if dx == 0 and dy == 0:
+        return dets
+    dets = dets.copy()
+    dets['x1'] += dx
+    dets['x2'] += dx
+    dets['y1'] += dy
+    dets['y2'] += dy
+    return dets
@@ -0,0 +1,159 @@
+import numpy as np
+
+from postproceso import TRACK_DTYPE
+
+# Rastreador ligero estilo ByteTrack (solo CPU): filtro de Kalman de velocidad
+# constante por auto y asociación por IoU en dos pasadas (confianza alta y baja).
+# Permite correr YOLO cada N frames y propagar las cajas en los frames intermedios.
+
+# Pesos de ruido relativos a la altura de la caja (como en ByteTrack)
+PESO_POSICION = 1 / 20
+PESO_VELOCIDAD = 1 / 160
+
+_F = np.eye(8)
+_F[:4, 4:] = np.eye(4)  # x' = x + v
+_H = np.eye(4, 8)
+
+
+def cajas_de(dets):
+    """Matriz (N, 4) [x1, y1, x2, y2] en float a partir de detecciones estructuradas."""
+    return np.stack([dets['x1'], dets['y1'], dets['x2'], dets['y2']], axis=1).astype(np.float64)
+
+
+def iou_matriz(a, b):
+    """IoU entre todas las cajas de a (N, 4) y b (M, 4) en una sola operación."""
+    if len(a) == 0 or len(b) == 0:
+        return np.zeros((len(a), len(b)))
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    interseccion = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    union = area_a[:, None] + area_b[None, :] - interseccion
+    return np.where(union > 0, interseccion / np.maximum(union, 1e-9), 0.0)
+
+
+def asociar(iou, iou_min):
+    """Emparejamiento voraz por mayor IoU; devuelve pares (fila, columna)."""
+    pares = []
+    if iou.size == 0:
+        return pares
+    iou = iou.copy()
+    while True:
+        i, j = np.unravel_index(np.argmax(iou), iou.shape)
+        if iou[i, j] < iou_min:
+            break
+        pares.append((i, j))
+        iou[i, :] = -1
+        iou[:, j] = -1
+    return pares
+
+
+def _a_medicion(caja):
+    x1, y1, x2, y2 = caja
+    return np.array([(x1 + x2) / 2, (y1 + y2) / 2, x2 - x1, y2 - y1])
+
+
+class Track:
+    def __init__(self, track_id, caja, conf, cls):
+        self.id = track_id
+        self.conf = conf
+        self.cls = cls
+        self.sin_actualizar = 0  # Frames propagados desde la última detección asociada
+        self.visible = True
+        self.x = np.zeros(8)
+        self.x[:4] = _a_medicion(caja)
+        alto = self.x[3]
+        std = [2 * PESO_POSICION * alto, 2 * PESO_POSICION * alto, 2 * PESO_POSICION * alto,
+               2 * PESO_POSICION * alto, 10 * PESO_VELOCIDAD * alto, 10 * PESO_VELOCIDAD * alto,
+               10 * PESO_VELOCIDAD * alto, 10 * PESO_VELOCIDAD * alto]
+        self.P = np.diag(np.square(std))
+
+    def predecir(self):
+        alto = max(self.x[3], 1.0)
+        q = np.square([PESO_POSICION * alto] * 4 + [PESO_VELOCIDAD * alto] * 4)
+        self.x = _F @ self.x
+        self.P = _F @ self.P @ _F.T + np.diag(q)
+        self.sin_actualizar += 1
+
+    def corregir(self, caja, conf):
+        alto = max(self.x[3], 1.0)
+        R = np.diag(np.square([PESO_POSICION * alto] * 4))
+        S = _H @ self.P @ _H.T + R
+        K = self.P @ _H.T @ np.linalg.inv(S)
+        self.x = self.x + K @ (_a_medicion(caja) - _H @ self.x)
+        self.P = (np.eye(8) - K @ _H) @ self.P
+        self.conf = conf
+        self.sin_actualizar = 0
+
+    def caja(self):
+        cx, cy, w, h = self.x[:4]
+        return cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2
+
+    def incertidumbre(self):
+        """Desviación de la posición predicha relativa al tamaño de la caja."""
+        return float(np.sqrt(self.P[0, 0] + self.P[1, 1]) / max(self.x[3], 1.0))
+
+
+class RastreadorIoU:
+    def __init__(self, iou_min=0.3, conf_alta=0.5, conf_baja=0.1, max_perdidos=30, incertidumbre_max=0.5):
+        self.iou_min = iou_min
+        self.conf_alta = conf_alta          # Solo las detecciones de alta confianza crean tracks
+        self.conf_baja = conf_baja          # Umbral con el que debe filtrar el detector
+        self.max_perdidos = max_perdidos    # Frames sin detección antes de eliminar un track
+        self.incertidumbre_max = incertidumbre_max
+        self.tracks = []
+        self.siguiente_id = 1
+
+    def actualizar(self, dets):
+        """Asocia las detecciones del frame a los tracks y devuelve los tracks activos."""
+        for track in self.tracks:
+            track.predecir()
+        cajas = cajas_de(dets)
+        altas = np.flatnonzero(dets['conf'] >= self.conf_alta)
+        bajas = np.flatnonzero(dets['conf'] < self.conf_alta)
+
+        # Primera pasada: detecciones de alta confianza contra todos los tracks
+        cajas_tracks = np.array([t.caja() for t in self.tracks]).reshape(-1, 4)
+        pares = asociar(iou_matriz(cajas_tracks, cajas[altas]), self.iou_min)
+        for i, j in pares:
+            self.tracks[i].corregir(cajas[altas[j]], float(dets['conf'][altas[j]]))
+        sin_par_altas = sorted(set(range(len(altas))) - {j for _, j in pares})
+
+        # Segunda pasada: las de baja confianza solo extienden tracks existentes
+        pendientes = [i for i, t in enumerate(self.tracks) if t.sin_actualizar > 0]
+        if pendientes and len(bajas):
+            for i, j in asociar(iou_matriz(cajas_tracks[pendientes], cajas[bajas]), self.iou_min):
+                self.tracks[pendientes[i]].corregir(cajas[bajas[j]], float(dets['conf'][bajas[j]]))
+
+        for j in sin_par_altas:
+            k = altas[j]
+            self.tracks.append(Track(self.siguiente_id, cajas[k], float(dets['conf'][k]), int(dets['cls'][k])))
+            self.siguiente_id += 1
+
+        self.tracks = [t for t in self.tracks if t.sin_actualizar <= self.max_perdidos]
+        # Solo se muestran los tracks vistos en esta detección; los perdidos siguen vivos para reaparecer
+        for t in self.tracks:
+            t.visible = t.sin_actualizar == 0
+        return self._salida()
+
+    def predecir(self):
+        """Propaga los tracks visibles un frame sin correr el detector."""
+        for track in self.tracks:
+            track.predecir()
+        self.tracks = [t for t in self.tracks if t.sin_actualizar <= self.max_perdidos]
+        return self._salida()
+
+    def incierto(self):
+        """True si algún track acumuló demasiada incertidumbre y conviene volver a detectar."""
+        return any(t.incertidumbre() > self.incertidumbre_max for t in self.tracks if t.visible)
+
+    def _salida(self):
+        tracks = [t for t in self.tracks if t.visible]
+        salida = np.empty(len(tracks), dtype=TRACK_DTYPE)
+        for i, t in enumerate(tracks):
+            x1, y1, x2, y2 = t.caja()
+            salida[i] = (int(x1), int(y1), int(x2), int(y2), t.conf, t.cls, t.id)
+        return salida
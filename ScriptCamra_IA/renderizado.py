@@ -0,0 +1,85 @@
+import threading
+
+import numpy as np
+
+# Capa de dibujo sin asignaciones por frame. Lo que no cambia entre frames (línea de
+# referencia, zonas, instrucciones) se dibuja una sola vez en una capa cacheada y se
+# compone sobre cada frame copiando solo los píxeles que toca; lo dinámico (cajas,
+# contadores) se dibuja encima. La salida va a búferes preasignados que se reutilizan
+# en rueda, y si no hay ningún sumidero (ventana, stream) no se hace nada.
+
+
+class CapaEstatica:
+    """Overlay dibujado una vez por 'clave' y compuesto sobre cada frame."""
+
+    def __init__(self):
+        self.clave = None
+        self.opacos = None      # Índices planos de píxeles cubiertos por completo
+        self.colores = None
+        self.parciales = None   # Bordes con antialiasing: se mezclan con el frame
+        self.alfa = None
+        self.premultiplicados = None
+
+    def componer(self, destino, clave, dibujar):
+        """Compone la capa sobre 'destino'; dibujar(imagen) solo se llama si cambió la clave o la forma."""
+        clave = (clave, destino.shape)
+        if clave != self.clave:
+            self._rasterizar(destino.shape, dibujar)
+            self.clave = clave
+        plano = destino.reshape(-1, 3)
+        plano[self.opacos] = self.colores
+        if len(self.parciales):
+            fondo = plano[self.parciales].astype(np.float32)
+            plano[self.parciales] = (fondo * (1 - self.alfa) + self.premultiplicados + 0.5).astype(np.uint8)
+
+    def _rasterizar(self, forma, dibujar):
+        # Dibujar sobre negro y sobre blanco: donde coinciden el píxel quedó cubierto, y la
+        # diferencia da la opacidad de los bordes suavizados (cv2.LINE_AA)
+        negra = np.zeros(forma, dtype=np.uint8)
+        blanca = np.full(forma, 255, dtype=np.uint8)
+        dibujar(negra)
+        dibujar(blanca)
+        negra = negra.reshape(-1, 3)
+        alfa = 1 - (blanca.reshape(-1, 3).astype(np.float32) - negra).mean(axis=1) / 255
+        self.opacos = np.flatnonzero(alfa >= 0.999)
+        self.colores = negra[self.opacos]
+        self.parciales = np.flatnonzero((alfa > 0.001) & (alfa < 0.999))
+        self.alfa = alfa[self.parciales, None]
+        self.premultiplicados = negra[self.parciales].astype(np.float32)  # Sobre negro: color * alfa
+
+
+class Renderizador:
+    """Dibuja en búferes reutilizados y entrega el resultado a los sumideros (ventana, stream)."""
+
+    def __init__(self, sumideros=(), buferes=3):
+        # sumidero(imagen) recibe cada frame anotado (no debe guardar la referencia); si tiene un
+        # atributo 'activo' (p. ej. un stream sin espectadores), solo se dibuja cuando es True
+        self.sumideros = list(sumideros)
+        # Varios búferes en rueda: el que se está mostrando no es el que se está dibujando
+        self.buferes = [None] * buferes
+        self.siguiente = 0
+        self.lock = threading.Lock()
+
+    @property
+    def activo(self):
+        return any(getattr(sumidero, "activo", True) for sumidero in self.sumideros)
+
+    def _bufer(self, forma):
+        with self.lock:
+            i = self.siguiente
+            self.siguiente = (i + 1) % len(self.buferes)
+            if self.buferes[i] is None or self.buferes[i].shape != forma:
+                self.buferes[i] = np.empty(forma, dtype=np.uint8)
+            return self.buferes[i]
+
+    def renderizar(self, anotar, frame, *args):
+        """anotar(frame, *args, salida=bufer) sobre el próximo búfer; None si ningún sumidero está activo."""
+        if not self.activo:
+            return None
+        return anotar(frame, *args, salida=self._bufer(frame.shape))
+
+    def publicar(self, imagen):
+        if imagen is None:
+            return
+        for sumidero in self.sumideros:
+            sumidero(imagen)
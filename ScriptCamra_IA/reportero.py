@@ -0,0 +1,73 @@
+import time
+
+# Reporte de ocupación dirigido por cambios: solo escribe en el API cuando el espacio
+# disponible cambia de verdad (histéresis + permanencia mínima) o cuando toca el latido.
+# En el modo plazas también cuenta como cambio que una plaza cambie de estado.
+
+
+class ReporteOcupacion:
+    def __init__(self, enviar, histeresis_m=1.0, permanencia_s=3.0, latido_s=60.0, intervalo_base=5.0,
+                 nombre="parqueo"):
+        self.enviar = enviar                # enviar(espacio_disponible, espacios, plazas=None)
+        self.histeresis_m = histeresis_m    # Cambio mínimo en metros para considerar un estado nuevo
+        self.permanencia_s = permanencia_s  # Tiempo que el estado nuevo debe mantenerse antes de enviarlo
+        self.latido_s = latido_s            # Reenvío del último estado aunque no cambie
+        self.intervalo_base = intervalo_base  # Periodo del envío fijo anterior, para medir lo ahorrado
+        self.nombre = nombre
+        self.enviado = None    # (espacio_disponible, espacios, plazas) confirmado en el API
+        self.candidato = None  # Estado nuevo esperando cumplir la permanencia
+        self.candidato_desde = None
+        self.ultimo_envio = None
+        self.inicio = None
+        self.envios = 0
+        self.latidos = 0
+
+    def _distinto(self, a, b):
+        return a[1] != b[1] or a[2] != b[2] or abs(a[0] - b[0]) >= self.histeresis_m
+
+    def observar(self, espacio_disponible, espacios, ahora=None, plazas=None):
+        """Registra el estado actual; devuelve True si se envió al API.
+
+        plazas: estado por plaza ({"nombre": "libre" | "ocupada"}) en el modo plazas, o None.
+        """
+        ahora = time.time() if ahora is None else ahora
+        if self.inicio is None:
+            self.inicio = ahora
+        estado = (espacio_disponible, espacios, plazas)
+
+        if self.enviado is None:
+            return self._enviar(estado, ahora)
+
+        if not self._distinto(estado, self.enviado):
+            self.candidato = None
+        elif self.candidato is None or self._distinto(estado, self.candidato):
+            self.candidato = estado
+            self.candidato_desde = ahora
+        else:
+            self.candidato = estado  # Mismo estado nuevo, se conserva el valor más reciente
+
+        if self.candidato is not None and ahora - self.candidato_desde >= self.permanencia_s:
+            return self._enviar(self.candidato, ahora)
+        if ahora - self.ultimo_envio >= self.latido_s:
+            self.latidos += 1
+            return self._enviar(self.enviado, ahora)
+        return False
+
+    def _enviar(self, estado, ahora):
+        self.enviar(*estado[:2], plazas=estado[2])
+        self.enviado = estado
+        self.candidato = None
+        self.ultimo_envio = ahora
+        self.envios += 1
+        return True
+
+    def escrituras_ahorradas(self, ahora=None):
+        """Escrituras que habría hecho el envío fijo cada intervalo_base y que no se hicieron."""
+        if self.inicio is None:
+            return 0
+        ahora = time.time() if ahora is None else ahora
+        return max(0, int((ahora - self.inicio) / self.intervalo_base) - self.envios)
+
+    def resumen(self):
+        return (f"[{self.nombre}] Envíos: {self.envios} (latidos: {self.latidos}) "
+                f"| Escrituras suprimidas: {self.escrituras_ahorradas()}")
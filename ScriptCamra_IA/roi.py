@@ -0,0 +1,17 @@
+# Regiones de interés (ROI) derivadas de la calibración de cada cámara.
+
+
+def franja_linea(point1, point2, margen_px, forma):
+    """Rectángulo (x1, y1, x2, y2) alrededor de la línea de calibración, recortado al frame."""
+    alto, ancho = forma[:2]
+    x1 = max(0, min(point1[0], point2[0]) - margen_px)
+    x2 = min(ancho, max(point1[0], point2[0]) + margen_px)
+    y1 = max(0, min(point1[1], point2[1]) - margen_px)
+    y2 = min(alto, max(point1[1], point2[1]) + margen_px)
+    return int(x1), int(y1), int(x2), int(y2)
+
+
+def recortar(frame, rect):
+    """Vista (sin copiar) del frame dentro del rectángulo (x1, y1, x2, y2)."""
+    x1, y1, x2, y2 = rect
+    return frame[y1:y2, x1:x2]
@@ -0,0 +1,214 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+from evidencia import codificar_jpeg
+from metricas import METRICAS
+
+# Stream MJPEG por HTTP de los frames anotados, para ver las cámaras desde otra máquina
+# en lugar de cv2.imshow. Cada canal (una cámara) codifica cada frame una sola vez en
+# su propio hilo, sin importar cuántos espectadores haya; cada espectador se lleva
+# siempre el JPEG más reciente, así que uno lento simplemente saltea frames. El bucle
+# de detección solo copia el frame a un búfer (y nada si no hay nadie mirando).
+
+FRONTERA = b"frame"
+ESPERA_FRAME = 5.0  # Segundos sin frames nuevos antes de revisar si el servidor sigue activo
+ANTIGUEDAD_SNAPSHOT = 1.0  # Un /snapshot con un JPEG más viejo que esto espera el próximo frame
+
+
+class CanalMJPEG:
+    """Sumidero de Renderizador para una cámara: codifica en segundo plano y reparte a los espectadores."""
+
+    def __init__(self, nombre, calidad=75, max_dim=960):
+        self.nombre = nombre
+        self.calidad = calidad
+        self.max_dim = max_dim
+        self.cond = threading.Condition()
+        self.pendiente = None   # Último frame recibido, sin codificar
+        self.trabajo = None     # Búfer que está codificando el hilo del canal
+        self.hay_pendiente = False
+        self.jpeg = None
+        self.codificado_en = 0.0  # time.monotonic() del último JPEG
+        self.seq = 0
+        self.clientes = 0
+        self.codificados = 0
+        self.enviados = 0
+        self.saltados = 0       # Frames que algún espectador no llegó a recibir por ir lento
+        self.activo_hilo = True
+        threading.Thread(target=self._codificar, name=f"mjpeg-{nombre}", daemon=True).start()
+        METRICAS.registrar_fuente("mjpeg", self.estadisticas, camara=nombre)
+
+    @property
+    def activo(self):
+        """Renderizador no dibuja nada mientras ningún canal tenga espectadores."""
+        return self.clientes > 0
+
+    def __call__(self, imagen):
+        if not self.clientes:
+            return
+        with self.cond:
+            if self.pendiente is None or self.pendiente.shape != imagen.shape:
+                self.pendiente = np.empty_like(imagen)
+            np.copyto(self.pendiente, imagen)  # El búfer del renderizador se reutiliza: hay que copiar
+            self.hay_pendiente = True
+            self.cond.notify_all()
+
+    def _codificar(self):
+        while self.activo_hilo:
+            with self.cond:
+                if not self.cond.wait_for(lambda: self.hay_pendiente or not self.activo_hilo, ESPERA_FRAME):
+                    continue
+                if not self.activo_hilo:
+                    break
+                # Intercambio de búferes: el próximo frame se copia mientras este se codifica
+                self.pendiente, self.trabajo = self.trabajo, self.pendiente
+                self.hay_pendiente = False
+            jpeg = codificar_jpeg(self.trabajo, self.calidad, self.max_dim)
+            with self.cond:
+                self.jpeg = jpeg
+                self.codificado_en = time.monotonic()
+                self.seq += 1
+                self.codificados += 1
+                self.cond.notify_all()
+
+    def siguiente(self, ultimo, espera=ESPERA_FRAME):
+        """(seq, jpeg) más reciente posterior a 'ultimo', o (ultimo, None) si no llegó ninguno a tiempo."""
+        with self.cond:
+            if not self.cond.wait_for(lambda: self.seq != ultimo or not self.activo_hilo, espera):
+                return ultimo, None
+            if ultimo:
+                self.saltados += max(0, self.seq - ultimo - 1)
+            return self.seq, self.jpeg
+
+    def detener(self):
+        with self.cond:
+            self.activo_hilo = False
+            self.cond.notify_all()
+
+    def estadisticas(self):
+        return {"clientes": self.clientes, "codificados": self.codificados, "enviados": self.enviados,
+                "saltados": self.saltados}
+
+
+class ServidorMJPEG:
+    """Servidor HTTP con un canal por cámara: / (índice), /stream/<camara> y /snapshot/<camara>.jpg."""
+
+    def __init__(self, puerto, host="0.0.0.0", calidad=75, max_dim=960):
+        self.puerto = puerto
+        self.host = host
+        self.calidad = calidad
+        self.max_dim = max_dim
+        self.canales = {}
+        self.servidor = None
+
+    def canal(self, nombre):
+        """Canal (sumidero) de una cámara; se crea la primera vez que se pide."""
+        if nombre not in self.canales:
+            self.canales[nombre] = CanalMJPEG(nombre, self.calidad, self.max_dim)
+        return self.canales[nombre]
+
+    def iniciar(self):
+        servidor_mjpeg = self
+
+        class Manejador(BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urlparse(self.path)
+                partes = [p for p in url.path.split("/") if p]
+                if not partes:
+                    self._indice()
+                elif partes[0] == "stream":
+                    canal = servidor_mjpeg._buscar(partes[1] if len(partes) > 1 else None)
+                    if canal is None:
+                        self.send_error(404)
+                        return
+                    fps = float(parse_qs(url.query).get("fps", ["0"])[0] or 0)
+                    self._stream(canal, fps)
+                elif partes[0] == "snapshot":
+                    canal = servidor_mjpeg._buscar(partes[1].rsplit(".", 1)[0] if len(partes) > 1 else None)
+                    if canal is None:
+                        self.send_error(404)
+                        return
+                    self._snapshot(canal)
+                else:
+                    self.send_error(404)
+
+            def _indice(self):
+                enlaces = "".join(f'<h3>{nombre}</h3><img src="/stream/{nombre}"><br>'
+                                  for nombre in servidor_mjpeg.canales)
+                cuerpo = f"<html><body>{enlaces or 'Sin cámaras'}</body></html>".encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(cuerpo)))
+                self.end_headers()
+                self.wfile.write(cuerpo)
+
+            def _snapshot(self, canal):
+                with canal.cond:
+                    canal.clientes += 1
+                try:
+                    # Sin espectadores el canal no codifica: su último JPEG puede ser de hace rato
+                    if canal.jpeg is None or time.monotonic() - canal.codificado_en > ANTIGUEDAD_SNAPSHOT:
+                        _, jpeg = canal.siguiente(canal.seq)
+                    else:
+                        jpeg = canal.jpeg
+                finally:
+                    with canal.cond:
+                        canal.clientes -= 1
+                if jpeg is None:
+                    self.send_error(503, "Todavía no hay frames")
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "image/jpeg")
+                self.send_header("Content-Length", str(len(jpeg)))
+                self.end_headers()
+                self.wfile.write(jpeg)
+
+            def _stream(self, canal, fps):
+                # fps en la URL (?fps=2) limita la tasa de este espectador sin afectar a los demás
+                intervalo = 1 / fps if fps > 0 else 0
+                self.send_response(200)
+                self.send_header("Content-Type", f"multipart/x-mixed-replace; boundary={FRONTERA.decode()}")
+                self.send_header("Cache-Control", "no-cache")
+                self.end_headers()
+                with canal.cond:
+                    canal.clientes += 1
+                ultimo = 0
+                try:
+                    while canal.activo_hilo:
+                        inicio = time.monotonic()
+                        ultimo, jpeg = canal.siguiente(ultimo)
+                        if jpeg is None:
+                            continue
+                        self.wfile.write(b"--" + FRONTERA + b"\r\nContent-Type: image/jpeg\r\n"
+                                         + f"Content-Length: {len(jpeg)}\r\n\r\n".encode() + jpeg + b"\r\n")
+                        canal.enviados += 1
+                        if intervalo:
+                            time.sleep(max(0.0, intervalo - (time.monotonic() - inicio)))
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # El espectador cerró la conexión
+                finally:
+                    with canal.cond:
+                        canal.clientes -= 1
+
+            def log_message(self, formato, *args):
+                pass
+
+        self.servidor = ThreadingHTTPServer((self.host, self.puerto), Manejador)
+        self.servidor.daemon_threads = True
+        threading.Thread(target=self.servidor.serve_forever, name="mjpeg-http", daemon=True).start()
+        print(f"[MJPEG] http://{self.host}:{self.puerto}/")
+        return self
+
+    def _buscar(self, nombre):
+        if nombre is None and len(self.canales) == 1:
+            return next(iter(self.canales.values()))
+        return self.canales.get(nombre)
+
+    def detener(self):
+        for canal in self.canales.values():
+            canal.detener()
+        if self.servidor is not None:
+            self.servidor.shutdown()
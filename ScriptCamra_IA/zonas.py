@@ -0,0 +1,86 @@
+import numpy as np
+
+from arranque import importar_diferido
+
+cv2 = importar_diferido("cv2")
+
+# Zonas restringidas poligonales. Todas las zonas de una cámara se rasterizan en una
+# máscara de bits (bit i = zona i) del tamaño del frame, así que saber en qué zonas
+# cae cada centro de auto es una sola indexación sobre la máscara.
+
+MAX_ZONAS = 32  # Bits de la máscara (uint32 como máximo)
+
+
+def poligono_de_rect(zona):
+    """Polígono (4 esquinas) de una zona rectangular {'x1', 'y1', 'x2', 'y2'}."""
+    x1, y1, x2, y2 = zona['x1'], zona['y1'], zona['x2'], zona['y2']
+    return [(x1, y1), (x2, y1), (x2, y2), (x1, y2)]
+
+
+def normalizar_zonas(zonas):
+    """Acepta rectángulos o {'nombre', 'puntos'} y devuelve [{'nombre', 'puntos': ndarray int32 (N, 2)}]."""
+    resultado = []
+    for i, zona in enumerate(zonas):
+        puntos = zona['puntos'] if 'puntos' in zona else poligono_de_rect(zona)
+        puntos = np.asarray(puntos, dtype=np.int32).reshape(-1, 2)
+        if len(puntos) < 3:
+            raise ValueError(f"Zona {i}: un polígono necesita al menos 3 puntos")
+        resultado.append({'nombre': zona.get('nombre', f"zona_{i}"), 'puntos': puntos})
+    if len(resultado) > MAX_ZONAS:
+        raise ValueError(f"Como máximo {MAX_ZONAS} zonas por cámara")
+    return resultado
+
+
+def mascara_zonas(zonas, forma):
+    """Máscara (alto, ancho) donde el bit i indica que el píxel está dentro de la zona i."""
+    alto, ancho = forma[:2]
+    # El tipo más chico que alcance para los bits: con pocas zonas la máscara ocupa 1 byte por píxel
+    dtype = np.uint8 if len(zonas) <= 8 else np.uint16 if len(zonas) <= 16 else np.uint32
+    mascara = np.zeros((alto, ancho), dtype=dtype)
+    capa = np.zeros((alto, ancho), dtype=np.uint8)
+    for i, zona in enumerate(zonas):
+        capa[:] = 0
+        cv2.fillPoly(capa, [zona['puntos']], 1)
+        mascara |= capa.astype(dtype) << dtype(i)
+    return mascara
+
+
+def pertenencia(mascara, xs, ys, num_zonas):
+    """Matriz booleana (num_puntos, num_zonas): qué puntos caen dentro de cada zona."""
+    alto, ancho = mascara.shape
+    xs = np.clip(np.asarray(xs, dtype=np.intp), 0, ancho - 1)
+    ys = np.clip(np.asarray(ys, dtype=np.intp), 0, alto - 1)
+    bits = mascara[ys, xs]
+    return ((bits[:, None] >> np.arange(num_zonas, dtype=mascara.dtype)) & 1).astype(bool)
+
+
+def rect_zonas(zonas, margen_px, forma):
+    """Rectángulo que envuelve todas las zonas con margen, recortado al frame."""
+    alto, ancho = forma[:2]
+    puntos = np.concatenate([zona['puntos'] for zona in zonas])
+    x1, y1 = puntos.min(axis=0) - margen_px
+    x2, y2 = puntos.max(axis=0) + margen_px
+    return max(0, int(x1)), max(0, int(y1)), min(ancho, int(x2)), min(alto, int(y2))
+
+
+class TemporizadorZona:
+    """Estabilidad del conteo de una zona: confirma un conteo que se mantiene 'tiempo_estable' segundos."""
+
+    def __init__(self, tiempo_estable=3.0):
+        self.tiempo_estable = tiempo_estable
+        self.conteo = None   # Valor estable del contador
+        self.desde = None    # Tiempo de inicio de la estabilidad
+        self.reportado = False  # Evita confirmar el mismo conteo más de una vez
+
+    def observar(self, conteo, ahora):
+        """Devuelve True una sola vez cuando el conteo lleva 'tiempo_estable' sin cambiar."""
+        if self.conteo is None or conteo != self.conteo:
+            # Reiniciar temporizador y bandera si el contador cambia
+            self.conteo = conteo
+            self.desde = ahora
+            self.reportado = False
+            return False
+        if not self.reportado and ahora - self.desde >= self.tiempo_estable:
+            self.reportado = True
+            return True
+        return False